@@ -0,0 +1,26 @@
+"""chat_messages table
+
+Revision ID: 0001_chat_messages
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_chat_messages"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "chat_messages",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("sender_id", sa.Integer, nullable=False),
+        sa.Column("receiver_id", sa.Integer, nullable=True),
+        sa.Column("content", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("chat_messages")
@@ -0,0 +1,34 @@
+"""composite indexes for keyset-paginated chat history
+
+One index per side of the history UNION (sender / receiver), each ending in the
+(created_at, id) cursor, so a page is a covering index range scan.
+
+Revision ID: 0002_chat_history_indexes
+Revises: 0001_chat_messages
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002_chat_history_indexes"
+down_revision = "0001_chat_messages"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "ix_chat_messages_sender_created_id": ["sender_id", "created_at", "id"],
+    "ix_chat_messages_receiver_created_id": ["receiver_id", "created_at", "id"],
+}
+
+def upgrade():
+    if op.get_bind().dialect.name == "postgresql":
+        # CONCURRENTLY: do not block writes to a live table; it cannot run in a transaction
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES.items():
+                op.create_index(name, "chat_messages", columns, postgresql_concurrently=True)
+        return
+    for name, columns in INDEXES.items():
+        op.create_index(name, "chat_messages", columns)
+
+def downgrade():
+    for name in INDEXES:
+        op.drop_index(name, table_name="chat_messages")
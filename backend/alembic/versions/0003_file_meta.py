@@ -0,0 +1,28 @@
+"""file_meta table
+
+Revision ID: 0003_file_meta
+Revises: 0002_chat_history_indexes
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_file_meta"
+down_revision = "0002_chat_history_indexes"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "file_meta",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("user_id", sa.Integer, nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("content_type", sa.String(100), nullable=False),
+        sa.Column("created_at", sa.DateTime, nullable=False),
+    )
+    op.create_index("ix_file_meta_user_id", "file_meta", ["user_id"])
+
+def downgrade():
+    op.drop_index("ix_file_meta_user_id", table_name="file_meta")
+    op.drop_table("file_meta")
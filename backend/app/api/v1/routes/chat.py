@@ -1,11 +1,25 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.deps import get_db, get_current_user
+from app.db.session import get_write_behind
+from app.repositories.chat_repo import ChatRepository
+from app.schemas.chat import MessagePage
 
+# mounted by app/main.py under /api/v1/chat
 router = APIRouter()
 
 @router.post("/send")
 def send_message():
     return {"message": "Send chat endpoint placeholder"}
 
-@router.get("/history")
-def get_chat_history():
-    return {"messages": []}
+@router.get("/history", response_model=MessagePage)
+def get_chat_history(limit: int = Query(50, ge=1, le=200), cursor: str | None = None,
+                     db=Depends(get_db), user=Depends(get_current_user)):
+    try:
+        messages, next_cursor = ChatRepository(db, get_write_behind()).get_history_page(user["id"], limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError:
+        # this user's queued messages are not in the database yet (database stalled)
+        raise HTTPException(status_code=503, detail="chat history is still being saved, retry shortly",
+                            headers={"Retry-After": "1"})
+    return {"messages": messages, "next_cursor": next_cursor}
@@ -1,7 +1,17 @@
-from fastapi import APIRouter, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from app.config.settings import settings
+from app.integrations.file_store import get_file_store
+from app.labs.streaming import UploadLimitError, iter_file_chunks
 
 router = APIRouter()
 
 @router.post("/upload")
 def upload_file(file: UploadFile = File(...)):
-    return {"filename": file.filename, "message": "File uploaded placeholder"}
+    chunks = iter_file_chunks(file.file, settings.UPLOAD_CHUNK_KB * 1024, int(settings.UPLOAD_MAX_MB * 2**20))
+    try:
+        stored = get_file_store().put_chunks(chunks)
+    except UploadLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # file_id is the content's SHA-256: identical uploads share one stored copy
+    return {"filename": file.filename, "file_id": stored.digest, "size": stored.size,
+            "deduplicated": not stored.created}
@@ -19,21 +19,122 @@ class Settings(BaseModel):
     USE_MISTRAL: bool = os.getenv("USE_MISTRAL", "False").lower() == "true"
     MISTRAL_API_KEY: str | None = os.getenv("MISTRAL_API_KEY")
     MISTRAL_MODEL: str = os.getenv("MISTRAL_MODEL", "mistral-small-latest")
+    MISTRAL_ENDPOINT: str = os.getenv("MISTRAL_ENDPOINT", "https://api.mistral.ai")
 
     # --- Local Ollama ---
     USE_LOCAL: bool = os.getenv("USE_LOCAL", "False").lower() == "true"
     LOCAL_MODEL: str = os.getenv("LOCAL_MODEL", "mistral")
     LOCAL_URL: str = os.getenv("LOCAL_URL", "http://localhost:11434/api/generate")
 
+    # --- LLM HTTP clients (one keep-alive pool per process) ---
+    LLM_TIMEOUT: float = float(os.getenv("LLM_TIMEOUT", "120"))
+    LLM_CONNECT_TIMEOUT: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+    # identical concurrent (non-streaming) generations share one upstream call
+    LLM_SINGLEFLIGHT: bool = os.getenv("LLM_SINGLEFLIGHT", "True").lower() == "true"
+
     # --- General settings ---
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.2"))
     TOP_K: int = int(os.getenv("TOP_K", "5"))
+    # approximate tokens (~4 chars each) of retrieved text allowed into the /chat prompt
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+    # /chat/batch: questions per request, and generations in flight per batch
+    CHAT_BATCH_MAX_QUESTIONS: int = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "1000"))
+    CHAT_BATCH_CONCURRENCY: int = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+
+    # --- Startup: load the retriever and run one query before /ready reports ready ---
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "True").lower() == "true"
+    WARMUP_QUERY: str = os.getenv("WARMUP_QUERY", "what is a normal blood glucose level")
+    # seconds between checks of the index/KB files for a rebuilt corpus; 0 disables the watcher
+    RETRIEVER_WATCH_INTERVAL: float = float(os.getenv("RETRIEVER_WATCH_INTERVAL", "30"))
+    # enables POST /admin/reload-index (send it as X-Admin-Token); empty disables the endpoint
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+
+    # --- Metrics: Prometheus text on /metrics, per-stage Server-Timing response header ---
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    SERVER_TIMING: bool = os.getenv("SERVER_TIMING", "True").lower() == "true"
 
     # --- Retrieval (FAISS) ---
     USE_FAISS: bool = os.getenv("USE_FAISS", "False").lower() == "true"
+    # sentence-transformers name (PyTorch) or "onnx:<dir>" from scripts/export_onnx_encoder.py
     EMBED_MODEL: str = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # onnxruntime intra-op threads per encoder; 0 = one per physical core
+    ONNX_THREADS: int = int(os.getenv("ONNX_THREADS", "0"))
     FAISS_INDEX_PATH: str = os.getenv("FAISS_INDEX_PATH", "backend/app/vector.index")
-    FAISS_META_PATH: str = os.getenv("FAISS_META_PATH", "backend/app/vector_meta.jsonl")
+    FAISS_META_PATH: str = os.getenv("FAISS_META_PATH", "backend/app/vector_meta.bin")
+    FAISS_EMB_PATH: str = os.getenv("FAISS_EMB_PATH", "backend/app/vector_embeddings.npy")
+    # map index/embeddings/meta read-only instead of loading them, so workers share pages
+    FAISS_MMAP: bool = os.getenv("FAISS_MMAP", "True").lower() == "true"
+    # index type built by scripts/build_faiss_index.py: flat | ivf_flat | hnsw | ivf_pq
+    FAISS_INDEX_TYPE: str = os.getenv("FAISS_INDEX_TYPE", "flat")
+    FAISS_NLIST: int = int(os.getenv("FAISS_NLIST", "1024"))
+    FAISS_HNSW_M: int = int(os.getenv("FAISS_HNSW_M", "32"))
+    FAISS_EF_CONSTRUCTION: int = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+    FAISS_PQ_M: int = int(os.getenv("FAISS_PQ_M", "48"))
+    FAISS_PQ_NBITS: int = int(os.getenv("FAISS_PQ_NBITS", "8"))
+    # query-time defaults (overridable per retrieve() call)
+    FAISS_NPROBE: int = int(os.getenv("FAISS_NPROBE", "16"))
+    FAISS_EF_SEARCH: int = int(os.getenv("FAISS_EF_SEARCH", "64"))
+    FAISS_BATCH_MAX_SIZE: int = int(os.getenv("FAISS_BATCH_MAX_SIZE", "32"))
+    FAISS_BATCH_MAX_WAIT_MS: float = float(os.getenv("FAISS_BATCH_MAX_WAIT_MS", "2"))
+    EMBED_CACHE_SIZE: int = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+
+    # --- Semantic answer cache (/chat, /patient-chat) ---
+    # off by default: without a FAISS retriever (query embeddings) only exact repeats can hit
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "False").lower() == "true"
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2048"))
+    ANSWER_CACHE_MAX_MB: float = float(os.getenv("ANSWER_CACHE_MAX_MB", "64"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    # seconds between checks of the retriever version (a reload clears the cache); cheap, so 0
+    ANSWER_CACHE_CHECK_INTERVAL: float = float(os.getenv("ANSWER_CACHE_CHECK_INTERVAL", "0"))
+
+    # --- Patient data written at run time (uploads, OCR text, results): outside the source tree ---
+    DATA_DIR: str = os.getenv("DATA_DIR", os.path.join(os.path.expanduser("~"), ".medbot"))
+
+    # --- Lab PDF OCR ---
+    OCR_DPI: int = int(os.getenv("OCR_DPI", "200"))
+    OCR_GRAYSCALE: bool = os.getenv("OCR_GRAYSCALE", "True").lower() == "true"
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "2"))
+    OCR_LANG: str = os.getenv("OCR_LANG", "eng")
+    # page text cache keyed by rendered-page hash; empty disables it. Entries unused for
+    # OCR_CACHE_TTL seconds are deleted, then least recently used ones beyond OCR_CACHE_MAX_MB
+    OCR_CACHE_DIR: str = os.getenv("OCR_CACHE_DIR", os.path.join(DATA_DIR, "ocr_cache"))
+    OCR_CACHE_TTL: float = float(os.getenv("OCR_CACHE_TTL", "86400"))
+    OCR_CACHE_MAX_MB: float = float(os.getenv("OCR_CACHE_MAX_MB", "256"))
+
+    # --- Lab uploads (/upload): parsed incrementally in UPLOAD_CHUNK_KB reads ---
+    UPLOAD_MAX_MB: float = float(os.getenv("UPLOAD_MAX_MB", "1024"))
+    UPLOAD_MAX_ROWS: int = int(os.getenv("UPLOAD_MAX_ROWS", "1000000"))
+    UPLOAD_CHUNK_KB: int = int(os.getenv("UPLOAD_CHUNK_KB", "256"))
+    # uploads are stored once per SHA-256 (app/integrations/file_store.py); re-uploads
+    # of identical content reuse the cached parse + score result
+    FILE_STORE_BACKEND: str = os.getenv("FILE_STORE_BACKEND", "local")
+    FILE_STORE_DIR: str = os.getenv("FILE_STORE_DIR", os.path.join(DATA_DIR, "file_store"))
+    # retention: objects unused for FILE_STORE_TTL seconds are deleted, then least recently
+    # used ones until the store fits FILE_STORE_MAX_MB; checked every FILE_STORE_PRUNE_INTERVAL
+    FILE_STORE_TTL: float = float(os.getenv("FILE_STORE_TTL", "86400"))
+    FILE_STORE_MAX_MB: float = float(os.getenv("FILE_STORE_MAX_MB", "2048"))
+    FILE_STORE_PRUNE_INTERVAL: float = float(os.getenv("FILE_STORE_PRUNE_INTERVAL", "300"))
+    UPLOAD_RESULT_CACHE: bool = os.getenv("UPLOAD_RESULT_CACHE", "True").lower() == "true"
+
+    # --- Worker pools per workload class (app/services/executor.py) ---
+    # workers run jobs; queue is how many more may wait before requests get 503 + Retry-After
+    POOL_RETRIEVAL_WORKERS: int = int(os.getenv("POOL_RETRIEVAL_WORKERS", "4"))
+    POOL_RETRIEVAL_QUEUE: int = int(os.getenv("POOL_RETRIEVAL_QUEUE", "64"))
+    POOL_LABS_WORKERS: int = int(os.getenv("POOL_LABS_WORKERS", "2"))
+    POOL_LABS_QUEUE: int = int(os.getenv("POOL_LABS_QUEUE", "8"))
+    POOL_LABS_KIND: str = os.getenv("POOL_LABS_KIND", "process")  # process | thread
+    POOL_OCR_WORKERS: int = int(os.getenv("POOL_OCR_WORKERS", "1"))
+    POOL_OCR_QUEUE: int = int(os.getenv("POOL_OCR_QUEUE", "4"))
+    POOL_RETRY_AFTER: float = float(os.getenv("POOL_RETRY_AFTER", "2"))
+
+    # --- Batch lab scoring (/upload/batch, scripts/score_labs.py) ---
+    LAB_BATCH_BLOCK: int = int(os.getenv("LAB_BATCH_BLOCK", "256"))
+    # files per /upload/batch request (each also held to UPLOAD_MAX_MB / UPLOAD_MAX_ROWS)
+    UPLOAD_BATCH_MAX_FILES: int = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "500"))
 
 
 settings = Settings()
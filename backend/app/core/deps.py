@@ -1,9 +1,13 @@
-from fastapi import Depends
+from app.db.session import new_session
 
 def get_db():
-    # Placeholder for SQLAlchemy session
-    yield "db_session_placeholder"
+    # one SQLAlchemy session per request, closed when the response is done
+    db = new_session()
+    try:
+        yield db
+    finally:
+        db.close()
 
-def get_current_user(token: str = Depends()):
-    # Placeholder for user dependency
+def get_current_user():
+    # Placeholder for user dependency (a bare Depends() on `str` cannot be resolved by FastAPI)
     return {"id": 1, "role": "patient"}
@@ -1,6 +1,54 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.write_behind import WriteBehindQueue
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def engine_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite uses a file lock, not a server: pool sizing does not apply
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# the engine (and its DB driver) is created on first use, not at import
+_engine: Engine | None = None
+_write_behind: WriteBehindQueue | None = None
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        _engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+        SessionLocal.configure(bind=_engine)
+    return _engine
+
+def new_session():
+    get_engine()
+    return SessionLocal()
+
+def get_write_behind() -> WriteBehindQueue:
+    """Shared queue: chat turns and file metadata, bulk-inserted off the request path
+    (app/db/write_behind.py). The writer thread starts on first put."""
+    global _write_behind
+    if _write_behind is None:
+        _write_behind = WriteBehindQueue(
+            get_engine(),
+            max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+            max_wait=settings.WRITE_BEHIND_MAX_WAIT_MS / 1000,
+            capacity=settings.WRITE_BEHIND_CAPACITY,
+            put_timeout=settings.WRITE_BEHIND_PUT_TIMEOUT,
+            flush_timeout=settings.WRITE_BEHIND_FLUSH_TIMEOUT,
+            dead_letter=settings.WRITE_BEHIND_DEAD_LETTER,
+        )
+    return _write_behind
+
+def close_write_behind():
+    """Called on app shutdown: writes what is still queued, then stops the writer."""
+    if _write_behind is not None:
+        _write_behind.close(settings.WRITE_BEHIND_CLOSE_TIMEOUT)
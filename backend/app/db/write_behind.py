@@ -0,0 +1,257 @@
+from __future__ import annotations
+import asyncio, atexit, json, os, queue, threading, time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, List, Tuple
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+from app.integrations.app_insights import log_event
+from app.integrations.metrics import WRITE_BEHIND_DROPPED
+
+# Write-behind persistence for append-only rows (chat turns, file metadata): callers
+# enqueue plain row dicts and return; a writer thread groups them into one multi-row
+# INSERT per table and one transaction per batch. A batch closes at `max_batch` rows
+# or `max_wait` seconds after its first row. The queue is bounded: when the database
+# falls behind, put() blocks for up to `put_timeout` and then raises WriteBehindFull.
+# A batch that still fails after `retries` is counted (medbot_write_behind_dropped_rows_total)
+# and its rows are appended to the `dead_letter` JSONL file for replay; so are rows still
+# queued when close() gives up on a database that does not answer.
+# Rows may carry keys (e.g. ("chat", user_id)): the queue counts pending rows per key, so
+# flush(key=...) returns at once when that key has nothing queued and otherwise waits only
+# for those rows, not for everything other users enqueued.
+
+_STOP = object()
+
+class WriteBehindFull(Exception):
+    def __init__(self, capacity: int):
+        super().__init__(f"write-behind queue full ({capacity} rows pending)")
+        self.capacity = capacity
+
+class WriteBehindQueue:
+    def __init__(self, engine: Engine, max_batch: int = 500, max_wait: float = 0.05,
+                 capacity: int = 10_000, put_timeout: float = 1.0, retries: int = 3,
+                 flush_timeout: float = 10.0, dead_letter: str | Path | None = None,
+                 name: str = "write-behind"):
+        self.engine = engine
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.capacity = capacity
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.flush_timeout = flush_timeout
+        self.dead_letter = Path(dead_letter) if dead_letter else None
+        self.name = name
+        self._dead_lock = threading.Lock()
+        self.rows = self.batches = self.dropped = 0
+        self._pending: Dict[Hashable, int] = {}  # key -> rows queued or being written
+        self._settled = threading.Condition()
+        # items: (table, row, keys), a flush marker (Future) or _STOP
+        self._q: queue.Queue = queue.Queue(maxsize=capacity)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+                    # rows still queued at interpreter exit are written, not lost
+                    atexit.register(self.close)
+
+    def put(self, table: Table, row: Dict, timeout: float = None, keys: Iterable[Hashable] = ()):
+        """
+        Enqueues one row; blocks while the queue is full, up to `timeout` (default put_timeout).
+        `keys` are what flush(key=...) waits on.
+        """
+        self._ensure_started()
+        keys = tuple(keys)
+        self._track(keys, 1)
+        try:
+            self._q.put((table, row, keys), timeout=self.put_timeout if timeout is None else timeout)
+        except queue.Full:
+            self._track(keys, -1)
+            raise WriteBehindFull(self.capacity) from None
+
+    async def aput(self, table: Table, row: Dict, keys: Iterable[Hashable] = ()):
+        self._ensure_started()
+        keys = tuple(keys)
+        self._track(keys, 1)
+        try:
+            self._q.put_nowait((table, row, keys))
+        except queue.Full:
+            self._track(keys, -1)
+            # backpressure without blocking the event loop
+            await asyncio.to_thread(self.put, table, row, None, keys)
+
+    def _track(self, keys: Tuple[Hashable, ...], delta: int):
+        if not keys:
+            return
+        with self._settled:
+            for k in keys:
+                n = self._pending.get(k, 0) + delta
+                if n > 0:
+                    self._pending[k] = n
+                else:
+                    self._pending.pop(k, None)
+            if delta < 0:
+                self._settled.notify_all()
+
+    def _settle(self, batch: List[Tuple[Table, Dict, Tuple]]):
+        # rows written or dropped: no longer pending for their keys
+        for _, _, keys in batch:
+            self._track(keys, -1)
+
+    def flush(self, timeout: float = None, key: Hashable = None):
+        """
+        Blocks until every row enqueued before this call is committed (read-your-writes),
+        for up to `timeout` (default flush_timeout); raises TimeoutError after that.
+        With `key`, waits only for the rows put with that key (none pending: no wait).
+        """
+        timeout = self.flush_timeout if timeout is None else timeout
+        if key is not None:
+            if key in self._pending:
+                try:
+                    # closes the batch being gathered now instead of after max_wait
+                    self._q.put_nowait(Future())
+                except queue.Full:
+                    pass  # a full queue goes out in full batches anyway
+            with self._settled:
+                if not self._settled.wait_for(lambda: key not in self._pending, timeout):
+                    raise TimeoutError(f"{self.name}: flush of {key!r} timed out after {timeout}s")
+            return
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        marker: Future = Future()
+        try:
+            self._q.put(marker, timeout=timeout)
+        except queue.Full:
+            raise TimeoutError(f"{self.name}: flush timed out after {timeout}s (queue full)") from None
+        try:
+            marker.result(max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            raise TimeoutError(f"{self.name}: flush timed out after {timeout}s") from None
+
+    async def aflush(self, timeout: float = None, key: Hashable = None):
+        if self._thread is None or (key is not None and key not in self._pending):
+            return
+        await asyncio.to_thread(self.flush, timeout, key)
+
+    def close(self, timeout: float = 30):
+        """
+        Writes everything still queued, then stops the writer thread. Waits at most
+        `timeout`: rows still queued then (database unreachable) go to the dead letter.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        atexit.unregister(self.close)
+        deadline = time.monotonic() + timeout
+        try:
+            self._q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            # the writer is stuck on the database: keep what it has not picked up yet
+            left: List[Tuple[Table, Dict, Tuple]] = []
+            while True:
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(item, Future):
+                    item.set_exception(TimeoutError(f"{self.name} closed before the flush completed"))
+                elif item is not _STOP:
+                    left.append(item)
+            if left:
+                self._drop(left, "close timed out")
+                self._settle(left)
+
+    def stats(self) -> Dict:
+        return {"pending": self._q.qsize(), "capacity": self.capacity, "rows": self.rows,
+                "batches": self.batches, "dropped": self.dropped}
+
+    def _run(self):
+        while True:
+            batch: List[Tuple[Table, Dict, Tuple]] = []
+            markers: List[Future] = []
+            first = self._q.get()
+            stop = first is _STOP
+            if isinstance(first, Future):
+                markers.append(first)
+            elif not stop:
+                batch.append(first)
+                deadline = time.monotonic() + self.max_wait
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    try:
+                        nxt = self._q.get(timeout=timeout) if timeout > 0 else self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is _STOP:
+                        stop = True
+                        break
+                    if isinstance(nxt, Future):
+                        # a flush request closes the batch early
+                        markers.append(nxt)
+                        break
+                    batch.append(nxt)
+            if stop:
+                # drain whatever is still queued before exiting
+                while True:
+                    try:
+                        nxt = self._q.get_nowait()
+                    except queue.Empty:
+                        break
+                    if isinstance(nxt, Future):
+                        markers.append(nxt)
+                    elif nxt is not _STOP:
+                        batch.append(nxt)
+            for i in range(0, len(batch), self.max_batch):
+                self._write(batch[i:i + self.max_batch])
+                self._settle(batch[i:i + self.max_batch])
+            for m in markers:
+                m.set_result(None)
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple[Table, Dict, Tuple]]):
+        by_table: Dict[Table, List[Dict]] = {}
+        for table, row, _ in batch:
+            by_table.setdefault(table, []).append(row)
+        for attempt in range(self.retries + 1):
+            try:
+                with self.engine.begin() as conn:
+                    for table, rows in by_table.items():
+                        conn.execute(table.insert(), rows)  # executemany: one multi-row insert
+                self.rows += len(batch)
+                self.batches += 1
+                return
+            except Exception as e:
+                if attempt == self.retries:
+                    self._drop(batch, f"{type(e).__name__}: {e}")
+                    return
+                time.sleep(min(2.0, 0.05 * 2 ** attempt))
+
+    def _drop(self, batch: List[Tuple[Table, Dict, Tuple]], error: str):
+        with self._dead_lock:
+            self.dropped += len(batch)
+            WRITE_BEHIND_DROPPED.inc(self.name, amount=len(batch))
+            saved = None
+            if self.dead_letter is not None:
+                try:
+                    self.dead_letter.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.dead_letter, "a", encoding="utf-8") as f:
+                        for table, row, _ in batch:
+                            # datetimes as ISO strings
+                            f.write(json.dumps({"table": table.name, "row": row, "error": error},
+                                               default=lambda v: v.isoformat() if hasattr(v, "isoformat") else str(v),
+                                               ensure_ascii=False) + "\n")
+                    saved = os.fspath(self.dead_letter)
+                except OSError as e:
+                    error = f"{error}; dead letter not written: {e}"
+            log_event("write_behind_dropped", {"queue": self.name, "rows": len(batch), "error": error,
+                                               "dead_letter": saved})
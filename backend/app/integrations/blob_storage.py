@@ -1,2 +1,4 @@
+# Placeholder. Uploads go through integrations/file_store.py; a Blob Storage backend
+# implements its FileStore interface.
 def upload_to_blob(file):
     return {"url": f"https://blobstorage/{file.filename}"}
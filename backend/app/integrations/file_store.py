@@ -0,0 +1,187 @@
+from __future__ import annotations
+import hashlib, json, os, re, threading, time, uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable
+from app.config.settings import settings
+
+# Content-addressed upload storage. Uploads are streamed to storage in chunks while
+# hashed (SHA-256), so identical files are stored once under their digest, and results
+# derived from a file (parse + score) are cached per digest. Stored files are patient
+# data: prune() deletes objects (with their results) unused for `max_age` seconds, then
+# least recently used ones beyond `max_bytes`; uses refresh an object's mtime. LocalFileStore is the
+# first backend; a Blob Storage backend implements FileStore with blob names
+# objects/<digest> and results/<digest>.<key>.json (see blob_storage.py).
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+_KEY = re.compile(r"^[A-Za-z0-9._-]+$")
+
+@dataclass
+class StoredFile:
+    digest: str
+    size: int
+    created: bool  # False: identical content was already stored
+
+class FileStore(ABC):
+    @abstractmethod
+    def put_chunks(self, chunks: Iterable[bytes]) -> StoredFile:
+        """Stores a stream of chunks; an exception from `chunks` (e.g. a size limit) stores nothing."""
+
+    @abstractmethod
+    def exists(self, digest: str) -> bool: ...
+
+    @abstractmethod
+    def open(self, digest: str) -> BinaryIO: ...
+
+    @abstractmethod
+    def local_path(self, digest: str) -> str:
+        """A filesystem path worker processes can read (remote backends download to a cache)."""
+
+    @abstractmethod
+    def get_result(self, digest: str, key: str) -> Dict | None: ...
+
+    @abstractmethod
+    def put_result(self, digest: str, key: str, result: Dict): ...
+
+    @abstractmethod
+    def delete(self, digest: str): ...
+
+    @abstractmethod
+    def prune(self) -> int:
+        """Applies the retention policy; returns the number of objects deleted."""
+
+class LocalFileStore(FileStore):
+    def __init__(self, root: str | Path, max_age: float = None, max_bytes: int = None,
+                 prune_interval: float = 300):
+        self.root = Path(root)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.prune_interval = prune_interval
+        self._tmp = self.root / "tmp"
+        self._tmp.mkdir(parents=True, exist_ok=True)
+        self._pruned_at = 0.0
+        self._prune_lock = threading.Lock()
+
+    def _object(self, digest: str) -> Path:
+        if not _DIGEST.match(digest):
+            raise ValueError(f"not a sha256 digest: {digest!r}")
+        return self.root / "objects" / digest[:2] / digest
+
+    def _result(self, digest: str, key: str) -> Path:
+        if not _KEY.match(key):
+            raise ValueError(f"invalid result key: {key!r}")
+        return self.root / "results" / digest[:2] / f"{digest}.{key}.json"
+
+    def _publish(self, tmp: Path, final: Path):
+        # tmp/ is on the same filesystem, so the rename is atomic: readers never see partial files
+        final.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, final)
+
+    def put_chunks(self, chunks: Iterable[bytes]) -> StoredFile:
+        h, size = hashlib.sha256(), 0
+        tmp = self._tmp / f"{uuid.uuid4().hex}.part"
+        try:
+            with open(tmp, "wb") as out:
+                for chunk in chunks:
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = h.hexdigest()
+            final = self._object(digest)
+            if final.exists():
+                tmp.unlink()
+                self._touch(final)
+                return StoredFile(digest, size, created=False)
+            self._publish(tmp, final)
+            return StoredFile(digest, size, created=True)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            self._maybe_prune()
+
+    def exists(self, digest: str) -> bool:
+        return self._object(digest).exists()
+
+    def open(self, digest: str) -> BinaryIO:
+        return open(self._object(digest), "rb")
+
+    def local_path(self, digest: str) -> str:
+        return str(self._object(digest))
+
+    def get_result(self, digest: str, key: str) -> Dict | None:
+        try:
+            result = json.loads(self._result(digest, key).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        self._touch(self._object(digest))
+        return result
+
+    def put_result(self, digest: str, key: str, result: Dict):
+        tmp = self._tmp / f"{uuid.uuid4().hex}.json"
+        tmp.write_text(json.dumps(result, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        self._publish(tmp, self._result(digest, key))
+
+    def delete(self, digest: str):
+        self._object(digest).unlink(missing_ok=True)
+        for p in (self.root / "results" / digest[:2]).glob(f"{digest}.*.json"):
+            p.unlink(missing_ok=True)
+
+    def _touch(self, path: Path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # pruned meanwhile
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._pruned_at < self.prune_interval or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            self._pruned_at = now
+            self.prune()
+        finally:
+            self._prune_lock.release()
+
+    def prune(self) -> int:
+        now = time.time()
+        objs = []
+        for p in (self.root / "objects").glob("*/*"):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            objs.append((st.st_mtime, st.st_size, p.name))
+        objs.sort()  # least recently used first
+        total, removed = sum(size for _, size, _ in objs), 0
+        for mtime, size, digest in objs:
+            expired = self.max_age is not None and now - mtime > self.max_age
+            if not expired and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            self.delete(digest)
+            total -= size
+            removed += 1
+        # parts left by crashed writers
+        for p in self._tmp.iterdir():
+            try:
+                if now - p.stat().st_mtime > 3600:
+                    p.unlink()
+            except FileNotFoundError:
+                pass
+        return removed
+
+_stores: Dict[str, FileStore] = {}
+_lock = threading.Lock()
+
+def get_file_store() -> FileStore:
+    """The configured store (FILE_STORE_BACKEND / FILE_STORE_DIR / FILE_STORE_*), one per location."""
+    if settings.FILE_STORE_BACKEND != "local":
+        raise RuntimeError(f"Unknown FILE_STORE_BACKEND {settings.FILE_STORE_BACKEND!r}")
+    with _lock:
+        store = _stores.get(settings.FILE_STORE_DIR)
+        if store is None:
+            store = _stores[settings.FILE_STORE_DIR] = LocalFileStore(
+                settings.FILE_STORE_DIR, max_age=settings.FILE_STORE_TTL,
+                max_bytes=int(settings.FILE_STORE_MAX_MB * 2**20), prune_interval=settings.FILE_STORE_PRUNE_INTERVAL)
+        return store
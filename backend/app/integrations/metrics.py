@@ -0,0 +1,219 @@
+from __future__ import annotations
+import bisect, threading, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+from app.config.settings import settings
+
+# In-process metrics in the Prometheus text format (served by /metrics, no client
+# library or collector needed), plus a per-request stage breakdown for the
+# Server-Timing header. Each worker process has its own registry.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for lv, v in sorted(self._values.items()):
+                out.append(f"{self.name}{_labels(self.label_names, lv)} {v}")
+        return out
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = BUCKETS):
+        self.name, self.help, self.label_names = name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(label_values)
+            if s is None:
+                s = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((lv, list(counts), total) for lv, (counts, total) in self._series.items())
+        for lv, counts, total in series:
+            cum = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                cum += n
+                le_label = 'le="+Inf"' if le == float("inf") else f'le="{le!r}"'
+                out.append(f"{self.name}_bucket{_labels(self.label_names, lv, le_label)} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, lv)} {total}")
+            out.append(f"{self.name}_count{_labels(self.label_names, lv)} {cum}")
+        return out
+
+class Collected:
+    """
+    Counter or gauge whose values live elsewhere (e.g. a cache's own counters): `source`
+    returns {label values: value} and is read at scrape time, so nothing is recorded twice.
+    """
+    def __init__(self, name: str, help: str, type: str = "counter", labels: Sequence[str] = ()):
+        self.name, self.help, self.type, self.label_names = name, help, type, tuple(labels)
+        self.source: Callable[[], Dict[Tuple[str, ...], float]] | None = None
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        values = self.source() if self.source is not None else {}
+        for lv, v in sorted(values.items()):
+            out.append(f"{self.name}{_labels(self.label_names, lv)} {v}")
+        return out
+
+STAGE_LABELS = ("stage", "backend", "retriever")
+STAGE_SECONDS = Histogram("medbot_stage_seconds", "Time spent per request stage.", STAGE_LABELS)
+STAGE_ERRORS = Counter("medbot_stage_errors_total", "Stages that raised.", STAGE_LABELS)
+REQUESTS = Counter("medbot_requests_total", "HTTP requests by route and status.", ("method", "path", "status"))
+REQUEST_SECONDS = Histogram("medbot_request_seconds", "HTTP request duration by route.", ("method", "path"))
+SINGLEFLIGHT = Counter("medbot_llm_singleflight_total",
+                       "Non-streaming LLM calls: leader (went upstream) or coalesced (shared a leader's call).",
+                       ("backend", "role"))
+WRITE_BEHIND_DROPPED = Counter("medbot_write_behind_dropped_rows_total",
+                               "Rows the write-behind queue could not insert (sent to its dead-letter file).",
+                               ("queue",))
+# semantic answer cache (app/services/answer_cache.py); sources bound in app/main.py
+ANSWER_CACHE_EVENTS = Collected("medbot_answer_cache_events_total",
+                                "Answer cache lookups (hit, semantic_hit, miss) and removals (eviction, invalidation); "
+                                "hit includes semantic_hit.", "counter", ("event",))
+ANSWER_CACHE_SIZE = Collected("medbot_answer_cache_size", "Answer cache entries and approximate bytes held.",
+                              "gauge", ("unit",))
+METRICS = [STAGE_SECONDS, STAGE_ERRORS, REQUESTS, REQUEST_SECONDS, SINGLEFLIGHT, WRITE_BEHIND_DROPPED,
+           ANSWER_CACHE_EVENTS, ANSWER_CACHE_SIZE]
+
+def render() -> str:
+    return "\n".join(line for m in METRICS for line in m.render()) + "\n"
+
+# ---- per-request stage timings ----
+# list of (stage, seconds) for the current request; None outside a request
+_timings: ContextVar[List[Tuple[str, float]] | None] = ContextVar("stage_timings", default=None)
+# returns the request's (backend, retriever) labels; evaluated per stage, since the
+# retriever can finish loading (or be swapped) while a request is running
+_labels_var: ContextVar[Callable[[], Tuple[str, str]] | None] = ContextVar("stage_labels", default=None)
+# set inside collect(): timings go back to the caller instead of into this registry
+_deferred: ContextVar[bool] = ContextVar("stage_deferred", default=False)
+
+def record(stage: str, seconds: float, error: bool = False, backend: str = None, retriever: str = None):
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+    if _deferred.get() or not settings.METRICS_ENABLED:
+        return
+    labels_fn = _labels_var.get()
+    default_backend, default_retriever = labels_fn() if labels_fn is not None else ("none", "none")
+    labels = (stage, backend or default_backend, retriever or default_retriever)
+    STAGE_SECONDS.observe(seconds, *labels)
+    if error:
+        STAGE_ERRORS.inc(*labels)
+
+@contextmanager
+def stage(name: str, **labels):
+    t0 = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(name, time.perf_counter() - t0, error, **labels)
+
+class TimedIter:
+    """Wraps an iterator and adds up the time spent producing items (e.g. parsing)."""
+    def __init__(self, it: Iterable):
+        self._it = iter(it)
+        self.seconds = 0.0
+
+    def __iter__(self) -> Iterator:
+        return self
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            return next(self._it)
+        finally:
+            self.seconds += time.perf_counter() - t0
+
+def collect(fn: Callable, *args):
+    """Runs fn in a pool worker; returns (result, stage timings) for merge() in the caller."""
+    timings: List[Tuple[str, float]] = []
+    t, d = _timings.set(timings), _deferred.set(True)
+    try:
+        return fn(*args), timings
+    finally:
+        _timings.reset(t)
+        _deferred.reset(d)
+
+def merge(timings: Iterable[Tuple[str, float]]):
+    for name, seconds in timings:
+        record(name, seconds)
+
+def server_timing(timings: Iterable[Tuple[str, float]], total: float) -> str:
+    per_stage: Dict[str, float] = {}
+    for name, seconds in timings:
+        per_stage[name] = per_stage.get(name, 0.0) + seconds
+    per_stage["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in per_stage.items())
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware: counts and times requests by route, and adds a Server-Timing
+    header with the stages recorded before the response started. `labels` returns the
+    (backend, retriever) labels for the request's stages.
+    """
+    def __init__(self, app, labels: Callable[[], Tuple[str, str]] = None):
+        self.app = app
+        self.labels = labels
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        tokens = [(_timings, _timings.set(timings))]
+        if self.labels is not None:
+            tokens.append((_labels_var, _labels_var.set(self.labels)))
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if settings.SERVER_TIMING:
+                    header = server_timing(timings, time.perf_counter() - t0)
+                    message = {**message, "headers": list(message.get("headers", [])) +
+                               [(b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # route templates only, so unknown paths cannot blow up label cardinality
+            path = getattr(route, "path", "unmatched")
+            REQUESTS.inc(scope["method"], path, str(status[0]))
+            REQUEST_SECONDS.observe(time.perf_counter() - t0, scope["method"], path)
+            for var, token in reversed(tokens):
+                var.reset(token)
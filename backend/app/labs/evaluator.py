@@ -1,10 +1,11 @@
 from __future__ import annotations
-import io, csv, json, re
-from typing import List, Dict
+import hashlib, json, re, time
+from typing import BinaryIO, List, Dict
 from pathlib import Path
-from pdf2image import convert_from_bytes
-import pytesseract
-from PIL import Image
+from app.config.settings import settings
+from app.integrations.metrics import TimedIter, record
+from .ocr import ocr_pdf_pages
+from .streaming import iter_file_chunks, iter_csv_records, iter_fhir_records
 
 DISCLAIMER = "This is educational information only and not medical advice."
 
@@ -15,41 +16,36 @@ if REF_PATH.exists():
         REFS = json.load(f)
 else:
     REFS = {}
+# bump when parsing/scoring output changes: cached upload results are keyed on it
+RESULT_VERSION = 1
+REFS_DIGEST = hashlib.sha256(REF_PATH.read_bytes()).hexdigest()[:12] if REF_PATH.exists() else "none"
 
+def result_cache_key(kind: str) -> str:
+    """Key for an upload's cached parse + score result: what produced it, besides the bytes."""
+    key = f"{kind}-v{RESULT_VERSION}-refs{REFS_DIGEST}"
+    if kind == "pdf":
+        key += f"-ocr{settings.OCR_DPI}{'g' if settings.OCR_GRAYSCALE else 'c'}{settings.OCR_LANG}"
+    return key
+
+# Whole-upload wrappers over the incremental parsers in streaming.py
 def parse_csv_bytes(b: bytes) -> List[Dict]:
-    text = b.decode("utf-8")
-    rows = list(csv.DictReader(io.StringIO(text)))
-    return rows
+    return list(iter_csv_records([b]))
 
 def parse_fhir_bytes(b: bytes) -> List[Dict]:
-    bundle = json.loads(b.decode("utf-8"))
-    out = []
-    for entry in bundle.get("entry", []):
-        res = entry.get("resource", {})
-        if res.get("resourceType") == "Observation" and "valueQuantity" in res:
-            code = None
-            codings = res.get("code", {}).get("coding", [])
-            if codings:
-                code = codings[0].get("display") or codings[0].get("code")
-            out.append({
-                "test_name": code or res.get("code", {}).get("text", "Unknown"),
-                "value": res["valueQuantity"].get("value"),
-                "unit": res["valueQuantity"].get("unit"),
-                "sex": None,
-                "age": None,
-            })
-    return out
-
-def parse_pdf_bytes(b: bytes) -> List[Dict]:
+    return list(iter_fhir_records([b]))
+
+def parse_pdf_bytes(b: bytes | str, dpi: int = None, grayscale: bool = None) -> List[Dict]:
     """
     Convert PDF (including scanned) into structured lab test results.
     Looks for lines like 'Glucose 180 mg/dL' or 'Hemoglobin: 13.5 g/dL'
+    Pages are rendered and OCR'd one at a time (see labs/ocr.py).
+    Also takes a path, so a stored upload is OCR'd without reading it into memory.
     """
     records = []
-    pages = convert_from_bytes(b)
+    t0 = time.perf_counter()
+    pages = TimedIter(ocr_pdf_pages(b, dpi=dpi, grayscale=grayscale))
 
-    for page in pages:
-        text = pytesseract.image_to_string(page)
+    for text in pages:
         for line in text.splitlines():
             match = re.match(r"([A-Za-z0-9 \-\(\)\/]+)[: ]+([\d\.]+)\s*([A-Za-z\/\^\%\d]+)?", line)
             if match:
@@ -66,6 +62,8 @@ def parse_pdf_bytes(b: bytes) -> List[Dict]:
                     })
                 except ValueError:
                     continue
+    record("ocr", pages.seconds)
+    record("parse", time.perf_counter() - t0 - pages.seconds)
     return records
 
 def normalize_and_score(rows: List[Dict]) -> Dict:
@@ -111,3 +109,29 @@ def normalize_and_score(rows: List[Dict]) -> Dict:
             flagged.append(f"{name}: {value}{unit} ({status})")
 
     return {"per_test": per_test, "flagged": flagged, "disclaimer": DISCLAIMER}
+
+def encode_per_test(scored: Dict) -> Dict:
+    # a big per_test list is cheaper to hand back from a worker as one JSON string,
+    # and the event loop never has to walk it to build the response
+    return {**scored, "rows": len(scored["per_test"]),
+            "per_test": json.dumps(scored["per_test"], ensure_ascii=False, separators=(",", ":"))}
+
+def score_lab_file(src: str | BinaryIO, is_csv: bool, chunk_size: int, max_bytes: int, max_rows: int) -> Dict:
+    """
+    Streams a CSV/FHIR upload (path or binary file object) into normalize_and_score;
+    per_test comes back JSON-encoded (see encode_per_test). Module-level with plain
+    arguments so it can run in a process pool.
+    """
+    fh = open(src, "rb") if isinstance(src, str) else src
+    try:
+        parse = iter_csv_records if is_csv else iter_fhir_records
+        # parsing and scoring interleave row by row; time spent producing rows is "parse"
+        records = TimedIter(parse(iter_file_chunks(fh, chunk_size, max_bytes), max_rows=max_rows))
+        t0 = time.perf_counter()
+        scored = normalize_and_score(records)
+        record("parse", records.seconds)
+        record("score", time.perf_counter() - t0 - records.seconds)
+        return encode_per_test(scored)
+    finally:
+        if fh is not src:
+            fh.close()
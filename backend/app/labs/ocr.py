@@ -0,0 +1,153 @@
+from __future__ import annotations
+import hashlib, io, os, tempfile, time
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+from app.config.settings import settings
+
+# Page-streaming OCR: each page is rendered on its own (first_page == last_page) and
+# OCR'd in a worker, so at most OCR_WORKERS page images exist at once. Pages are
+# submitted in a window of 2 x OCR_WORKERS ahead of the one being yielded, so a long
+# PDF neither queues every page up front nor piles up text nobody has read. Text is cached
+# on disk by a hash of the rendered page, which worker processes share; re-uploads
+# and repeated pages skip Tesseract. The cache holds patient data, so it is bounded:
+# prune_cache() (run after a PDF, at most every _PRUNE_INTERVAL seconds) drops entries
+# unused for OCR_CACHE_TTL, then least recently used ones beyond OCR_CACHE_MAX_MB.
+# pdf2image, PIL and pytesseract (which pulls in pandas) are imported on first use,
+# not when the app starts.
+_pool: ProcessPoolExecutor | None = None
+_PRUNE_INTERVAL = 300
+_pruned_at = 0.0
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a threaded server process is unsafe
+        _pool = ProcessPoolExecutor(max_workers=settings.OCR_WORKERS, mp_context=mp.get_context("spawn"))
+    return _pool
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+def page_hash(img) -> str:
+    h = hashlib.sha256(f"{img.mode}:{img.size}:{settings.OCR_LANG}".encode("utf-8"))
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+def _cache_path(key: str) -> Path | None:
+    if not settings.OCR_CACHE_DIR:
+        return None
+    return Path(settings.OCR_CACHE_DIR) / key[:2] / f"{key}.txt"
+
+def render_page(pdf_path: str, page: int, dpi: int, grayscale: bool):
+    from pdf2image import convert_from_path
+    return convert_from_path(pdf_path, dpi=dpi, first_page=page, last_page=page, grayscale=grayscale)[0]
+
+def image_to_text(img) -> str:
+    import pytesseract
+    return pytesseract.image_to_string(img, lang=settings.OCR_LANG)
+
+def ocr_page(pdf_path: str, page: int, dpi: int, grayscale: bool) -> str:
+    """Render one 1-based page and return its text, from the cache when possible."""
+    img = render_page(pdf_path, page, dpi, grayscale)
+    try:
+        cached = _cache_path(page_hash(img))
+        if cached is not None and cached.exists():
+            try:
+                text = cached.read_text(encoding="utf-8")
+                os.utime(cached)  # a hit counts as a use for the LRU bound
+                return text
+            except FileNotFoundError:
+                pass  # pruned meanwhile
+        text = image_to_text(img)
+        if cached is not None:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, cached)
+        return text
+    finally:
+        img.close()
+
+def ocr_pdf_pages(src: bytes | str, dpi: int = None, grayscale: bool = None) -> Iterator[str]:
+    """Yields the OCR text of each page of a PDF (bytes, or a path), in page order."""
+    dpi = dpi or settings.OCR_DPI
+    grayscale = settings.OCR_GRAYSCALE if grayscale is None else grayscale
+    from pypdf import PdfReader
+    n_pages = len(PdfReader(src if isinstance(src, str) else io.BytesIO(src)).pages)
+    # workers render from a path, so the PDF bytes are not pickled per page
+    path = src
+    if not isinstance(src, str):
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(src)
+    try:
+        pages = range(1, n_pages + 1)
+        if settings.OCR_WORKERS > 1 and n_pages > 1:
+            yield from _windowed(path, pages, dpi, grayscale, window=2 * settings.OCR_WORKERS)
+        else:
+            for p in pages:
+                yield ocr_page(path, p, dpi, grayscale)
+    finally:
+        if path is not src:
+            os.unlink(path)
+        _maybe_prune()
+
+def _windowed(path: str, pages: range, dpi: int, grayscale: bool, window: int) -> Iterator[str]:
+    # in page order; at most `window` pages submitted and not yet yielded
+    pool, todo, pending = get_pool(), iter(pages), deque()
+    try:
+        for p in todo:
+            pending.append(pool.submit(ocr_page, path, p, dpi, grayscale))
+            if len(pending) == window:
+                break
+        while pending:
+            text = pending.popleft().result()
+            p = next(todo, None)
+            if p is not None:
+                pending.append(pool.submit(ocr_page, path, p, dpi, grayscale))
+            yield text
+    finally:
+        # consumer stopped early (or a page failed): drop pages not started yet
+        for f in pending:
+            f.cancel()
+
+def prune_cache(max_age: float = None, max_bytes: int = None) -> int:
+    """Applies the OCR cache bounds (settings by default); returns the number of entries deleted."""
+    if not settings.OCR_CACHE_DIR:
+        return 0
+    max_age = settings.OCR_CACHE_TTL if max_age is None else max_age
+    max_bytes = int(settings.OCR_CACHE_MAX_MB * 2**20) if max_bytes is None else max_bytes
+    now, entries = time.time(), []
+    for p in Path(settings.OCR_CACHE_DIR).glob("*/*"):
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            continue
+        if p.suffix == ".tmp":
+            # an entry being written; removed only if its writer died long ago
+            if now - st.st_mtime > 3600:
+                p.unlink(missing_ok=True)
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+    entries.sort()  # least recently used first
+    total, removed = sum(size for _, size, _ in entries), 0
+    for mtime, size, p in entries:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    return removed
+
+def _maybe_prune():
+    global _pruned_at
+    now = time.monotonic()
+    if now - _pruned_at >= _PRUNE_INTERVAL:
+        _pruned_at = now
+        prune_cache()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+import numpy as np
+from app.integrations.metrics import stage
+from .evaluator import REFS, DISCLAIMER
+from .streaming import iter_csv_records, iter_file_chunks, iter_fhir_records
+
+# Vectorized counterpart of evaluator.normalize_and_score for cohort rescoring.
+# Reference ranges are compiled into (test x sex) arrays; rows are classified with
+# array lookups and comparisons instead of a dict walk per row.
+STATUSES = ("unknown", "low", "normal", "high")
+UNKNOWN, LOW, NORMAL, HIGH = range(4)
+SEX_CODES = {"male": 1, "female": 2}  # 0: missing or anything else
+_READ_CHUNK = 1 << 18
+
+@dataclass
+class RefTables:
+    index: Dict[str, int]     # test name -> row
+    low: np.ndarray           # (tests, 3) float64, NaN where no range applies
+    high: np.ndarray
+    reference: np.ndarray     # (tests, 3) object, display string or None
+
+def compile_refs(refs: Dict) -> RefTables:
+    n = len(refs)
+    low = np.full((n, 3), np.nan)
+    high = np.full((n, 3), np.nan)
+    reference = np.full((n, 3), None, dtype=object)
+    index = {}
+    for i, (name, entry) in enumerate(refs.items()):
+        index[name] = i
+        if not isinstance(entry, dict):
+            continue
+        unit = entry.get("unit", "")
+        # a "general" range wins over sex-specific ones and applies to every sex
+        if "general" in entry:
+            cols = {0: entry["general"], 1: entry["general"], 2: entry["general"]}
+        else:
+            cols = {code: entry[sex] for sex, code in SEX_CODES.items() if sex in entry}
+        for c, (lo, hi) in cols.items():
+            low[i, c], high[i, c] = lo, hi
+            reference[i, c] = f"{lo}–{hi} {unit}"
+    return RefTables(index, low, high, reference)
+
+TABLES = compile_refs(REFS)
+
+def _encode(values: Sequence[str], mapping: Dict[str, int], normalize, missing: int) -> np.ndarray:
+    # normalize/look up each distinct value once; the per-row pass is a C-level dict get
+    if isinstance(values, np.ndarray):
+        values = values.tolist()
+    codes = {v: mapping.get(normalize(v), missing) for v in set(values)}
+    return np.fromiter(map(codes.__getitem__, values), dtype=np.int64, count=len(values))
+
+def encode(names: Sequence[str], sexes: Sequence[str], tables: RefTables = None):
+    """Test rows (-1 for names without a reference range) and sex codes."""
+    tables = tables or TABLES
+    return _encode(names, tables.index, str.strip, -1), _encode(sexes, SEX_CODES, lambda s: s.strip().lower(), 0)
+
+def classify(test: np.ndarray, sex: np.ndarray, values: np.ndarray, tables: RefTables = None) -> np.ndarray:
+    """Status codes for already-encoded rows; pure array ops."""
+    tables = tables or TABLES
+    values = np.asarray(values, dtype=np.float64)
+    lo = np.full(len(values), np.nan)
+    hi = np.full(len(values), np.nan)
+    known = test >= 0
+    lo[known] = tables.low[test[known], sex[known]]
+    hi[known] = tables.high[test[known], sex[known]]
+    # NaN comparisons are False, so a NaN value reads as normal, as in the scalar scorer
+    return np.where(np.isnan(lo), UNKNOWN, np.where(values < lo, LOW, np.where(values > hi, HIGH, NORMAL)))
+
+def score_arrays(names: Sequence[str], values, sexes: Sequence[str], tables: RefTables = None):
+    """Classify columns of rows at once. Returns (status codes, test rows, sex codes)."""
+    test, sex = encode(names, sexes, tables)
+    return classify(test, sex, values, tables), test, sex
+
+def _per_test(rows: List[Dict], tables: RefTables) -> List[Dict]:
+    names = [(r.get("test_name") or "").strip() for r in rows]
+    values = np.fromiter((float(r.get("value", 0)) for r in rows), dtype=np.float64, count=len(rows))
+    units = [(r.get("unit") or "").strip() for r in rows]
+    sexes = [r.get("sex") or "" for r in rows]
+    status, test, sex = score_arrays(names, values, sexes, tables)
+    refs = np.full(len(rows), None, dtype=object)
+    known = test >= 0
+    refs[known] = tables.reference[test[known], sex[known]]
+    return [{"test_name": name, "value": value, "unit": unit, "status": STATUSES[st], "reference": ref}
+            for name, value, unit, st, ref in zip(names, values.tolist(), units, status.tolist(), refs.tolist())]
+
+def _flagged(per_test: List[Dict]) -> List[str]:
+    return [f"{t['test_name']}: {t['value']}{t['unit']} ({t['status']})"
+            for t in per_test if t["status"] in ("low", "high")]
+
+def normalize_and_score_many(rows: List[Dict], tables: RefTables = None) -> Dict:
+    """Same result as evaluator.normalize_and_score(rows)."""
+    per_test = _per_test(rows, tables or TABLES)
+    return {"per_test": per_test, "flagged": _flagged(per_test), "disclaimer": DISCLAIMER}
+
+def parse_lab_file(filename: str, content_type: str | None, data: bytes | str,
+                   max_rows: int | None = None) -> List[Dict]:
+    """Lab records of a CSV/FHIR file given as bytes or as a path (streamed from disk)."""
+    is_csv = content_type == "text/csv" or (filename or "").lower().endswith(".csv")
+    parse = iter_csv_records if is_csv else iter_fhir_records
+    if isinstance(data, bytes):
+        return list(parse([data], max_rows=max_rows))
+    with open(data, "rb") as fh:
+        return list(parse(iter_file_chunks(fh, _READ_CHUNK), max_rows=max_rows))
+
+def score_files(files: Iterable[Tuple[str, str | None, bytes | str]], block_size: int = 256,
+                tables: RefTables = None, max_rows: int | None = None) -> Iterator[Dict]:
+    """
+    Scores (filename, content type, bytes or path) per patient file, one vectorized pass
+    per block of files, and yields one result per file in input order. A file over
+    `max_rows` gets an error line, like any other unreadable file.
+    """
+    tables = tables or TABLES
+    block: List[Tuple[str, List[Dict] | None, str | None]] = []
+
+    def flush():
+        rows = [r for _, parsed, _ in block if parsed for r in parsed]
+        with stage("score"):
+            per_test = _per_test(rows, tables) if rows else []
+        pos = 0
+        for name, parsed, error in block:
+            if error is not None:
+                yield {"file": name, "error": error}
+                continue
+            mine = per_test[pos:pos + len(parsed)]
+            pos += len(parsed)
+            yield {"file": name, "summary": mine, "flagged": _flagged(mine), "disclaimer": DISCLAIMER}
+        block.clear()
+
+    for name, content_type, data in files:
+        try:
+            with stage("parse"):
+                parsed = parse_lab_file(name, content_type, data, max_rows)
+            # validate values here so one bad file does not fail its whole block
+            for r in parsed:
+                float(r.get("value", 0))
+            block.append((name, parsed, None))
+        except Exception as e:
+            block.append((name, None, f"{type(e).__name__}: {e}"))
+        if len(block) >= block_size:
+            yield from flush()
+    yield from flush()
+
+def score_file_block(files: List[Tuple[str, str | None, bytes | str]], max_rows: int | None = None) -> List[Dict]:
+    """One block of score_files, as a single pool job (pass paths: only they are pickled)."""
+    return list(score_files(files, block_size=max(1, len(files)), max_rows=max_rows))
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import codecs, csv, json
+from typing import BinaryIO, Dict, Iterable, Iterator
+
+# Incremental CSV / FHIR parsers: read an upload in chunks and yield lab records one
+# at a time, so memory stays flat regardless of upload size.
+
+class UploadLimitError(ValueError):
+    """Upload exceeds UPLOAD_MAX_MB or UPLOAD_MAX_ROWS."""
+
+def iter_file_chunks(fh: BinaryIO, chunk_size: int = 1 << 18, max_bytes: int | None = None) -> Iterator[bytes]:
+    total = 0
+    while True:
+        chunk = fh.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise UploadLimitError(f"upload exceeds {max_bytes} bytes")
+        yield chunk
+
+def _decoded(chunks: Iterable[bytes]) -> Iterator[str]:
+    dec = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        text = dec.decode(chunk)
+        if text:
+            yield text
+    tail = dec.decode(b"", final=True)
+    if tail:
+        yield tail
+
+def _lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    # split on "\n" only, keeping it, as io.StringIO does for csv
+    rest = ""
+    for text in _decoded(chunks):
+        parts = (rest + text).split("\n")
+        rest = parts.pop()
+        for p in parts:
+            yield p + "\n"
+    if rest:
+        yield rest
+
+def _limit_rows(records: Iterator[Dict], max_rows: int | None) -> Iterator[Dict]:
+    for n, rec in enumerate(records, 1):
+        if max_rows is not None and n > max_rows:
+            raise UploadLimitError(f"upload exceeds {max_rows} rows")
+        yield rec
+
+def iter_csv_records(chunks: Iterable[bytes], max_rows: int | None = None) -> Iterator[Dict]:
+    return _limit_rows(iter(csv.DictReader(_lines(chunks))), max_rows)
+
+def observation_record(entry: Dict) -> Dict | None:
+    res = entry.get("resource", {})
+    if res.get("resourceType") == "Observation" and "valueQuantity" in res:
+        code = None
+        codings = res.get("code", {}).get("coding", [])
+        if codings:
+            code = codings[0].get("display") or codings[0].get("code")
+        return {
+            "test_name": code or res.get("code", {}).get("text", "Unknown"),
+            "value": res["valueQuantity"].get("value"),
+            "unit": res["valueQuantity"].get("unit"),
+            "sex": None,
+            "age": None,
+        }
+    return None
+
+class _JsonStream:
+    """Cursor over decoded text that pulls more chunks when a value runs past the buffer."""
+    _WS = " \t\n\r"
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._texts = _decoded(chunks)
+        self._decoder = json.JSONDecoder()
+        self.buf, self.pos, self.eof = "", 0, False
+
+    def _more(self) -> bool:
+        if self.eof:
+            return False
+        if self.pos > (1 << 16) and self.pos > len(self.buf) // 2:
+            self.buf, self.pos = self.buf[self.pos:], 0
+        try:
+            self.buf += next(self._texts)
+        except StopIteration:
+            self.eof = True
+        return not self.eof
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in self._WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                raise ValueError("unexpected end of JSON")
+
+    def expect(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} at offset {self.pos}, got {self.buf[self.pos]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                val, end = self._decoder.raw_decode(self.buf, self.pos)
+                # a number cut at the buffer edge decodes "successfully"; make sure it ended
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return val
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # double the pending text per retry so a value spanning many chunks costs O(n)
+            pending = len(self.buf) - self.pos
+            while len(self.buf) - self.pos < 2 * pending and self._more():
+                pass
+
+def iter_fhir_entries(chunks: Iterable[bytes]) -> Iterator[Dict]:
+    """Yields Bundle.entry[] items one at a time; other top-level keys are skipped."""
+    s = _JsonStream(chunks)
+    s.expect("{")
+    if s.peek() == "}":
+        return
+    while True:
+        key = s.value()
+        s.expect(":")
+        if key == "entry" and s.peek() == "[":
+            s.expect("[")
+            if s.peek() != "]":
+                while True:
+                    yield s.value()
+                    if s.peek() == "]":
+                        break
+                    s.expect(",")
+            s.expect("]")
+        else:
+            s.value()
+        if s.peek() == "}":
+            return
+        s.expect(",")
+
+def iter_fhir_records(chunks: Iterable[bytes], max_rows: int | None = None) -> Iterator[Dict]:
+    records = (rec for rec in map(observation_record, iter_fhir_entries(chunks)) if rec is not None)
+    return _limit_rows(records, max_rows)
@@ -1,52 +1,377 @@
-from fastapi import FastAPI, UploadFile, File
+import asyncio, hmac, json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List
+import time
+from fastapi import FastAPI, Header, Request, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from .config.settings import settings
-from .services.retrieval import InMemoryRetriever
-from .services.generation import generate_answer_with_disclaimer, generate_patient_answer
-from .labs.evaluator import parse_csv_bytes, parse_fhir_bytes, normalize_and_score
+from .services.retrieval import get_retriever, corpus_fingerprint
+from .services.retriever_handle import RetrieverHandle
+from .services.generation import (
+    DISCLAIMER, backend_name, generate_answer_with_disclaimer, generate_patient_answer, stream_answer, stream_patient_answer,
+    is_error_answer,
+)
+from .services.context_builder import build_context
+from .services.batch_chat import answer_batch, retrieve_batch
+from .services.answer_cache import SemanticAnswerCache, CacheLookup
+from .services.llm_clients import aclose_clients
+from .services.executor import Overloaded, get_pool, shutdown_pools
+from .integrations import metrics
+from .integrations.metrics import MetricsMiddleware, stage
+from .integrations.file_store import StoredFile, get_file_store
+from .labs.evaluator import normalize_and_score, parse_pdf_bytes, score_lab_file, encode_per_test, result_cache_key
+from .labs.streaming import UploadLimitError, iter_file_chunks
+from .labs.ocr import shutdown_pool as shutdown_ocr_pool
+from .db.session import close_write_behind
+from .api.v1.routes import chat as chat_routes
+from .labs.scoring import score_file_block
 
-app = FastAPI(title="Medical Assistant Chatbot (Sprint 2 Starter)" )
+# ---- retriever: versioned handle, loaded and warmed up after launch, hot-swapped on change ----
+def _warm_up(r):
+    # first query pays for lazy allocations (BM25 scoring, encoder graph, index pages)
+    r.retrieve(settings.WARMUP_QUERY, k=settings.TOP_K)
+    if getattr(r, "embed", None) is not None:
+        r.embed([settings.WARMUP_QUERY])
 
-retriever = InMemoryRetriever()  # local stub index
+def _build_retriever():
+    # an index reload keeps the live encoder instead of loading the model again
+    return get_retriever(reuse=retrievers.current)
+
+retrievers = RetrieverHandle(_build_retriever, fingerprint=corpus_fingerprint, warm_up=_warm_up)
+startup = {"ready": False, "error": None, "warmup_seconds": None}
+
+async def _startup_task():
+    t0 = time.perf_counter()
+    try:
+        await run_in_threadpool(retrievers.ensure_loaded)
+        startup["ready"] = True
+    except Exception as e:
+        startup["error"] = f"{type(e).__name__}: {e}"
+    startup["warmup_seconds"] = round(time.perf_counter() - t0, 3)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm up in the background so the server accepts connections (and /health) at once;
+    # /ready turns 200 when the retriever has answered its first query
+    tasks = []
+    if settings.STARTUP_WARMUP:
+        tasks.append(asyncio.create_task(_startup_task()))
+    else:
+        startup["ready"] = True  # the retriever loads on the first request instead
+    if settings.RETRIEVER_WATCH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(retrievers.watch(settings.RETRIEVER_WATCH_INTERVAL)))
+    yield
+    for t in tasks:
+        t.cancel()
+    retrievers.close()
+    # release pooled keep-alive connections to Ollama / Mistral
+    await aclose_clients()
+    shutdown_pools()
+    shutdown_ocr_pool()
+    # chat turns / file metadata still queued for the database
+    close_write_behind()
+
+app = FastAPI(title="Medical Assistant Chatbot (Sprint 2 Starter)", lifespan=lifespan)
+# stored chat history (GET /api/v1/chat/history); the other api/v1 routers are still placeholders
+app.include_router(chat_routes.router, prefix="/api/v1/chat", tags=["chat"])
+
+def _metric_labels():
+    # (backend, retriever) labels for this request's stage metrics
+    return backend_name(), getattr(retrievers.current, "kind", "none")
+
+def _overloaded_response(exc: Overloaded) -> JSONResponse:
+    return JSONResponse({"detail": str(exc)}, status_code=503,
+                        headers={"Retry-After": str(max(1, round(exc.retry_after)))})
+
+@app.exception_handler(Overloaded)
+async def overloaded(request: Request, exc: Overloaded):
+    # shed load quickly instead of queueing without bound
+    return _overloaded_response(exc)
+
+# routes whose pool is checked before the request body is read: parsing a large
+# multipart upload on the event loop only to reject it would defeat the point
+_ADMISSION = {"/upload": "labs", "/upload/batch": "labs"}
+
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    name = _ADMISSION.get(request.url.path)
+    pool = get_pool(name) if name is not None else None
+    if pool is not None and pool.full():
+        pool.rejected += 1
+        return _overloaded_response(Overloaded(name, pool.retry_after))
+    return await call_next(request)
+
+# outermost, so shed requests are counted too
+app.add_middleware(MetricsMiddleware, labels=_metric_labels)
+
+def _embed_queries(texts):
+    # reuse the retriever's encoder (FAISS mode); exact-match only otherwise
+    with retrievers.acquire() as r:
+        embed = getattr(r, "embed", None)
+        return embed(texts) if embed else None
+
+answer_cache = SemanticAnswerCache(
+    embed=_embed_queries,
+    # the retriever version the handle publishes after each reload: an attribute read, so
+    # the exact-match lookup on the event loop never stats the corpus files
+    fingerprint=lambda: retrievers.version,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    max_bytes=int(settings.ANSWER_CACHE_MAX_MB * 1024 * 1024),
+    ttl=settings.ANSWER_CACHE_TTL,
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    check_interval=settings.ANSWER_CACHE_CHECK_INTERVAL,
+)
+# read at scrape time: /metrics shows whether the cache pays for itself
+metrics.ANSWER_CACHE_EVENTS.source = lambda: {(e,): n for e, n in answer_cache.events().items()}
+metrics.ANSWER_CACHE_SIZE.source = lambda: {(u,): answer_cache.stats()[u] for u in ("entries", "bytes")}
+
+# ---- liveness / readiness / metrics ----
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    if startup["ready"]:
+        return {"status": "ready", "warmup_seconds": startup["warmup_seconds"], "retriever": retrievers.stats()}
+    status = "failed" if startup["error"] else "starting"
+    return JSONResponse({"status": status, **startup}, status_code=503)
+
+# ---- admin ----
+@app.post("/admin/reload-index")
+async def reload_index(x_admin_token: str | None = Header(default=None)):
+    """Loads the current index/KB files into a new retriever version and swaps it in."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled (ADMIN_TOKEN unset)")
+    # constant-time compare (bytes: compare_digest rejects non-ASCII str)
+    if not hmac.compare_digest((x_admin_token or "").encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+    try:
+        version = await run_in_threadpool(retrievers.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"reload failed, still serving version "
+                                                    f"{retrievers.version}: {e}")
+    return {"version": version, **retrievers.stats()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 class ChatRequest(BaseModel):
     message: str
+    stream: bool = False  # opt-in server-sent events
+
+def _sse(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _sse_answer(tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    # token events as they arrive, then the disclaimer as the final event
+    try:
+        async for tok in tokens:
+            yield _sse({"token": tok})
+    except Exception as e:
+        yield _sse({"error": str(e)}, event="error")
+    yield _sse({"disclaimer": DISCLAIMER}, event="disclaimer")
+
+def _event_stream(tokens: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(_sse_answer(tokens), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ---- answer cache helpers ----
+async def _cache_lookup(namespace: str, message: str) -> CacheLookup | None:
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    async with retrievers.aacquire() as r:
+        semantic = getattr(r, "embed", None) is not None
+    if not semantic:
+        return answer_cache.lookup(namespace, message)  # exact match only: cheap
+    # semantic lookup encodes the query; keep the encoder off the event loop
+    return await get_pool("retrieval").run(answer_cache.lookup, namespace, message)
+
+def _remember(lookup: CacheLookup | None, answer: str):
+    if lookup is not None and not is_error_answer(answer):
+        answer_cache.store(lookup, answer)
+
+async def _replay(answer: str) -> AsyncIterator[str]:
+    yield answer.removesuffix(f"\n\n{DISCLAIMER}")
+
+async def _remember_stream(lookup: CacheLookup | None, tokens: AsyncIterator[str]) -> AsyncIterator[str]:
+    parts = []
+    async for tok in tokens:
+        parts.append(tok)
+        yield tok
+    _remember(lookup, f"{''.join(parts)}\n\n{DISCLAIMER}")
 
 @app.post("/chat")
 async def chat(req: ChatRequest):
+    lookup = await _cache_lookup("chat", req.message)
+    if lookup is not None and lookup.answer is not None:
+        return _event_stream(_replay(lookup.answer)) if req.stream else lookup.answer
     # 1) retrieve KB passages
-    docs = retriever.retrieve(req.message, k=settings.TOP_K)
-    # 2) generate answer from docs (local simple generator with disclaimer)
-    result = generate_answer_with_disclaimer(req.message, docs, temperature=settings.TEMPERATURE)
+    async with retrievers.aacquire() as r:
+        with stage("retrieve"):
+            docs = await r.aretrieve(req.message, k=settings.TOP_K)
+    # 2) merge/dedupe passages into a budgeted, citation-tagged context
+    with stage("context"):
+        context = build_context(req.message, docs).text
+    # 3) generate answer from the context (local simple generator with disclaimer)
+    if req.stream:
+        return _event_stream(_remember_stream(lookup, stream_answer(req.message, context, temperature=settings.TEMPERATURE)))
+    result = await generate_answer_with_disclaimer(req.message, context, temperature=settings.TEMPERATURE)
+    _remember(lookup, result)
     return result
 
+class ChatBatchRequest(BaseModel):
+    questions: List[str]
+
+@app.post("/chat/batch")
+async def chat_batch(req: ChatBatchRequest):
+    """
+    Answers many questions with one bulk retrieval; streams one NDJSON line per
+    question as its answer completes (lines carry "index" into the request list).
+    """
+    if len(req.questions) > settings.CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"at most {settings.CHAT_BATCH_MAX_QUESTIONS} questions per batch")
+
+    # retrieval runs before the response starts, so a full retrieval pool still gets a 503
+    async with retrievers.aacquire() as r:
+        docs = await retrieve_batch(req.questions, r)
+
+    async def lines():
+        async for result in answer_batch(req.questions, docs):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.post("/patient-chat")
 async def patient_chat(req: ChatRequest):
-    result = generate_patient_answer(
+    lookup = await _cache_lookup("patient-chat", req.message)
+    if lookup is not None and lookup.answer is not None:
+        if req.stream:
+            return _event_stream(_replay(lookup.answer))
+        return {"answer": lookup.answer}
+    if req.stream:
+        return _event_stream(_remember_stream(lookup, stream_patient_answer(req.message, temperature=settings.TEMPERATURE)))
+    result = await generate_patient_answer(
         req.message, temperature=settings.TEMPERATURE
     )
+    _remember(lookup, result)
     return {"answer": result}
 
 
+def _store_upload(file: UploadFile) -> StoredFile:
+    # hashed while streamed to the store in UPLOAD_CHUNK_KB reads, never whole in memory
+    chunks = iter_file_chunks(file.file, settings.UPLOAD_CHUNK_KB * 1024, int(settings.UPLOAD_MAX_MB * 2**20))
+    return get_file_store().put_chunks(chunks)
+
+def _score_pdf(path: str) -> dict:
+    rows = parse_pdf_bytes(path)
+    with stage("score"):
+        scored = normalize_and_score(rows)
+    return encode_per_test(scored)
+
+async def _score_upload(file: UploadFile) -> tuple[dict, bool]:
+    """Returns (encoded score result, whether it came from the result cache)."""
+    kind = "pdf" if file.content_type == "application/pdf" else "csv" if file.content_type == "text/csv" else "fhir"
+    pool = get_pool("ocr" if kind == "pdf" else "labs")
+    release = pool.admit()  # reject before storing anything
+    held = True
+    try:
+        with stage("store"):
+            stored = await run_in_threadpool(_store_upload, file)
+        store, key = get_file_store(), result_cache_key(kind)
+        if settings.UPLOAD_RESULT_CACHE:
+            cached = await run_in_threadpool(store.get_result, stored.digest, key)
+            if cached is not None:
+                if kind != "pdf" and cached["rows"] > settings.UPLOAD_MAX_ROWS:
+                    await run_in_threadpool(store.delete, stored.digest)
+                    raise UploadLimitError(f"upload exceeds {settings.UPLOAD_MAX_ROWS} rows")
+                return cached, True
+        # workers read the stored object by path: no temp copy, nothing pickled but the path
+        path = store.local_path(stored.digest)
+        # the scoring job owns the slot now: a caller that goes away does not free it early
+        held = False
+        try:
+            if kind == "pdf":
+                scored = await pool.run(_score_pdf, path, admitted=True)
+            else:
+                scored = await pool.run(score_lab_file, path, kind == "csv", settings.UPLOAD_CHUNK_KB * 1024,
+                                        int(settings.UPLOAD_MAX_MB * 2**20), settings.UPLOAD_MAX_ROWS, admitted=True)
+        except Exception as e:
+            # rejected or unreadable uploads are not kept (a copy another upload shares is,
+            # unless the limit rejects it for everyone)
+            if stored.created or isinstance(e, UploadLimitError):
+                await run_in_threadpool(store.delete, stored.digest)
+            raise
+        if settings.UPLOAD_RESULT_CACHE:
+            await run_in_threadpool(store.put_result, stored.digest, key, scored)
+        return scored, False
+    finally:
+        if held:
+            release()
+
 @app.post("/upload")
 async def upload(file: UploadFile = File(...)):
-    if file.content_type == "text/csv":
-        records = parse_csv_bytes(await file.read()) 
-    else:
-        records = parse_fhir_bytes(await file.read())
-
-    scored = normalize_and_score(records)
+    try:
+        scored, cached = await _score_upload(file)
+    except UploadLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
 
     if scored["flagged"]:
         summary_text = "The following results are outside normal ranges:\n" + "\n".join(scored["flagged"])
-        explanation = generate_patient_answer(summary_text, temperature=settings.TEMPERATURE)
+        explanation = await generate_patient_answer(summary_text, temperature=settings.TEMPERATURE)
     else:
         explanation = "All uploaded results appear within the normal reference ranges. " \
                       "This is not a diagnosis. Please consult a healthcare provider."
 
-    return {
-        "summary": scored["per_test"],
-        "explanation": explanation,
-        "disclaimer": scored["disclaimer"]
-    }
+    # a JSONResponse is encoded with json.dumps directly, skipping FastAPI's jsonable_encoder walk
+    return JSONResponse({"summary": json.loads(scored["per_test"]), "explanation": explanation,
+                         "disclaimer": scored["disclaimer"]},
+                        headers={"X-Upload-Cache": "hit" if cached else "miss"})
+
+@app.post("/upload/batch")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """
+    Scores many patients' CSV/FHIR files without LLM explanations (cohort rescoring).
+    Streams one NDJSON line per file, in upload order.
+    """
+    if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"batch exceeds {settings.UPLOAD_BATCH_MAX_FILES} files")
+    # uploads are closed once this handler returns, so store them (streamed, under
+    # UPLOAD_MAX_MB each) before streaming; workers read them back by path
+    store, stored = get_file_store(), []
+    try:
+        with stage("store"):
+            for f in files:
+                stored.append(await run_in_threadpool(_store_upload, f))
+    except UploadLimitError as e:
+        for s in stored:
+            if s.created:
+                await run_in_threadpool(store.delete, s.digest)
+        raise HTTPException(status_code=413, detail=f"{files[len(stored)].filename}: {e}")
+    blobs = [(f.filename, f.content_type, store.local_path(s.digest)) for f, s in zip(files, stored)]
+    pool = get_pool("labs")
+    block = settings.LAB_BATCH_BLOCK
+    # the first block runs before the response starts, so an overloaded pool still gets a 503
+    first = await pool.run(score_file_block, blobs[:block], settings.UPLOAD_MAX_ROWS)
+
+    async def rest_block(files):
+        # mid-stream there is no status code left to send: wait for capacity instead
+        while True:
+            try:
+                return await pool.run(score_file_block, files, settings.UPLOAD_MAX_ROWS)
+            except Overloaded as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def lines():
+        results = first
+        for i in range(block, len(blobs) + block, block):
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            if i < len(blobs):
+                results = await rest_block(blobs[i:i + block])
 
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
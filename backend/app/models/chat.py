@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Index, Integer, Text
+from app.db.base import Base
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+
+    id = Column(Integer, primary_key=True)
+    sender_id = Column(Integer, nullable=False)
+    receiver_id = Column(Integer, nullable=True)  # None: message to the AI assistant
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # one per side of the history UNION; (created_at, id) is the keyset cursor
+    __table_args__ = (
+        Index("ix_chat_messages_sender_created_id", "sender_id", "created_at", "id"),
+        Index("ix_chat_messages_receiver_created_id", "receiver_id", "created_at", "id"),
+    )
@@ -0,0 +1,12 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+from app.db.base import Base
+
+class FileMeta(Base):
+    __tablename__ = "file_meta"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
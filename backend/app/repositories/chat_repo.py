@@ -1,9 +1,43 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import or_, select, union
 from sqlalchemy.orm import Session
+from app.db.write_behind import WriteBehindQueue
 from app.models.chat import ChatMessage
 
+# History pages are newest first and keyset-paginated on (created_at, id): the cursor
+# is the last message of the previous page, so every page is an index range scan,
+# however deep the user scrolls.
+# Rows queued for write-behind are keyed ("chat", user id) for both sender and receiver:
+# a history read waits only while that user has messages in the queue (their own sends,
+# or messages to them), never for other users' traffic.
+
+def history_key(user_id: int) -> tuple:
+    return ("chat", user_id)
+
+def encode_cursor(message: ChatMessage) -> str:
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, message_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(message_id)
+    except ValueError as e:  # covers bad base64, bad UTF-8 and a malformed payload
+        raise ValueError(f"invalid history cursor: {cursor!r}") from e
+
+def require_writer(repo) -> WriteBehindQueue:
+    if repo.writer is None:
+        raise RuntimeError(f"{type(repo).__name__} has no write-behind queue: construct it with "
+                           "writer=app.db.session.get_write_behind() to use enqueue_*")
+    return repo.writer
+
 class ChatRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, writer: WriteBehindQueue = None):
         self.db = db
+        self.writer = writer
 
     def create_message(self, message: ChatMessage):
         self.db.add(message)
@@ -11,7 +45,52 @@ class ChatRepository:
         self.db.refresh(message)
         return message
 
+    async def enqueue_message(self, sender_id: int, receiver_id: Optional[int], content: str) -> dict:
+        """Write-behind insert: returns once queued (no id yet); the writer bulk-inserts it shortly."""
+        row = {"sender_id": sender_id, "receiver_id": receiver_id, "content": content,
+               "created_at": datetime.utcnow()}  # stamped now, not at flush time
+        keys = {history_key(sender_id)} | ({history_key(receiver_id)} if receiver_id is not None else set())
+        await require_writer(self).aput(ChatMessage.__table__, row, keys=keys)
+        return row
+
+    def _settle(self, user_id: int):
+        # a user's own just-sent messages must show up in their history
+        if self.writer is not None:
+            self.writer.flush(key=history_key(user_id))
+
+    def _side(self, column, user_id: int, before: Optional[Tuple[datetime, int]], limit: Optional[int]):
+        # one branch of the UNION: served by the (column, created_at, id) index
+        q = select(ChatMessage.id, ChatMessage.created_at).where(column == user_id)
+        if before is not None:
+            ts, message_id = before
+            # (created_at, id) < cursor, with a plain range on created_at for the index
+            q = q.where(ChatMessage.created_at <= ts,
+                        or_(ChatMessage.created_at < ts, ChatMessage.id < message_id))
+        if limit is not None:
+            q = q.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit)
+            q = select(q.subquery())  # SQLite only allows LIMIT in a UNION member via a subquery
+        return q
+
+    def _history_keys(self, user_id: int, before=None, limit: int = None):
+        # UNION rather than OR, so each side uses its own index (and self-messages appear once)
+        return union(self._side(ChatMessage.sender_id, user_id, before, limit),
+                     self._side(ChatMessage.receiver_id, user_id, before, limit)).subquery()
+
     def get_messages_for_user(self, user_id: int):
-        return self.db.query(ChatMessage).filter(
-            (ChatMessage.sender_id == user_id) | (ChatMessage.receiver_id == user_id)
-        ).order_by(ChatMessage.created_at).all()
+        """Full history, oldest first. Loads everything: prefer get_history_page."""
+        self._settle(user_id)
+        keys = self._history_keys(user_id)
+        return self.db.query(ChatMessage).join(keys, ChatMessage.id == keys.c.id) \
+            .order_by(ChatMessage.created_at, ChatMessage.id).all()
+
+    def get_history_page(self, user_id: int, limit: int = 50,
+                         cursor: Optional[str] = None) -> Tuple[List[ChatMessage], Optional[str]]:
+        """Up to `limit` messages older than `cursor` (newest first), and the cursor for the next page."""
+        before = decode_cursor(cursor) if cursor else None
+        self._settle(user_id)
+        # each side fetches limit + 1, so the page size alone tells whether more remain
+        keys = self._history_keys(user_id, before, limit + 1)
+        rows = self.db.query(ChatMessage).join(keys, ChatMessage.id == keys.c.id) \
+            .order_by(keys.c.created_at.desc(), keys.c.id.desc()).limit(limit + 1).all()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
@@ -1,9 +1,13 @@
+from datetime import datetime
 from sqlalchemy.orm import Session
+from app.db.write_behind import WriteBehindQueue
 from app.models.file import FileMeta
+from app.repositories.chat_repo import require_writer
 
 class FileRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, writer: WriteBehindQueue = None):
         self.db = db
+        self.writer = writer
 
     def create_file(self, file: FileMeta):
         self.db.add(file)
@@ -11,7 +15,16 @@ class FileRepository:
         self.db.refresh(file)
         return file
 
+    async def enqueue_file(self, user_id: int, filename: str, content_type: str) -> dict:
+        """Write-behind insert of one file's metadata (see ChatRepository.enqueue_message)."""
+        row = {"user_id": user_id, "filename": filename, "content_type": content_type,
+               "created_at": datetime.utcnow()}
+        await require_writer(self).aput(FileMeta.__table__, row, keys=[("files", user_id)])
+        return row
+
     def get_files_for_user(self, user_id: int):
+        if self.writer is not None:
+            self.writer.flush(key=("files", user_id))  # include this user's uploads still queued
         return self.db.query(FileMeta).filter(FileMeta.user_id == user_id).all()
 
     def get_file_by_id(self, file_id: int):
@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class MessageCreate(BaseModel):
     sender_id: int
@@ -8,6 +9,11 @@ class MessageCreate(BaseModel):
 
 class MessageRead(MessageCreate):
     id: int
+    created_at: datetime
 
     class Config:
         orm_mode = True
+
+class MessagePage(BaseModel):
+    messages: List[MessageRead]  # newest first
+    next_cursor: Optional[str]   # pass back as ?cursor= for older messages; None on the last page
@@ -0,0 +1,175 @@
+from __future__ import annotations
+import re, threading, time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable
+import numpy as np
+
+_PUNCT_RE = re.compile(r"[\s?!.,;:]+$")
+_WS_RE = re.compile(r"\s+")
+
+def normalize_query(q: str) -> str:
+    return _PUNCT_RE.sub("", _WS_RE.sub(" ", q.strip().lower()))
+
+@dataclass
+class _Entry:
+    answer: str
+    emb: np.ndarray | None
+    expires: float
+    size: int
+
+@dataclass
+class CacheLookup:
+    namespace: str
+    key: str
+    emb: np.ndarray | None
+    answer: str | None = None
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on the normalized query, with a cosine-similarity fallback
+    over query embeddings (when an `embed` function is available).
+
+    - LRU eviction bounded by entry count and approximate bytes
+    - per-entry TTL
+    - cleared whenever `fingerprint()` changes (index / KB rebuilt), checked at most every `check_interval` s
+    """
+    def __init__(self,
+                 embed: Callable[[list[str]], np.ndarray | None] | None = None,
+                 fingerprint: Callable[[], Hashable] | None = None,
+                 max_entries: int = 2048,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600.0,
+                 threshold: float = 0.95,
+                 check_interval: float = 5.0):
+        self.embed = embed
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        # per-namespace (keys, matrix, expiry times) of stored embeddings, rebuilt lazily after writes
+        self._matrix: dict[str, tuple[list[tuple[str, str]], np.ndarray, np.ndarray]] = {}
+        self._version = fingerprint() if fingerprint else None
+        self._checked_at = time.monotonic()
+        self.hits = self.semantic_hits = self.misses = self.evictions = self.invalidations = 0
+
+    # ---- public API ----
+    def lookup(self, namespace: str, query: str) -> CacheLookup:
+        self._check_version()
+        key = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            e = self._get_live((namespace, key), now)
+            if e is not None:
+                self.hits += 1
+                return CacheLookup(namespace, key, e.emb, e.answer)
+        emb = self._embed(key)
+        if emb is not None:
+            with self._lock:
+                best = self._nearest(namespace, emb, now)
+                if best is not None:
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return CacheLookup(namespace, key, emb, best.answer)
+        with self._lock:
+            self.misses += 1
+        return CacheLookup(namespace, key, emb)
+
+    def store(self, lookup: CacheLookup, answer: str):
+        size = len(answer.encode("utf-8")) + len(lookup.key) + (lookup.emb.nbytes if lookup.emb is not None else 0) + 200
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            k = (lookup.namespace, lookup.key)
+            if k in self._entries:
+                self._drop(k)
+            self._entries[k] = _Entry(answer, lookup.emb, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            self._matrix.pop(lookup.namespace, None)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def events(self) -> dict:
+        """Lookup and removal counts, keyed like the metrics' event label."""
+        with self._lock:
+            return {"hit": self.hits, "semantic_hit": self.semantic_hits, "miss": self.misses,
+                    "eviction": self.evictions, "invalidation": self.invalidations}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits,
+                    "semantic_hits": self.semantic_hits, "misses": self.misses,
+                    "evictions": self.evictions, "invalidations": self.invalidations}
+
+    # ---- internals ----
+    def _check_version(self):
+        if self.fingerprint is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        version = self.fingerprint()
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def _embed(self, key: str) -> np.ndarray | None:
+        if self.embed is None:
+            return None
+        emb = self.embed([key])
+        if emb is None:
+            return None
+        return np.asarray(emb, dtype="float32").reshape(-1)
+
+    def _get_live(self, k, now: float) -> _Entry | None:
+        e = self._entries.get(k)
+        if e is None:
+            return None
+        if e.expires < now:
+            self._drop(k)
+            return None
+        self._entries.move_to_end(k)
+        return e
+
+    def _nearest(self, namespace: str, emb: np.ndarray, now: float) -> _Entry | None:
+        cached = self._matrix.get(namespace)
+        if cached is None:
+            keys = [k for k, e in self._entries.items() if k[0] == namespace and e.emb is not None]
+            if not keys:
+                return None
+            cached = (keys, np.stack([self._entries[k].emb for k in keys]),
+                      np.array([self._entries[k].expires for k in keys]))
+            self._matrix[namespace] = cached
+        keys, mat, expires = cached
+        expired = np.flatnonzero(expires < now)
+        if expired.size:
+            # evict before matching, so an expired best match cannot hide a live runner-up
+            for j in expired:
+                self._drop(keys[j])
+            return self._nearest(namespace, emb, now)
+        if mat.shape[1] != emb.shape[0]:
+            return None
+        sims = mat @ emb   # embeddings are L2-normalized, so this is cosine similarity
+        i = int(np.argmax(sims))
+        if sims[i] < self.threshold:
+            return None
+        return self._get_live(keys[i], now)
+
+    def _drop(self, k):
+        e = self._entries.pop(k)
+        self._bytes -= e.size
+        self._matrix.pop(k[0], None)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+import asyncio
+from typing import AsyncIterator, Dict, List
+from app.config.settings import settings
+from app.integrations.metrics import stage
+from .context_builder import build_context
+from .generation import generate_answer_with_disclaimer
+
+# Many questions in one call (FAQ precomputation, evaluation sweeps): one bulk retrieval
+# (a single encode + matrix index.search with FAISS), then generation fanned out under a
+# per-batch limit, yielding results as they complete.
+
+async def _answer(i: int, question: str, docs: List[Dict], limit: asyncio.Semaphore, temperature: float) -> Dict:
+    async with limit:
+        try:
+            with stage("context"):
+                ctx = build_context(question, docs)
+            answer = await generate_answer_with_disclaimer(question, ctx.text, temperature=temperature)
+        except Exception as e:
+            return {"index": i, "question": question, "error": f"{type(e).__name__}: {e}"}
+    return {"index": i, "question": question, "answer": answer,
+            "sources": [c["label"] for c in ctx.citations]}
+
+async def retrieve_batch(questions: List[str], retriever) -> List[List[Dict]]:
+    with stage("retrieve"):
+        return await retriever.aretrieve_many(questions, k=settings.TOP_K)
+
+async def answer_batch(questions: List[str], docs: List[List[Dict]], concurrency: int = None,
+                       temperature: float = None) -> AsyncIterator[Dict]:
+    """Yields {"index", "question", "answer", "sources"} (or "error") per question, in completion order."""
+    # below the process-wide LLM_MAX_CONCURRENCY, so one batch cannot take every upstream slot
+    limit = asyncio.Semaphore(max(1, concurrency or settings.CHAT_BATCH_CONCURRENCY))
+    temperature = settings.TEMPERATURE if temperature is None else temperature
+    tasks = [asyncio.create_task(_answer(i, q, d, limit, temperature))
+             for i, (q, d) in enumerate(zip(questions, docs))]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        # client went away (or the consumer stopped early): drop the rest
+        for t in tasks:
+            t.cancel()
@@ -0,0 +1,158 @@
+from __future__ import annotations
+import asyncio, queue, threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+_STOP = object()
+
+class _Bulk(list):
+    """Items queued together by submit_many."""
+
+class MicroBatcher:
+    """
+    Gathers items submitted concurrently (from threads or coroutines) and runs
+    `fn(items) -> results` once per batch on a dedicated worker thread.
+    A batch closes at `max_batch` items or `max_wait` seconds after its first item.
+    `submit_many` hands over a whole list at once: it runs as one `fn` call on the
+    same thread, so `fn` never runs concurrently with itself.
+    """
+    def __init__(self, fn: Callable[[list], list], max_batch: int = 32, max_wait: float = 0.002,
+                 name: str = "micro-batcher"):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._q: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        self._ensure_started()
+        fut: Future = Future()
+        self._q.put((item, fut))
+        return fut
+
+    def submit_many(self, items: list) -> Future:
+        """Future of `fn(items)`, run as its own batch (not split by max_batch or merged)."""
+        fut: Future = Future()
+        if not items:
+            fut.set_result([])
+            return fut
+        self._ensure_started()
+        self._q.put((_Bulk(items), fut))
+        return fut
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    async def asubmit(self, item: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(item))
+
+    async def asubmit_many(self, items: list) -> list:
+        return await asyncio.wrap_future(self.submit_many(items))
+
+    def close(self):
+        if self._thread is not None:
+            self._q.put(_STOP)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            first = self._q.get()
+            if first is _STOP:
+                return
+            if isinstance(first[0], _Bulk):
+                self._execute_bulk(*first)
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop, bulk = False, None
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    nxt = self._q.get(timeout=timeout) if timeout > 0 else self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                if isinstance(nxt[0], _Bulk):
+                    bulk = nxt  # closes this batch; runs right after it
+                    break
+                batch.append(nxt)
+            # callers that gave up (cancelled futures) are dropped from the batch
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if batch:
+                self._execute(batch)
+            if bulk is not None:
+                self._execute_bulk(*bulk)
+            if stop:
+                return
+
+    def _execute(self, batch: list[tuple[Any, Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = self.fn([item for item, _ in batch])
+        except BaseException as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for (_, fut), res in zip(batch, results):
+            fut.set_result(res)
+
+    def _execute_bulk(self, items: "_Bulk", fut: Future):
+        if not fut.set_running_or_notify_cancel():
+            return
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = self.fn(list(items))
+        except BaseException as e:
+            fut.set_exception(e)
+            return
+        fut.set_result(results)
+
+class LRUCache:
+    """Small thread-safe LRU map."""
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+import hashlib, itertools, json, os, shutil, uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+# Append-only chunk store replacing one .txt file per chunk:
+#   chunks.idx.jsonl     header line {"data": "<data file>"}, then one record per chunk:
+#                        id, file, source, url, offset, length, chars, page_start,
+#                        page_end, sha256
+#   chunks.<gen>.bin     UTF-8 chunk texts, back to back (chunks.bin in headerless stores)
+# Text is appended (and flushed) before its index line, so a crash mid-write leaves at
+# worst a torn last line or unreferenced bytes; readers skip both. Because the index
+# names its data file, a rebuilt store is published by renaming one file (replace_store).
+DATA_NAME = "chunks.bin"
+INDEX_NAME = "chunks.idx.jsonl"
+_READ_BUFFER = 1 << 20
+# record fields the writer derives from the text (the rest is caller metadata)
+STORED_FIELDS = ("offset", "length", "chars", "sha256")
+
+def _header(line: bytes) -> str | None:
+    """Data file name if `line` is a complete index header line."""
+    try:
+        rec = json.loads(line)
+    except ValueError:
+        return None
+    if line.endswith(b"\n") and isinstance(rec, dict) and "data" in rec and "offset" not in rec:
+        return rec["data"]
+    return None
+
+class ChunkStore:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.index_path = self.root / INDEX_NAME
+
+    @property
+    def data_path(self) -> Path:
+        """The data file the index currently points at."""
+        try:
+            with open(self.index_path, "rb") as f:
+                name = _header(f.readline())
+        except FileNotFoundError:
+            name = None
+        return self.root / (name or DATA_NAME)
+
+    def exists(self) -> bool:
+        return self.index_path.exists() and self.data_path.exists()
+
+    def _scan(self) -> Tuple[Path, List[Dict], int]:
+        """Data file, valid index records and the byte length of the index lines holding
+        them (header included; 0 when there is no usable index)."""
+        data_path, out, end = self.root / DATA_NAME, [], 0
+        if not self.index_path.exists():
+            return data_path, out, end
+        with open(self.index_path, "rb") as f:
+            first = f.readline()
+            name = _header(first)
+            if name:
+                data_path, end, lines = self.root / name, len(first), f
+            else:
+                lines = itertools.chain([first], f)
+            if not data_path.exists():
+                return data_path, out, end
+            size = data_path.stat().st_size
+            for line in lines:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break  # torn final line
+                if not line.endswith(b"\n") or rec["offset"] + rec["length"] > size:
+                    break
+                out.append(rec)
+                end += len(line)
+        return data_path, out, end
+
+    def records(self) -> List[Dict]:
+        return self._scan()[1]
+
+    def __len__(self) -> int:
+        return len(self.records())
+
+    def iter_chunks(self) -> Iterator[Tuple[Dict, str]]:
+        """(record, text) in append order, streamed through one buffered handle."""
+        data_path, recs, _ = self._scan()
+        if not recs:
+            return
+        with open(data_path, "rb", buffering=_READ_BUFFER) as f:
+            pos = 0
+            for rec in recs:
+                if rec["offset"] != pos:
+                    f.seek(rec["offset"])
+                data = f.read(rec["length"])
+                pos = rec["offset"] + rec["length"]
+                yield rec, data.decode("utf-8")
+
+    def read(self, rec: Dict) -> str:
+        with open(self.data_path, "rb") as f:
+            f.seek(rec["offset"])
+            return f.read(rec["length"]).decode("utf-8")
+
+    def writer(self) -> "ChunkWriter":
+        return ChunkWriter(self)
+
+class ChunkWriter:
+    """Appends chunks; use as a context manager."""
+    def __init__(self, store: ChunkStore):
+        self.store = store
+        store.root.mkdir(parents=True, exist_ok=True)
+        data_path, recs, index_end = store._scan()
+        data_end = recs[-1]["offset"] + recs[-1]["length"] if recs else 0
+        self.count = len(recs)
+        self._offset = data_end
+        self._index = open(store.index_path, "ab")
+        if index_end == 0:
+            # new store: a data file name of its own, so replace_store never overwrites
+            # the data file a reader of the previous index is using
+            data_path = store.root / f"chunks.{uuid.uuid4().hex[:12]}.bin"
+            self._index.truncate(0)
+            self._index.write((json.dumps({"data": data_path.name}) + "\n").encode("utf-8"))
+            self._index.flush()
+        else:
+            # drop a torn tail left by an interrupted writer before appending after it
+            self._index.truncate(index_end)
+        self._data = open(data_path, "ab")
+        self._data.truncate(data_end)
+
+    def append(self, text: str, **meta) -> Dict:
+        data = text.encode("utf-8")
+        self._data.write(data)
+        self._data.flush()
+        rec = dict(meta, offset=self._offset, length=len(data), chars=len(text),
+                   sha256=hashlib.sha256(data).hexdigest())
+        self._index.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._offset += len(data)
+        self.count += 1
+        return rec
+
+    def close(self):
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def replace_store(src: str | Path, dst: str | Path):
+    """
+    Publish a freshly written store into `dst`: its data file moves in under its own
+    name, then one rename swaps the index. Readers see the old or the new store, never
+    new data with an old index. The previous data file stays for readers still on the
+    old index; older ones are removed.
+    """
+    src, dst = Path(src), Path(dst)
+    dst.mkdir(parents=True, exist_ok=True)
+    previous = ChunkStore(dst).data_path.name
+    data = ChunkStore(src).data_path
+    os.replace(data, dst / data.name)
+    os.replace(src / INDEX_NAME, dst / INDEX_NAME)
+    shutil.rmtree(src, ignore_errors=True)
+    for p in dst.glob("chunks*.bin"):
+        if p.name not in (data.name, previous):
+            try:
+                p.unlink()
+            except OSError:
+                pass  # still open elsewhere (Windows); removed by the next rebuild
+
+def iter_legacy_chunks(chunk_dir: str | Path) -> Iterator[Tuple[Dict, str]]:
+    """(metadata, text) per legacy chunk .txt file, in manifest.jsonl order when there is one."""
+    chunk_dir = Path(chunk_dir)
+    listed = []
+    manifest = chunk_dir / "manifest.jsonl"
+    if manifest.exists():
+        with open(manifest, "r", encoding="utf-8") as f:
+            listed = [json.loads(line) for line in f if line.strip()]
+    seen = set()
+    for rec in listed:
+        p = chunk_dir / rec["file"]
+        if p.exists() and p.name not in seen:
+            seen.add(p.name)
+            yield {"id": rec["id"], "file": p.name, "source": rec.get("source", "gale_pdf"),
+                   "url": rec.get("url")}, p.read_text(encoding="utf-8")
+    for p in sorted(chunk_dir.glob("*.txt")):
+        if p.name not in seen:
+            yield {"id": p.stem, "file": p.name, "source": "gale_pdf", "url": None}, p.read_text(encoding="utf-8")
+
+def remove_legacy_chunks(chunk_dir: str | Path) -> int:
+    """Deletes the legacy .txt chunks and manifest.jsonl (once the store holds or replaces them)."""
+    chunk_dir = Path(chunk_dir)
+    files = list(chunk_dir.glob("*.txt"))
+    for p in files:
+        p.unlink()
+    (chunk_dir / "manifest.jsonl").unlink(missing_ok=True)
+    return len(files)
+
+def load_chunk_docs(chunk_dir: str | Path, id_prefix: str = "") -> List[Dict]:
+    """Retriever docs from the chunk store if present, else from the legacy *.txt files."""
+    chunk_dir = Path(chunk_dir)
+    store = ChunkStore(chunk_dir)
+    if store.exists():
+        return [{"id": id_prefix + rec["file"], "content": text, "source": rec.get("source", "gale_pdf"),
+                 "url": rec.get("url")} for rec, text in store.iter_chunks()]
+    docs = []
+    if chunk_dir.exists():
+        for p in sorted(chunk_dir.glob("*.txt")):
+            try:
+                docs.append({"id": id_prefix + p.name, "content": p.read_text(encoding="utf-8"), "source": "gale_pdf", "url": None})
+            except:
+                pass
+    return docs
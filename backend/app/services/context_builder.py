@@ -0,0 +1,143 @@
+from __future__ import annotations
+import math, re
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from app.config.settings import settings
+from .retrieval import tokenize
+
+# Turns retrieved docs into a compact, citation-tagged prompt context:
+# neighbouring chunks of one PDF are merged (dropping the overlap ingest_pdf.py repeats),
+# duplicate sentences are dropped, and the sentences that best match the query are kept
+# under a token budget, in reading order.
+
+_CHUNK_ID = re.compile(r"^(?P<stem>.*_chunk_)(?P<n>\d+)(?P<ext>\.txt)?$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+_WS = re.compile(r"\s+")
+MAX_SENTENCE_CHARS = 400
+MAX_OVERLAP_CHARS = 400
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English with BPE tokenizers; no tokenizer dependency
+    return max(1, math.ceil(len(text) / 4)) if text else 0
+
+@dataclass
+class Passage:
+    label: str
+    text: str
+    score: float
+    source: str | None = None
+    url: str | None = None
+    ids: List[str] = field(default_factory=list)
+
+@dataclass
+class BuiltContext:
+    text: str
+    citations: List[Dict]
+    tokens: int
+
+def _merge_text(a: str, b: str) -> str:
+    """Joins b after a, dropping the longest prefix of b that repeats a's tail."""
+    probe = b[:min(40, len(b))]
+    if not probe:
+        return a
+    start = max(0, len(a) - MAX_OVERLAP_CHARS)
+    i = a.find(probe, start)
+    while i != -1:
+        if b.startswith(a[i:]):
+            return a + b[len(a) - i:]
+        i = a.find(probe, i + 1)
+    return f"{a} {b}"
+
+def merge_chunks(docs: List[Dict]) -> List[Passage]:
+    """Merges runs of consecutive chunks (name_chunk_0023, _0024, ...) and drops exact duplicates."""
+    groups: Dict[Tuple[str, str | None], Dict[int, Dict]] = {}
+    singles: List[Dict] = []
+    for d in docs:
+        m = _CHUNK_ID.match(d.get("id") or "")
+        if m:
+            groups.setdefault((m["stem"], m["ext"]), {})[int(m["n"])] = d
+        else:
+            singles.append(d)
+    passages = [Passage(d.get("id") or "doc", d.get("content") or "", d.get("score") or 0.0,
+                        d.get("source"), d.get("url"), [d.get("id")]) for d in singles]
+    for (stem, ext), by_n in groups.items():
+        run: List[int] = []
+        for n in sorted(by_n) + [None]:
+            if run and (n is None or n != run[-1] + 1):
+                chunk = [by_n[i] for i in run]
+                text = chunk[0].get("content") or ""
+                for d in chunk[1:]:
+                    text = _merge_text(text.rstrip(), (d.get("content") or "").lstrip())
+                label = f"{stem}{run[0]:04d}" + (f"-{run[-1]:04d}" if len(run) > 1 else "")
+                passages.append(Passage(label, text, max(d.get("score") or 0.0 for d in chunk),
+                                        chunk[0].get("source"), chunk[0].get("url"), [d.get("id") for d in chunk]))
+                run = []
+            if n is not None:
+                run.append(n)
+    passages.sort(key=lambda p: -p.score)
+    seen, out = set(), []
+    for p in passages:
+        key = _WS.sub(" ", p.text).strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            out.append(p)
+    return out
+
+def split_sentences(text: str) -> List[str]:
+    out = []
+    for s in _SENTENCE_END.split(_WS.sub(" ", text).strip()):
+        # PDF text often runs on without punctuation; cap sentence length at word boundaries
+        while len(s) > MAX_SENTENCE_CHARS:
+            cut = s.rfind(" ", 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            out.append(s[:cut])
+            s = s[cut:].lstrip()
+        if s:
+            out.append(s)
+    return out
+
+def build_context(query: str, docs: List[Dict], token_budget: int = None) -> BuiltContext:
+    budget = settings.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    passages = merge_chunks(docs)
+    terms = set(tokenize(query))
+    # (score, passage rank, sentence position, text)
+    candidates: List[Tuple[float, int, int, str]] = []
+    seen = set()
+    for rank, p in enumerate(passages):
+        for pos, sent in enumerate(split_sentences(p.text)):
+            key = sent.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            words = tokenize(sent)
+            hits = len(terms.intersection(words))
+            # query-term coverage, lightly favouring short sentences and better-ranked passages
+            score = hits / math.log(len(words) + 2) + 0.1 / (rank + 1) if hits else 0.0
+            candidates.append((score, rank, pos, sent))
+    relevant = [c for c in candidates if c[0] > 0]
+    # nothing matches the query terms: fall back to leading sentences in rank order
+    pool = sorted(relevant, key=lambda c: (-c[0], c[1], c[2])) if relevant else \
+        sorted(candidates, key=lambda c: (c[2], c[1]))
+
+    chosen: Dict[int, List[Tuple[int, str]]] = {}
+    used = 0
+    for _, rank, pos, sent in pool:
+        cost = estimate_tokens(sent) + 1
+        if used + cost > budget:
+            continue
+        chosen.setdefault(rank, []).append((pos, sent))
+        used += cost
+
+    parts, citations = [], []
+    for rank in sorted(chosen):
+        p = passages[rank]
+        sents = sorted(chosen[rank])
+        body = sents[0][1]
+        for (prev, _), (pos, sent) in zip(sents, sents[1:]):
+            body += (" " if pos == prev + 1 else " … ") + sent
+        n = len(citations) + 1
+        citations.append({"n": n, "label": p.label, "ids": p.ids, "source": p.source, "url": p.url})
+        source = f" ({p.source})" if p.source else ""
+        parts.append(f"[{n}] {p.label}{source}: {body}")
+    text = "\n".join(parts)
+    return BuiltContext(text=text, citations=citations, tokens=estimate_tokens(text))
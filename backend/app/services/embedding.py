@@ -0,0 +1,82 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Callable, List
+import numpy as np
+from app.config.settings import settings
+
+# Sentence encoders for FAISS query and index embeddings. EMBED_MODEL is either a
+# sentence-transformers model name (PyTorch) or "onnx:<dir>", a directory written by
+# scripts/export_onnx_encoder.py: an int8-quantized transformer (model.onnx), its
+# tokenizer.json and encoder.json. The ONNX path needs onnxruntime + tokenizers only
+# and reproduces SentenceTransformer's pipeline: truncate, mean-pool, L2-normalize.
+
+ONNX_PREFIX = "onnx:"
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """Average of the token vectors under the attention mask (sentence-transformers 'mean' pooling)."""
+    mask = mask[..., None].astype(np.float32)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+class OnnxEncoder:
+    def __init__(self, model_dir: str | Path, threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        self.model_dir = Path(model_dir)
+        cfg = json.loads((self.model_dir / "encoder.json").read_text(encoding="utf-8"))
+        self.max_seq_length = int(cfg.get("max_seq_length", 256))
+        self.tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=int(cfg.get("pad_id", 0)))
+        opts = ort.SessionOptions()
+        # intra-op threads per session; 0 = onnxruntime's default (one per physical core)
+        opts.intra_op_num_threads = settings.ONNX_THREADS if threads is None else threads
+        opts.inter_op_num_threads = 1
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(self.model_dir / cfg.get("model", "model.onnx")),
+                                            sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.session.get_outputs()[0].shape[-1])
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer.encode_batch(texts)
+        ids = np.asarray([e.ids for e in enc], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in enc], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feed["token_type_ids"] = np.asarray([e.type_ids for e in enc], dtype=np.int64)
+        hidden = self.session.run(None, feed)[0]
+        return mean_pool(hidden, mask)
+
+    def encode(self, texts: List[str] | str, batch_size: int = 32, normalize_embeddings: bool = False,
+               progress: Callable[[int, int], None] | None = None, **_) -> np.ndarray:
+        """
+        SentenceTransformer.encode-compatible subset: float32 array, one row per text.
+        Nothing is printed (show_progress_bar is accepted and ignored); scripts pass
+        `progress(done, total)` to report batches.
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        # length-sorted batches pad less; rows are put back in input order
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        out = np.empty((len(texts), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            out[rows] = self._run([texts[i] for i in rows])
+            if progress is not None:
+                progress(min(start + batch_size, len(order)), len(order))
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+def load_encoder(name: str = None, threads: int = None):
+    """Encoder for EMBED_MODEL (or `name`): OnnxEncoder for "onnx:<dir>", else SentenceTransformer."""
+    name = name or settings.EMBED_MODEL
+    if name.startswith(ONNX_PREFIX):
+        return OnnxEncoder(name[len(ONNX_PREFIX):], threads=threads)
+    # torch + sentence_transformers are only imported when this backend is selected
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
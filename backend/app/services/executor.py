@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio, threading
+import multiprocessing as mp
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict
+from app.config.settings import settings
+from app.integrations.metrics import collect, merge
+
+# One bounded pool per workload class, so CPU-bound work never runs on the event loop
+# and one saturated class (e.g. uploads) cannot starve another (chat retrieval).
+# Admission is checked before submitting: at most `workers + queue` jobs per class are
+# running or waiting; beyond that the caller gets Overloaded straight away.
+
+class Overloaded(Exception):
+    def __init__(self, pool: str, retry_after: float):
+        super().__init__(f"{pool} pool is at capacity")
+        self.pool = pool
+        self.retry_after = retry_after
+
+class WorkPool:
+    def __init__(self, name: str, workers: int, queue: int, kind: str = "thread", retry_after: float = 1.0):
+        self.name, self.workers, self.queue, self.kind = name, workers, queue, kind
+        self.retry_after = retry_after
+        self.capacity = workers + queue
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                # spawn: forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=mp.get_context("spawn"))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix=f"{self.name}-pool")
+        return self._executor
+
+    def full(self) -> bool:
+        return self.pending >= self.capacity
+
+    def admit(self) -> Callable[[], None]:
+        """Takes a slot or raises Overloaded; returns the release callback."""
+        with self._lock:
+            if self.pending >= self.capacity:
+                self.rejected += 1
+                raise Overloaded(self.name, self.retry_after)
+            self.pending += 1
+        return self._release
+
+    def _release(self, _=None):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args, admitted: bool = False):
+        """
+        Runs fn(*args) in the pool. With `admitted`, the caller took a slot from admit()
+        earlier (e.g. before storing an upload) and hands it over to this job: from here
+        on the pool releases it, and the caller must not.
+        """
+        if not admitted:
+            self.admit()
+        try:
+            # stage timings recorded in the worker come back with the result
+            fut = self.executor.submit(collect, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # released when the job finishes, not when the caller stops waiting
+        fut.add_done_callback(self._release)
+        result, timings = await asyncio.wrap_future(fut)
+        merge(timings)
+        return result
+
+    def stats(self) -> dict:
+        return {"kind": self.kind, "workers": self.workers, "capacity": self.capacity,
+                "pending": self.pending, "rejected": self.rejected}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+_pools: Dict[str, WorkPool] = {}
+
+def _config(name: str) -> WorkPool:
+    if name == "retrieval":   # BM25 scoring, query embedding for the answer cache
+        return WorkPool(name, settings.POOL_RETRIEVAL_WORKERS, settings.POOL_RETRIEVAL_QUEUE, "thread",
+                        settings.POOL_RETRY_AFTER)
+    if name == "labs":        # CSV/FHIR parsing and scoring
+        return WorkPool(name, settings.POOL_LABS_WORKERS, settings.POOL_LABS_QUEUE, settings.POOL_LABS_KIND,
+                        settings.POOL_RETRY_AFTER)
+    if name == "ocr":         # drives the OCR process pool (labs/ocr.py), one PDF per worker
+        return WorkPool(name, settings.POOL_OCR_WORKERS, settings.POOL_OCR_QUEUE, "thread",
+                        settings.POOL_RETRY_AFTER)
+    raise KeyError(f"Unknown workload class {name!r}")
+
+def get_pool(name: str) -> WorkPool:
+    pool = _pools.get(name)
+    if pool is None:
+        pool = _pools[name] = _config(name)
+    return pool
+
+def pool_stats() -> dict:
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
+    _pools.clear()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+import struct, warnings
+from pathlib import Path
+import faiss, numpy as np
+
+# All index types use inner product over L2-normalized embeddings (= cosine).
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+
+def build_index(embs: np.ndarray, kind: str = "flat", nlist: int = 1024, hnsw_m: int = 32,
+                ef_construction: int = 200, pq_m: int = 48, pq_nbits: int = 8) -> faiss.Index:
+    """
+    Train (if needed) and fill an index of the given kind:
+    - flat:     exact exhaustive scan
+    - ivf_flat: inverted lists over `nlist` k-means cells, full vectors
+    - hnsw:     HNSW graph with `hnsw_m` links per node
+    - ivf_pq:   inverted lists with product-quantized codes (`pq_m` x `pq_nbits` bits)
+    Small corpora get a clamped nlist; ivf_pq degrades to ivf_flat if there are too
+    few vectors to train the PQ codebooks.
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type {kind!r}; expected one of {INDEX_TYPES}")
+    n, d = embs.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+    # faiss wants ~39 training points per centroid
+    nlist = max(1, min(nlist, n // 39))
+
+    if kind == "ivf_pq" and (d % pq_m or n < 2 ** pq_nbits):
+        warnings.warn(f"ivf_pq needs dim % pq_m == 0 and >= {2 ** pq_nbits} vectors; using ivf_flat", stacklevel=2)
+        kind = "ivf_flat"
+
+    if kind == "flat":
+        index = faiss.IndexFlatIP(d)
+    elif kind == "ivf_flat":
+        index = faiss.index_factory(d, f"IVF{nlist},Flat", metric)
+    elif kind == "hnsw":
+        index = faiss.index_factory(d, f"HNSW{hnsw_m},Flat", metric)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        index = faiss.index_factory(d, f"IVF{nlist},PQ{pq_m}x{pq_nbits}", metric)
+        # polysemous codes are unused at search time and dominate training time
+        index.do_polysemous_training = False
+
+    if not index.is_trained:
+        index.train(embs)
+    index.add(embs)
+    return index
+
+class MmapFlatIP:
+    """
+    Exact inner-product search over the build's memory-mapped embedding matrix.
+    Stands in for IndexFlatIP, which faiss 1.7.4 always copies onto the heap.
+    """
+    def __init__(self, embeddings_path: str | Path):
+        self.xb = np.load(embeddings_path, mmap_mode="r")
+        self.ntotal, self.d = self.xb.shape
+
+    def search(self, q: np.ndarray, k: int, params=None):
+        n = min(k, self.ntotal)
+        # like faiss: rows beyond ntotal are padded with id -1 and the lowest score
+        dist = np.full((len(q), k), -np.finfo(np.float32).max, dtype=np.float32)
+        ids = np.full((len(q), k), -1, dtype=np.int64)
+        if n:
+            scores = q @ self.xb.T
+            top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            dist[:, :n] = np.take_along_axis(top_scores, order, axis=1)
+            ids[:, :n] = np.take_along_axis(top, order, axis=1)
+        return dist, ids
+
+# IndexFlatIP file: fourcc, d, ntotal, 2 unused int64, is_trained, metric, float count, floats
+_FLAT_HEADER = struct.Struct("<4siqqq?iQ")
+
+def _flat_ip_vectors(path: Path) -> np.ndarray | None:
+    """The vectors stored in an IndexFlatIP file (read-only map), or None for other indexes."""
+    with open(path, "rb") as f:
+        head = f.read(_FLAT_HEADER.size)
+    if len(head) < _FLAT_HEADER.size:
+        return None
+    fourcc, d, ntotal, _, _, _, metric, count = _FLAT_HEADER.unpack(head)
+    if fourcc != b"IxFI" or metric != faiss.METRIC_INNER_PRODUCT or count != d * ntotal \
+            or path.stat().st_size != _FLAT_HEADER.size + 4 * count or not ntotal:
+        return None
+    return np.memmap(path, dtype="<f4", mode="r", offset=_FLAT_HEADER.size, shape=(ntotal, d))
+
+def _same_vectors(a: np.ndarray, b: np.ndarray, block_bytes: int = 1 << 26) -> bool:
+    if a.shape != b.shape:
+        return False
+    rows = max(1, block_bytes // (4 * a.shape[1]))
+    return all(np.array_equal(a[i:i + rows], b[i:i + rows]) for i in range(0, len(a), rows))
+
+def load_index(path: str | Path, mmap: bool = False, embeddings_path: str | Path | None = None):
+    """
+    Read an index; with `mmap` the file is mapped read-only so worker processes share
+    its pages through the OS page cache. faiss 1.7.4 only maps IVF inverted lists, so a
+    flat index is served from vector_embeddings.npy instead when that holds exactly the
+    index's vectors. The build replaces the two files one at a time, so a reload in
+    between must not pair an index with another build's vectors. The check reads both
+    files once, in blocks; any difference falls back to faiss.read_index.
+    """
+    path = Path(path)
+    if not mmap:
+        return faiss.read_index(str(path))
+    if embeddings_path and Path(embeddings_path).exists():
+        stored = _flat_ip_vectors(path)
+        if stored is not None:
+            flat = MmapFlatIP(embeddings_path)
+            same = _same_vectors(stored, flat.xb)
+            del stored  # only the .npy map is kept
+            if same:
+                return flat
+    return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+
+def index_kind(index) -> str:
+    if isinstance(index, MmapFlatIP):
+        return "flat"
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+def search_params(index: faiss.Index, kind: str, nprobe: int | None = None, ef_search: int | None = None):
+    """
+    Per-query search parameters: nprobe for IVF (SearchParametersIVF), None otherwise.
+    faiss 1.7.4 ignores SearchParametersHNSW, so efSearch is set on the index itself;
+    callers must not search the same HNSW index concurrently with different values
+    (FaissRetriever only searches from its batcher thread).
+    """
+    if kind in ("ivf_flat", "ivf_pq") and nprobe:
+        p = faiss.SearchParametersIVF()
+        p.nprobe = int(nprobe)
+        return p
+    if kind == "hnsw" and ef_search:
+        faiss.downcast_index(index).hnsw.efSearch = int(ef_search)
+    return None
+
+def index_nbytes(index: faiss.Index) -> int:
+    return int(faiss.serialize_index(index).nbytes)
@@ -1,15 +1,55 @@
-import requests
-from mistralai.client import MistralClient
-from mistralai.models.chat_completion import ChatMessage
+import time
+from typing import AsyncIterator
 from app.config.settings import settings
+from app.integrations.app_insights import log_event
+from app.integrations.metrics import record, stage
+from .llm_clients import ollama_generate, ollama_stream, mistral_chat, mistral_stream
 
 DISCLAIMER = (
     "This information is educational and not a diagnosis. "
     "If symptoms are severe or worsening, seek urgent medical care."
 )
 
+DOCTOR_SYSTEM = "You are a helpful medical assistant. Use provided context only."
+PATIENT_SYSTEM = ("You are a friendly medical assistant for patients. "
+                  "Answer clearly and simply in layman's terms.")
+
+def is_error_answer(text: str) -> bool:
+    """True for the error-fallback answers, which must not be cached."""
+    return text.startswith(("(LLM error fallback", "(Patient LLM error fallback"))
+
+def backend_name() -> str:
+    if getattr(settings, "USE_LOCAL", False):
+        return "ollama"
+    if getattr(settings, "USE_MISTRAL", False) and settings.MISTRAL_API_KEY:
+        return "mistral"
+    return "fallback"
+
 # ---- Doctor / Knowledge-base chat ----
-def generate_answer_with_disclaimer(prompt: str, context: str, temperature: float = 0.2) -> str:
+async def _answer_body(prompt: str, context: str, temperature: float) -> str:
+    try:
+        # ---- Local Ollama ----
+        if getattr(settings, "USE_LOCAL", False):
+            with stage("prompt"):
+                text = f"Context:\n{context}\n\nQuestion: {prompt}\nAnswer:"
+            with stage("llm", backend="ollama"):
+                return await ollama_generate(text, temperature)
+
+        # ---- Mistral API ----
+        if getattr(settings, "USE_MISTRAL", False) and settings.MISTRAL_API_KEY:
+            with stage("prompt"):
+                text = f"Context:\n{context}\n\nQuestion: {prompt}"
+            with stage("llm", backend="mistral"):
+                return await mistral_chat(DOCTOR_SYSTEM, text, temperature)
+
+        # ---- Fallback ----
+        with stage("prompt", backend="fallback"):
+            return f"(LLM fallback) Based on context:\n{context[:500]}..."
+
+    except Exception as e:
+        return f"(LLM error fallback: {str(e)})\nContext:\n{context[:500]}..."
+
+async def generate_answer_with_disclaimer(prompt: str, context: str, temperature: float = 0.2) -> str:
     """
     Generate an answer using:
     - Local Ollama if USE_LOCAL=True
@@ -17,83 +57,98 @@ def generate_answer_with_disclaimer(prompt: str, context: str, temperature: floa
     - Fallback: return raw context
     Always appends disclaimer for safety.
     """
+    return f"{await _answer_body(prompt, context, temperature)}\n\n{DISCLAIMER}"
+
+def stream_answer(prompt: str, context: str, temperature: float = 0.2) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_answer_with_disclaimer.
+    Yields answer fragments as the backend produces them; the caller appends DISCLAIMER.
+    """
+    backend = backend_name()
+    if backend == "ollama":
+        with stage("prompt"):
+            text = f"Context:\n{context}\n\nQuestion: {prompt}\nAnswer:"
+        tokens = ollama_stream(text, temperature)
+    elif backend == "mistral":
+        with stage("prompt"):
+            text = f"Context:\n{context}\n\nQuestion: {prompt}"
+        tokens = mistral_stream(DOCTOR_SYSTEM, text, temperature)
+    else:
+        tokens = None
+    return _stream_with_fallback("chat", backend, tokens, lambda: _answer_body(prompt, context, temperature))
+
+
+# ---- Patient chat ----
+async def _patient_body(prompt: str, temperature: float) -> str:
     try:
         # ---- Local Ollama ----
         if getattr(settings, "USE_LOCAL", False):
-            payload = {
-                "model": settings.LOCAL_MODEL,
-                "prompt": f"Context:\n{context}\n\nQuestion: {prompt}\nAnswer:",
-                "stream": False,
-                "options": {"temperature": temperature},
-            }
-            resp = requests.post(settings.LOCAL_URL, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            return f"{data.get('response', '').strip()}\n\n{DISCLAIMER}"
+            with stage("prompt"):
+                text = f"You are a friendly medical assistant for patients.\n\nQuestion: {prompt}\nAnswer:"
+            with stage("llm", backend="ollama"):
+                return await ollama_generate(text, temperature)
 
-        # ---- Mistral API ----
+        # ---- Cloud Mistral ----
         if getattr(settings, "USE_MISTRAL", False) and settings.MISTRAL_API_KEY:
-            client = MistralClient(api_key=settings.MISTRAL_API_KEY)
-            resp = client.chat(
-                model=settings.MISTRAL_MODEL,
-                messages=[
-                    ChatMessage(role="system", content="You are a helpful medical assistant. Use provided context only."),
-                    ChatMessage(role="user", content=f"Context:\n{context}\n\nQuestion: {prompt}")
-                ],
-                temperature=temperature,
-            )
-            answer = resp.choices[0].message.content
-            return f"{answer}\n\n{DISCLAIMER}"
+            with stage("prompt"):
+                text = prompt  # the persona is the system message
+            with stage("llm", backend="mistral"):
+                return await mistral_chat(PATIENT_SYSTEM, text, temperature)
 
         # ---- Fallback ----
-        return f"(LLM fallback) Based on context:\n{context[:500]}...\n\n{DISCLAIMER}"
+        with stage("prompt", backend="fallback"):
+            return f"(Patient LLM fallback) Answer: {prompt}"
 
     except Exception as e:
-        return f"(LLM error fallback: {str(e)})\nContext:\n{context[:500]}...\n\n{DISCLAIMER}"
-
+        return f"(Patient LLM error fallback: {str(e)})"
 
-# ---- Patient chat ----
-def generate_patient_answer(prompt: str, temperature: float = 0.2) -> str:
+async def generate_patient_answer(prompt: str, temperature: float = 0.2) -> str:
     """
     LLM-only mode for patient questions (no retrieval).
     Supports both Ollama and cloud Mistral.
     Generates simple, layman's explanations.
     Always appends disclaimer.
     """
-    try:
-        # ---- Local Ollama ----
-        if getattr(settings, "USE_LOCAL", False):
-            payload = {
-                "model": settings.LOCAL_MODEL,
-                "prompt": f"You are a friendly medical assistant for patients.\n\nQuestion: {prompt}\nAnswer:",
-                "stream": False,
-                "options": {"temperature": temperature},
-            }
-            resp = requests.post(settings.LOCAL_URL, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
-            return f"{data.get('response', '').strip()}\n\n{DISCLAIMER}"
+    return f"{await _patient_body(prompt, temperature)}\n\n{DISCLAIMER}"
 
-        # ---- Cloud Mistral ----
-        if getattr(settings, "USE_MISTRAL", False) and settings.MISTRAL_API_KEY:
-            client = MistralClient(api_key=settings.MISTRAL_API_KEY)
-            resp = client.chat(
-                model=settings.MISTRAL_MODEL,
-                messages=[
-                    ChatMessage(
-                        role="system",
-                        content="You are a friendly medical assistant for patients. "
-                                "Answer clearly and simply in layman's terms."
-                    ),
-                    ChatMessage(role="user", content=prompt)
-                ],
-                temperature=temperature,
-            )
-            answer = resp.choices[0].message.content
-            return f"{answer}\n\n{DISCLAIMER}"
+def stream_patient_answer(prompt: str, temperature: float = 0.2) -> AsyncIterator[str]:
+    """Streaming variant of generate_patient_answer; the caller appends DISCLAIMER."""
+    backend = backend_name()
+    if backend == "ollama":
+        with stage("prompt"):
+            text = f"You are a friendly medical assistant for patients.\n\nQuestion: {prompt}\nAnswer:"
+        tokens = ollama_stream(text, temperature)
+    elif backend == "mistral":
+        with stage("prompt"):
+            text = prompt  # the persona is the system message
+        tokens = mistral_stream(PATIENT_SYSTEM, text, temperature)
+    else:
+        tokens = None
+    return _stream_with_fallback("patient-chat", backend, tokens, lambda: _patient_body(prompt, temperature))
 
-        # ---- Fallback ----
-        return f"(Patient LLM fallback) Answer: {prompt}\n\n{DISCLAIMER}"
 
-    except Exception as e:
-        return f"(Patient LLM error fallback: {str(e)})\n\n{DISCLAIMER}"
+# ---- Streaming helper ----
+async def _stream_with_fallback(endpoint: str, backend: str, tokens, buffered) -> AsyncIterator[str]:
+    """
+    Relays backend tokens and reports time-to-first-token.
+    If there is no streaming backend, or it fails before the first token,
+    falls back to the buffered answer as a single fragment.
+    """
+    t0 = time.perf_counter()
+    sent = False
+    if tokens is not None:
+        try:
+            async for tok in tokens:
+                if not sent:
+                    sent = True
+                    ttft = time.perf_counter() - t0
+                    record("llm_ttft", ttft, backend=backend)
+                    log_event("llm_ttft", {"endpoint": endpoint, "backend": backend, "ttft_ms": round(ttft * 1000, 1)})
+                yield tok
+            record("llm", time.perf_counter() - t0, backend=backend)
+            return
+        except Exception:
+            record("llm", time.perf_counter() - t0, error=True, backend=backend)
+            if sent:
+                raise
+    yield await buffered()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+import asyncio, json
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Hashable
+import httpx
+from app.config.settings import settings
+from app.integrations.metrics import SINGLEFLIGHT
+
+if TYPE_CHECKING:
+    from mistralai.async_client import MistralAsyncClient
+
+# Process-wide clients, created lazily on first use and closed on app shutdown.
+# The Mistral SDK is only imported when a Mistral call is made.
+_http: httpx.AsyncClient | None = None
+_mistral: MistralAsyncClient | None = None
+_limiter: asyncio.Semaphore | None = None
+_flights: SingleFlight | None = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http
+    if _http is None:
+        _http = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _http
+
+def get_mistral_client() -> MistralAsyncClient:
+    global _mistral
+    if _mistral is None:
+        from mistralai.async_client import MistralAsyncClient
+        _mistral = MistralAsyncClient(
+            api_key=settings.MISTRAL_API_KEY,
+            endpoint=settings.MISTRAL_ENDPOINT,
+            timeout=int(settings.LLM_TIMEOUT),
+            max_concurrent_requests=settings.LLM_MAX_CONNECTIONS,
+        )
+    return _mistral
+
+def get_limiter() -> asyncio.Semaphore:
+    """Caps in-flight upstream generations for this process (LLM_MAX_CONCURRENCY)."""
+    global _limiter
+    if _limiter is None:
+        _limiter = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _limiter
+
+# ---- single-flight: identical concurrent generations share one upstream call ----
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one awaitable. Every waiter gets
+    the shared result or exception; the call is cancelled only once all waiters are gone.
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, list] = {}  # key -> [task, waiters]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable], label: str = "none"):
+        call = self._calls.get(key)
+        if call is None or call[0].done():
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _, call=call: self._forget(key, call))
+            SINGLEFLIGHT.inc(label, "leader")
+        else:
+            SINGLEFLIGHT.inc(label, "coalesced")
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                # last waiter gave up (client disconnected): stop the upstream call, and
+                # unregister it now so a new caller starts fresh instead of joining it
+                self._forget(key, call)
+                call[0].cancel()
+
+    def _forget(self, key: Hashable, call: list):
+        # only this call's entry: a newer leader for the same key may have replaced it
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+def get_flights() -> SingleFlight:
+    global _flights
+    if _flights is None:
+        _flights = SingleFlight()
+    return _flights
+
+async def _coalesce(key: tuple, fn: Callable[[], Awaitable[str]]) -> str:
+    if not settings.LLM_SINGLEFLIGHT:
+        return await fn()
+    return await get_flights().do(key, fn, label=key[0])
+
+async def ollama_generate(prompt: str, temperature: float) -> str:
+    key = ("ollama", settings.LOCAL_URL, settings.LOCAL_MODEL, temperature, prompt)
+    return await _coalesce(key, lambda: _ollama_generate(prompt, temperature))
+
+async def _ollama_generate(prompt: str, temperature: float) -> str:
+    payload = {
+        "model": settings.LOCAL_MODEL,
+        "prompt": prompt,
+        "stream": False,
+        "options": {"temperature": temperature},
+    }
+    async with get_limiter():
+        resp = await get_http_client().post(settings.LOCAL_URL, json=payload)
+    resp.raise_for_status()
+    return resp.json().get("response", "").strip()
+
+async def ollama_stream(prompt: str, temperature: float) -> AsyncIterator[str]:
+    """Yields response fragments from Ollama's NDJSON stream as they arrive."""
+    payload = {
+        "model": settings.LOCAL_MODEL,
+        "prompt": prompt,
+        "stream": True,
+        "options": {"temperature": temperature},
+    }
+    async with get_limiter():
+        async with get_http_client().stream("POST", settings.LOCAL_URL, json=payload) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
+
+def _messages(system: str, user: str) -> list:
+    from mistralai.models.chat_completion import ChatMessage
+    return [ChatMessage(role="system", content=system), ChatMessage(role="user", content=user)]
+
+async def mistral_chat(system: str, user: str, temperature: float) -> str:
+    key = ("mistral", settings.MISTRAL_ENDPOINT, settings.MISTRAL_MODEL, temperature, system, user)
+    return await _coalesce(key, lambda: _mistral_chat(system, user, temperature))
+
+async def _mistral_chat(system: str, user: str, temperature: float) -> str:
+    async with get_limiter():
+        resp = await get_mistral_client().chat(
+            model=settings.MISTRAL_MODEL,
+            messages=_messages(system, user),
+            temperature=temperature,
+        )
+    return resp.choices[0].message.content
+
+async def mistral_stream(system: str, user: str, temperature: float) -> AsyncIterator[str]:
+    async with get_limiter():
+        async for chunk in get_mistral_client().chat_stream(
+            model=settings.MISTRAL_MODEL,
+            messages=_messages(system, user),
+            temperature=temperature,
+        ):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+async def aclose_clients():
+    """Close pooled connections; the next call recreates them (e.g. on a new event loop)."""
+    global _http, _mistral, _limiter, _flights
+    http, mistral = _http, _mistral
+    _http = _mistral = _limiter = _flights = None
+    if http is not None:
+        await http.aclose()
+    if mistral is not None:
+        await mistral.close()
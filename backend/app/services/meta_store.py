@@ -0,0 +1,75 @@
+from __future__ import annotations
+import json, mmap, struct
+from pathlib import Path
+from typing import Dict, Iterable, List
+import numpy as np
+
+# Packed metadata store: one JSON record per FAISS row, read lazily through mmap so
+# every worker shares the same page cache instead of holding its own list of dicts.
+#
+#   MAGIC (8) | n (u64) | table_pos (u64) | blob of compact JSON records | offsets[(n + 1) x u64]
+#
+# offsets are relative to the start of the blob (byte 24).
+MAGIC = b"MEDMETA1"
+_HEADER = struct.Struct("<8sQQ")
+
+def write_meta_store(path: str | Path, records: Iterable[Dict]) -> int:
+    """Streams records to `path`; returns the record count."""
+    offsets = [0]
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, 0, 0))
+        pos = 0
+        for rec in records:
+            b = json.dumps(rec, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            f.write(b)
+            pos += len(b)
+            offsets.append(pos)
+        table_pos = _HEADER.size + pos
+        f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, len(offsets) - 1, table_pos))
+    return len(offsets) - 1
+
+class MetaStore:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._fh = open(self.path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, table_pos = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a packed metadata store")
+        self._n = n
+        self._offsets = np.frombuffer(self._mm, dtype="<u8", count=n + 1, offset=table_pos)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        start = _HEADER.size + int(self._offsets[i])
+        end = _HEADER.size + int(self._offsets[i + 1])
+        return json.loads(self._mm[start:end])
+
+    def __iter__(self):
+        for i in range(self._n):
+            yield self[i]
+
+    def close(self):
+        # the offsets view pins the mmap buffer; drop it before closing
+        self._offsets = None
+        self._mm.close()
+        self._fh.close()
+
+def is_meta_store(path: str | Path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def open_meta(path: str | Path) -> MetaStore | List[Dict]:
+    """Packed store when the file has the magic header, else legacy JSONL loaded into a list."""
+    if is_meta_store(path):
+        return MetaStore(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
@@ -1,42 +1,138 @@
 from __future__ import annotations
 from pathlib import Path
-import math
+import heapq, math, re
+from collections import Counter
 from app.config.settings import settings
+from app.integrations.metrics import stage
+from .chunk_store import ChunkStore, load_chunk_docs
+from .executor import get_pool
+from .vector_builds import pointer_path
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    # same rule the old substring scorer used for query terms: lowercase, > 2 chars
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 2]
 
 class InMemoryRetriever:
-    def __init__(self, kb_dir: str | Path = None, chunk_dir: str | Path = None):
+    """
+    BM25 over an inverted index built once at construction.
+    Query cost scales with the postings of the query terms, not with corpus size.
+    """
+    kind = "bm25"  # metrics label
+    def __init__(self, kb_dir: str | Path = None, chunk_dir: str | Path = None,
+                 k1: float = 1.5, b: float = 0.75):
         base = Path(__file__).parents[1]
         self.kb_dir = Path(kb_dir or base / "kb")
         self.chunk_dir = Path(chunk_dir or base / "kb_chunks")
+        self.k1, self.b = k1, b
         self.docs = []
         if self.kb_dir.exists():
             for p in self.kb_dir.glob("**/*.md"):
                 try:
                     self.docs.append({"id": p.name, "content": p.read_text(encoding="utf-8"), "source": "kb", "url": None})
-                except: 
-                    pass
-        if self.chunk_dir.exists():
-            for p in sorted(self.chunk_dir.glob("*.txt")):
-                try:
-                    self.docs.append({"id": p.name, "content": p.read_text(encoding="utf-8"), "source": "gale_pdf", "url": None})
-                except: 
+                except:
                     pass
+        # packed chunk store when present, else one .txt per chunk
+        self.docs.extend(load_chunk_docs(self.chunk_dir))
+        self._build_index()
+
+    @classmethod
+    def from_docs(cls, docs: list[dict], k1: float = 1.5, b: float = 0.75) -> "InMemoryRetriever":
+        self = cls.__new__(cls)
+        self.kb_dir = self.chunk_dir = None
+        self.k1, self.b = k1, b
+        self.docs = list(docs)
+        self._build_index()
+        return self
+
+    def _build_index(self):
+        # term -> [(doc_idx, term_freq), ...]
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.doc_len: list[int] = []
+        for i, d in enumerate(self.docs):
+            tf = Counter(tokenize(d["content"]))
+            self.doc_len.append(sum(tf.values()))
+            for term, n in tf.items():
+                self.postings.setdefault(term, []).append((i, n))
+        n_docs = len(self.docs)
+        self.avgdl = (sum(self.doc_len) / n_docs) if n_docs else 0.0
+        # Lucene-style idf: stays positive even for terms in most docs
+        self.idf = {t: math.log(1 + (n_docs - len(p) + 0.5) / (len(p) + 0.5))
+                    for t, p in self.postings.items()}
+        # per-doc length normalisation, precomputed so queries only multiply
+        avgdl = self.avgdl or 1.0
+        self._norm = [self.k1 * (1 - self.b + self.b * dl / avgdl) for dl in self.doc_len]
 
-    def _score(self, query: str, content: str) -> float:
-        tokens = [t for t in query.lower().split() if len(t) > 2]
-        if not tokens: return 0.0
-        cl = content.lower()
-        score = sum(cl.count(t) for t in tokens)
-        return score / math.sqrt(len(content) + 1)
+    def _scores(self, query: str) -> dict[int, float]:
+        scores: dict[int, float] = {}
+        k1 = self.k1
+        norm = self._norm
+        for term, qtf in Counter(tokenize(query)).items():
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            w = self.idf[term] * qtf
+            for i, tf in plist:
+                scores[i] = scores.get(i, 0.0) + w * tf * (k1 + 1) / (tf + norm[i])
+        return scores
 
     def retrieve(self, query: str, k: int = 5):
-        ranked = sorted(self.docs, key=lambda d: self._score(query, d["content"]), reverse=True)
-        return ranked[:k]
+        with stage("search", retriever=self.kind):
+            scores = self._scores(query)
+            top = heapq.nlargest(k, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+        out = [dict(self.docs[i], score=s) for i, s in top]
+        # keep the old contract of always returning k docs: pad in corpus order
+        if len(out) < k:
+            for i, d in enumerate(self.docs):
+                if len(out) >= k:
+                    break
+                if i not in scores:
+                    out.append(dict(d, score=0.0))
+        return out
+
+    async def aretrieve(self, query: str, k: int = 5):
+        # scoring is CPU-bound; run it on the retrieval pool, not the event loop
+        return await get_pool("retrieval").run(self.retrieve, query, k)
+
+    def retrieve_many(self, queries: list[str], k: int = 5):
+        return [self.retrieve(q, k) for q in queries]
+
+    async def aretrieve_many(self, queries: list[str], k: int = 5):
+        # one pool task for the whole batch, so a large batch takes one queue slot
+        return await get_pool("retrieval").run(self.retrieve_many, queries, k)
+
+def _stat(p: Path) -> tuple:
+    try:
+        st = p.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return (None, None)
+
+def corpus_fingerprint(kb_dir: str | Path = None, chunk_dir: str | Path = None) -> tuple:
+    """
+    Cheap change marker for the retrieval corpus: KB files, the chunk directory, its
+    manifest and chunk store, and the FAISS index/meta or published build pointer.
+    Changes whenever ingestion or build_faiss_index.py rewrites them.
+    """
+    base = Path(__file__).parents[1]
+    kb = Path(kb_dir or base / "kb")
+    chunks = Path(chunk_dir or base / "kb_chunks")
+    store = ChunkStore(chunks)
+    parts = [_stat(kb), _stat(chunks), _stat(chunks / "manifest.jsonl"), _stat(store.index_path),
+             _stat(Path(settings.FAISS_INDEX_PATH)), _stat(Path(settings.FAISS_META_PATH)),
+             _stat(pointer_path(settings.FAISS_INDEX_PATH))]
+    if kb.exists():
+        parts.extend(_stat(p) for p in sorted(kb.glob("**/*.md")))
+    return tuple(parts)
 
-def get_retriever():
+def get_retriever(reuse=None):
+    """`reuse`: the live retriever, whose encoder is kept when it is for the same model."""
     if getattr(settings, "USE_FAISS", False):
         from .retrieval_faiss import FaissRetriever
+        same_model = getattr(reuse, "model_name", None) == settings.EMBED_MODEL
         return FaissRetriever(index_path=settings.FAISS_INDEX_PATH,
                               meta_path=settings.FAISS_META_PATH,
-                              model_name=settings.EMBED_MODEL)
+                              model_name=settings.EMBED_MODEL,
+                              model=reuse.model if same_model else None)
     return InMemoryRetriever()
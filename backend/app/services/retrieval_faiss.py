@@ -1,35 +1,107 @@
 from __future__ import annotations
 from typing import List, Dict
 from pathlib import Path
-import json, faiss, numpy as np
-from sentence_transformers import SentenceTransformer
+import numpy as np
 from app.config.settings import settings
+from app.integrations.metrics import stage
+from .batching import MicroBatcher, LRUCache
+from .embedding import load_encoder
+from .faiss_index import index_kind, load_index, search_params
+from .meta_store import MetaStore, open_meta
+from .vector_builds import resolve_build
 
 class FaissRetriever:
+    kind = "faiss"  # metrics label
+
     def __init__(self,
                  index_path: str | Path = None,
                  meta_path: str | Path = None,
-                 model_name: str = None):
-        self.index_path = Path(index_path or settings.FAISS_INDEX_PATH)
-        self.meta_path = Path(meta_path or settings.FAISS_META_PATH)
+                 model_name: str = None,
+                 batch_max_size: int = None,
+                 batch_max_wait_ms: float = None,
+                 embed_cache_size: int = None,
+                 mmap: bool = None,
+                 model=None):
+        # one read of the build pointer: index, meta and vectors of the same build
+        self.index_path, self.meta_path, emb_path = resolve_build(
+            index_path or settings.FAISS_INDEX_PATH, meta_path or settings.FAISS_META_PATH, settings.FAISS_EMB_PATH)
         self.model_name = model_name or settings.EMBED_MODEL
         if not self.index_path.exists() or not self.meta_path.exists():
             raise RuntimeError("FAISS index/meta not found. Run scripts/build_faiss_index.py first.")
-        self.index = faiss.read_index(str(self.index_path))
-        self.model = SentenceTransformer(self.model_name)
-        self.meta: List[Dict] = []
-        with open(self.meta_path, "r", encoding="utf-8") as f:
-            for line in f:
-                self.meta.append(json.loads(line))
-
-    def retrieve(self, query: str, k: int = 5) -> List[Dict]:
-        q = self.model.encode([query], normalize_embeddings=True)
-        q = np.asarray(q).astype("float32")
-        scores, idxs = self.index.search(q, k)
+        mmap = settings.FAISS_MMAP if mmap is None else mmap
+        self.index = load_index(self.index_path, mmap=mmap, embeddings_path=emb_path)
+        self.index_kind = index_kind(self.index)
+        # encoder backends are only imported when a FAISS retriever is built; `model` is
+        # an already-loaded encoder for model_name (kept across index reloads)
+        self.model = model if model is not None else load_encoder(self.model_name)
+        # packed store is mmapped and decoded per hit; legacy JSONL is loaded into a list
+        self.meta: MetaStore | List[Dict] = open_meta(self.meta_path)
+        # query embeddings by exact text, so repeated queries skip the encoder
+        self.emb_cache = LRUCache(settings.EMBED_CACHE_SIZE if embed_cache_size is None else embed_cache_size)
+        # concurrent retrieve() calls share one encode + one index.search
+        self.batcher = MicroBatcher(
+            self._search_batch,
+            max_batch=settings.FAISS_BATCH_MAX_SIZE if batch_max_size is None else batch_max_size,
+            max_wait=(settings.FAISS_BATCH_MAX_WAIT_MS if batch_max_wait_ms is None else batch_max_wait_ms) / 1000,
+            name="faiss-batcher",
+        )
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out: List[np.ndarray | None] = [self.emb_cache.get(t) for t in texts]
+        missing = [i for i, e in enumerate(out) if e is None]
+        if missing:
+            embs = self.model.encode([texts[i] for i in missing], normalize_embeddings=True)
+            embs = np.asarray(embs).astype("float32")
+            for i, e in zip(missing, embs):
+                out[i] = e
+                self.emb_cache.put(texts[i], e)
+        return np.stack(out)
+
+    def _hits(self, idxs, scores) -> List[Dict]:
         out = []
-        for i, score in zip(idxs[0], scores[0]):
+        for i, score in zip(idxs, scores):
             if i == -1: continue
             d = self.meta[i].copy()
             d["score"] = float(score)
             out.append(d)
         return out
+
+    def _search_batch(self, items: List[tuple[str, int, int | None, int | None]]) -> List[List[Dict]]:
+        # runs on the batcher thread: recorded in the histograms, not per request
+        with stage("embed", retriever=self.kind):
+            q = self.embed([item[0] for item in items])
+        out: List[List[Dict] | None] = [None] * len(items)
+        # one index.search per distinct (nprobe, efSearch); normally the whole batch
+        groups: Dict[tuple, List[int]] = {}
+        for j, (_, _, nprobe, ef) in enumerate(items):
+            groups.setdefault((nprobe, ef), []).append(j)
+        for (nprobe, ef), rows in groups.items():
+            params = search_params(self.index, self.index_kind,
+                                   nprobe or settings.FAISS_NPROBE, ef or settings.FAISS_EF_SEARCH)
+            kmax = max(items[j][1] for j in rows)
+            with stage("search", retriever=self.kind):
+                scores, idxs = self.index.search(q[rows], kmax, params=params)
+            for r, j in enumerate(rows):
+                k = items[j][1]
+                out[j] = self._hits(idxs[r][:k], scores[r][:k])
+        return out
+
+    def retrieve(self, query: str, k: int = 5, nprobe: int = None, ef_search: int = None) -> List[Dict]:
+        return self.batcher((query, k, nprobe, ef_search))
+
+    async def aretrieve(self, query: str, k: int = 5, nprobe: int = None, ef_search: int = None) -> List[Dict]:
+        return await self.batcher.asubmit((query, k, nprobe, ef_search))
+
+    def retrieve_many(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        """Bulk path: one encode over all queries and one matrix index.search, no batching window.
+        Runs on the batcher thread like retrieve(): the index (and its search params) is only
+        ever searched from that one thread."""
+        return self.batcher.submit_many([(q, k, None, None) for q in queries]).result()
+
+    async def aretrieve_many(self, queries: List[str], k: int = 5) -> List[List[Dict]]:
+        return await self.batcher.asubmit_many([(q, k, None, None) for q in queries])
+
+    def close(self):
+        self.batcher.close()
+        if isinstance(self.meta, MetaStore):
+            self.meta.close()
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import asyncio, threading, time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, List
+from app.integrations.app_insights import log_event
+
+# Versioned, refcounted holder for the live retriever. Queries pin the current version
+# for their duration; reload() builds and warms a new one in the background, swaps it
+# in atomically, and closes the old one once its last in-flight query has finished.
+# The watcher does not retry a failed reload on every tick: it waits until the corpus
+# fingerprint moves again (a fixed or newer build); reload() can always be forced.
+
+class _Version:
+    def __init__(self, number: int, retriever: Any, fingerprint: tuple | None):
+        self.number = number
+        self.retriever = retriever
+        self.fingerprint = fingerprint
+        self.loaded_at = time.time()
+        self.refs = 0
+        self.retired = False
+
+class RetrieverHandle:
+    def __init__(self, build: Callable[[], Any], fingerprint: Callable[[], tuple] = None,
+                 warm_up: Callable[[Any], None] = None):
+        self._build = build
+        self._fingerprint = fingerprint
+        self._warm_up = warm_up
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()  # one build at a time
+        self._current: _Version | None = None
+        self._draining: List[_Version] = []
+        self._versions = 0
+        self.last_error: str | None = None
+        self._failed_fingerprint: tuple | None = None  # corpus a reload last failed on
+
+    @property
+    def loaded(self) -> bool:
+        return self._current is not None
+
+    @property
+    def version(self) -> int:
+        return self._current.number if self._current is not None else 0
+
+    @property
+    def current(self) -> Any:
+        """The live retriever, unpinned (fine for attribute checks, not for queries)."""
+        return self._current.retriever if self._current is not None else None
+
+    def ensure_loaded(self):
+        if self._current is None:
+            with self._reload_lock:
+                if self._current is None:
+                    self._load()
+
+    def _load(self) -> _Version:
+        # caller holds _reload_lock; the fingerprint is taken before building so a
+        # change made during the build is picked up by the next check
+        fp = self._fingerprint() if self._fingerprint else None
+        try:
+            retriever = self._build()
+            try:
+                if self._warm_up is not None:
+                    self._warm_up(retriever)
+            except BaseException:
+                _close(retriever)
+                raise
+        except Exception:
+            self._failed_fingerprint = fp
+            raise
+        self._failed_fingerprint = None
+        with self._lock:
+            self._versions += 1
+            new, old = _Version(self._versions, retriever, fp), self._current
+            self._current = new
+            if old is not None:
+                old.retired = True
+                self._draining.append(old)
+            drained = self._collect()
+        for v in drained:
+            _close(v.retriever)
+        return new
+
+    def reload(self) -> int:
+        """Builds and warms a new version, then swaps it in. Blocking; returns the version number."""
+        with self._reload_lock:
+            try:
+                v = self._load()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+            self.last_error = None
+            return v.number
+
+    def changed(self) -> bool:
+        """True when the corpus fingerprint differs from the live version's."""
+        if self._fingerprint is None or self._current is None:
+            return False
+        return self._fingerprint() != self._current.fingerprint
+
+    def _pin(self) -> _Version:
+        self.ensure_loaded()
+        with self._lock:
+            v = self._current
+            v.refs += 1
+            return v
+
+    def _unpin(self, v: _Version):
+        with self._lock:
+            v.refs -= 1
+            drained = self._collect()
+        for d in drained:
+            _close(d.retriever)
+
+    def _collect(self) -> List[_Version]:
+        # caller holds _lock
+        drained = [v for v in self._draining if v.refs == 0]
+        self._draining = [v for v in self._draining if v.refs > 0]
+        return drained
+
+    @contextmanager
+    def acquire(self):
+        v = self._pin()
+        try:
+            yield v.retriever
+        finally:
+            self._unpin(v)
+
+    @asynccontextmanager
+    async def aacquire(self):
+        # the first load may build a model: do it off the event loop
+        if self._current is None:
+            await asyncio.to_thread(self.ensure_loaded)
+        v = self._pin()
+        try:
+            yield v.retriever
+        finally:
+            self._unpin(v)
+
+    def _should_reload(self) -> bool:
+        # changed, and not the corpus the last reload already failed on
+        if not self.changed():
+            return False
+        return self._failed_fingerprint is None or self._fingerprint() != self._failed_fingerprint
+
+    async def watch(self, interval: float):
+        """
+        Polls the corpus fingerprint and reloads in the background when it changes. After
+        a failed reload it waits for the fingerprint to change again before retrying.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self._current is not None and await asyncio.to_thread(self._should_reload):
+                    version = await asyncio.to_thread(self.reload)
+                    log_event("retriever_reloaded", {"version": version})
+            except Exception as e:
+                # the old version keeps serving; last_error is reported by stats()
+                log_event("retriever_reload_failed", {"error": f"{type(e).__name__}: {e}"})
+
+    def stats(self) -> Dict:
+        with self._lock:
+            cur = self._current
+            return {"version": cur.number if cur else 0,
+                    "kind": type(cur.retriever).__name__ if cur else None,
+                    "loaded_at": cur.loaded_at if cur else None,
+                    "in_flight": cur.refs if cur else 0,
+                    "draining": [{"version": v.number, "in_flight": v.refs} for v in self._draining],
+                    "last_error": self.last_error}
+
+    def close(self):
+        with self._lock:
+            versions = ([self._current] if self._current else []) + self._draining
+            self._current, self._draining = None, []
+        for v in versions:
+            _close(v.retriever)
+
+def _close(retriever: Any):
+    if hasattr(retriever, "close"):
+        retriever.close()
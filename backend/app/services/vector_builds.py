@@ -0,0 +1,55 @@
+from __future__ import annotations
+import os, shutil
+from pathlib import Path
+from typing import Tuple
+
+# Build generations for the FAISS outputs (scripts/build_faiss_index.py):
+#   vector_builds/<build id>/   vector.index, vector_meta.bin, vector_embeddings.npy and
+#                               vector_manifest.json of one build
+#   vector_current              the published build id
+# both next to FAISS_INDEX_PATH. A build writes its own directory and is published by
+# renaming one pointer file, so a loader sees the whole old set or the whole new one,
+# never a new index with old metadata. Without a pointer (indexes built before
+# generations) the configured paths are used as they are.
+CURRENT_NAME = "vector_current"
+BUILDS_DIR = "vector_builds"
+
+def pointer_path(index_path: str | Path) -> Path:
+    return Path(index_path).parent / CURRENT_NAME
+
+def current_build(index_path: str | Path) -> str | None:
+    try:
+        return pointer_path(index_path).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+def build_dir(index_path: str | Path, build_id: str) -> Path:
+    return Path(index_path).parent / BUILDS_DIR / build_id
+
+def resolve_build(index_path: str | Path, *paths: str | Path) -> Tuple[Path, ...]:
+    """
+    (index path, *paths) in the published build, from a single read of the pointer so
+    they always belong to the same build; the paths unchanged when nothing is published.
+    """
+    paths = (Path(index_path),) + tuple(map(Path, paths))
+    build = current_build(index_path)
+    if build is None:
+        return paths
+    d = build_dir(index_path, build)
+    return tuple(d / p.name for p in paths)
+
+def publish_build(index_path: str | Path, build_id: str):
+    """
+    Points readers at `build_id` (one rename). The previous build stays for readers
+    still using it; older ones (and directories of interrupted builds) are removed.
+    """
+    previous = current_build(index_path)
+    ptr = pointer_path(index_path)
+    tmp = ptr.with_name(ptr.name + ".tmp")
+    tmp.write_text(build_id, encoding="utf-8")
+    os.replace(tmp, ptr)
+    builds = Path(index_path).parent / BUILDS_DIR
+    for d in builds.iterdir():
+        if d.name not in (build_id, previous):
+            # still mapped elsewhere (Windows): removed by the next build
+            shutil.rmtree(d, ignore_errors=True)
@@ -0,0 +1,32 @@
+"""
+Stand-ins for page rendering and Tesseract (poppler and tesseract are system binaries),
+installable in spawned OCR pool workers:
+
+    ProcessPoolExecutor(..., initializer=ocr_stub.install, initargs=(page_text, cache_dir, log_dir))
+
+Page p renders to a small image carrying page_text[p]; identical texts give identical
+images, so they share an OCR cache entry. Every stubbed Tesseract call leaves a file in
+log_dir, so the parent can count calls made in any worker.
+"""
+from __future__ import annotations
+import os, uuid
+from pathlib import Path
+from typing import Dict
+
+def install(page_text: Dict[int, str], cache_dir: str, log_dir: str):
+    from PIL import Image
+    from app.config.settings import settings
+    from app.labs import ocr
+    settings.OCR_CACHE_DIR = cache_dir
+
+    def render(path, page, dpi, grayscale):
+        img = Image.new("L", (40, 40), sum(map(ord, page_text[page])) % 256)
+        img.info["text"] = page_text[page]
+        return img
+
+    def tesseract(img):
+        (Path(log_dir) / f"{os.getpid()}-{uuid.uuid4().hex}").write_text(img.info["text"], encoding="utf-8")
+        return img.info["text"]
+
+    ocr.render_page = render
+    ocr.image_to_text = tesseract
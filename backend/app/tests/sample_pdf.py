@@ -0,0 +1,41 @@
+"""
+Minimal text-only PDF writer for tests and benchmarks (no reportlab needed):
+
+    make_pdf(path, pages=200)   # 200 pages of deterministic medical-sounding text
+"""
+from __future__ import annotations
+import random
+from pathlib import Path
+
+WORDS = ["patient", "glucose", "therapy", "chronic", "symptoms", "dose", "renal", "cardiac",
+         "infection", "diagnosis", "treatment", "insulin", "lesion", "fever", "acute", "blood",
+         "pressure", "thyroid", "anemia", "asthma", "migraine", "hepatic", "dermal", "antibiotic"]
+
+def page_lines(pnum: int, lines: int = 45, seed: int = 0) -> list[str]:
+    rnd = random.Random(seed * 100003 + pnum)
+    return [f"Page {pnum + 1}."] + [" ".join(rnd.choice(WORDS) for _ in range(12)) for _ in range(lines)]
+
+def make_pdf(path: str | Path, pages: int = 100, lines: int = 45, seed: int = 0) -> Path:
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for p in range(pages):
+        text = "".join(f"({line}) Tj T* " for line in page_lines(p, lines, seed))
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td {text}ET".encode("latin-1")
+        objs.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                    b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objs))
+        kids.append(len(objs))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % k for k in kids), pages)
+
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    path = Path(path)
+    path.write_bytes(bytes(out))
+    return path
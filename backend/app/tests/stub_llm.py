@@ -0,0 +1,140 @@
+"""
+Local stub of the Ollama generate API and the Mistral chat completions API for tests
+and benchmarks. Runs uvicorn in a background thread on a free port and answers after
+`latency` seconds (streamed answers then emit one word every `token_latency` seconds).
+`prefill_latency` adds seconds per prompt token (~4 chars), modelling prompt processing.
+
+    with StubLLMServer(latency=0.2) as stub:
+        settings.LOCAL_URL = stub.ollama_url
+        settings.MISTRAL_ENDPOINT = stub.base_url
+"""
+from __future__ import annotations
+import asyncio, json, threading, time
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+class StubLLMServer:
+    def __init__(self, latency: float = 0.1, token_latency: float = 0.0, answer: str = "stub answer",
+                 prefill_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prefill_latency = prefill_latency
+        self.prompt_tokens: list[int] = []
+        self.answer = answer
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.port = None
+        self._server = None
+        self._thread = None
+        self.app = self._build_app()
+
+    def _words(self) -> list[str]:
+        words = self.answer.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    async def _enter(self, body: dict):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        prompt = body.get("prompt") or "".join(m.get("content") or "" for m in body.get("messages") or [])
+        tokens = -(-len(prompt) // 4)
+        self.prompt_tokens.append(tokens)
+        await asyncio.sleep(self.latency + self.prefill_latency * tokens)
+
+    def _exit(self):
+        self.in_flight -= 1
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/api/generate")
+        async def generate(request: Request):
+            body = await request.json()
+            if body.get("stream"):
+                async def lines():
+                    await self._enter(body)
+                    try:
+                        for i, w in enumerate(self._words()):
+                            if i and self.token_latency:
+                                await asyncio.sleep(self.token_latency)
+                            yield json.dumps({"model": body.get("model"), "response": w, "done": False}) + "\n"
+                        yield json.dumps({"model": body.get("model"), "response": "", "done": True}) + "\n"
+                    finally:
+                        self._exit()
+                return StreamingResponse(lines(), media_type="application/x-ndjson")
+            await self._enter(body)
+            try:
+                await asyncio.sleep(self.token_latency * (len(self._words()) - 1))
+            finally:
+                self._exit()
+            return {"model": body.get("model"), "response": self.answer, "done": True}
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            model = body.get("model")
+            if body.get("stream"):
+                async def events():
+                    await self._enter(body)
+                    try:
+                        for i, w in enumerate(self._words()):
+                            if i and self.token_latency:
+                                await asyncio.sleep(self.token_latency)
+                            chunk = {"id": "stub", "model": model, "choices": [
+                                {"index": 0, "delta": {"content": w}, "finish_reason": None}]}
+                            yield f"data: {json.dumps(chunk)}\n\n"
+                        yield "data: [DONE]\n\n"
+                    finally:
+                        self._exit()
+                return StreamingResponse(events(), media_type="text/event-stream")
+            await self._enter(body)
+            try:
+                await asyncio.sleep(self.token_latency * (len(self._words()) - 1))
+            finally:
+                self._exit()
+            return {
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.answer},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0, "completion_tokens": 0},
+            }
+
+        return app
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def ollama_url(self) -> str:
+        return f"{self.base_url}/api/generate"
+
+    def reset_counters(self):
+        self.calls = self.in_flight = self.max_in_flight = 0
+        self.prompt_tokens = []
+
+    def start(self) -> "StubLLMServer":
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=0, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stub LLM server did not start")
+            time.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,92 @@
+"""
+Recall-vs-latency sweep for the FAISS index types (flat / ivf_flat / hnsw / ivf_pq).
+Reports recall@k against the exact flat index, single-query p50/p99 latency, build
+time and serialized index size for each nprobe / efSearch setting.
+
+Uses the embeddings saved by build_faiss_index.py, or a synthetic clustered corpus.
+Usage:
+  python scripts/bench_ann.py                              # app/vector_embeddings.npy
+  python scripts/bench_ann.py --synthetic 200000 --dim 384
+  python scripts/bench_ann.py --synthetic 100000 --nprobe 4 16 64 --ef-search 32 128
+"""
+import sys, time, argparse, statistics
+from pathlib import Path
+import faiss, numpy as np
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.faiss_index import build_index, search_params, index_nbytes
+
+def synthetic(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    # gaussian clusters on the unit sphere, closer to real text embeddings than uniform noise
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 500), dim)).astype("float32")
+    x = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(x)
+    return x
+
+def queries_from(x: np.ndarray, nq: int, seed: int = 1) -> np.ndarray:
+    # perturbed corpus vectors: near-duplicates of stored docs, like real questions
+    rng = np.random.default_rng(seed)
+    q = x[rng.integers(0, len(x), nq)] + 0.1 * rng.standard_normal((nq, x.shape[1])).astype("float32")
+    q = np.ascontiguousarray(q, dtype="float32")
+    faiss.normalize_L2(q)
+    return q
+
+def measure(index, kind, q, k, truth, nprobe=None, ef=None):
+    params = search_params(index, kind, nprobe, ef)
+    _, ids = index.search(q, k, params=params)
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(ids, truth)])
+    lat = []
+    for row in q:
+        t0 = time.perf_counter()
+        index.search(row[None, :], k, params=params)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat.sort()
+    return recall, statistics.median(lat), lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--embeddings", default=str(ROOT / "app" / "vector_embeddings.npy"))
+    ap.add_argument("--synthetic", type=int, help="Use N synthetic vectors instead of --embeddings")
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--types", nargs="+", default=["ivf_flat", "hnsw", "ivf_pq"])
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    ap.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    ap.add_argument("--threads", type=int, help="faiss OpenMP threads (default: faiss default)")
+    args = ap.parse_args()
+    if args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    x = synthetic(args.synthetic, args.dim) if args.synthetic else np.load(args.embeddings).astype("float32")
+    q = queries_from(x, args.queries)
+    k = min(args.k, len(x))
+    print(f"[INFO] corpus {x.shape[0]} x {x.shape[1]}, {len(q)} queries, recall@{k}")
+
+    flat = build_index(x, "flat")
+    _, truth = flat.search(q, k)
+    rows = [("flat", "-", 0.0, index_nbytes(flat)) + measure(flat, "flat", q, k, truth)]
+
+    for kind in args.types:
+        t0 = time.perf_counter()
+        index = build_index(x, kind, nlist=settings.FAISS_NLIST, hnsw_m=settings.FAISS_HNSW_M,
+                            ef_construction=settings.FAISS_EF_CONSTRUCTION,
+                            pq_m=settings.FAISS_PQ_M, pq_nbits=settings.FAISS_PQ_NBITS)
+        build_s = time.perf_counter() - t0
+        size = index_nbytes(index)
+        if kind == "hnsw":
+            sweep = [(f"efSearch={ef}", None, ef) for ef in args.ef_search]
+        else:
+            sweep = [(f"nprobe={n}", n, None) for n in args.nprobe]
+        for label, nprobe, ef in sweep:
+            rows.append((kind, label, build_s, size) + measure(index, kind, q, k, truth, nprobe, ef))
+
+    print(f"{'index':>9} {'setting':>13} {'build s':>8} {'size MB':>8} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for kind, label, build_s, size, recall, p50, p99 in rows:
+        print(f"{kind:>9} {label:>13} {build_s:8.2f} {size / 2**20:8.1f} {recall:7.3f} {p50:8.3f} {p99:8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Chat history query benchmark on SQLite: the old unpaginated OR query vs the
+UNION + keyset-paginated history (ChatRepository.get_history_page), before and
+after the composite indexes from alembic revision 0002.
+Reports median latency and peak Python memory (tracemalloc) per query, for a
+long-lived patient and a typical user.
+Usage:
+  python scripts/bench_chat_history.py                      # 1,000,000 messages
+  python scripts/bench_chat_history.py --messages 200000 --runs 3
+  python scripts/bench_chat_history.py --db /tmp/history.db --keep
+"""
+import sys, os, time, random, sqlite3, argparse, statistics, tempfile, tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.models.chat import ChatMessage
+from app.repositories.chat_repo import ChatRepository
+
+HEAVY_USER, TYPICAL_USER = 1, 2
+
+def populate(path: str, n: int, users: int, heavy_share: float, seed: int = 7):
+    engine = create_engine(f"sqlite:///{path}")
+    ChatMessage.__table__.create(engine)
+    engine.dispose()
+    rnd = random.Random(seed)
+    t = datetime(2020, 1, 1)
+    con = sqlite3.connect(path)
+    rows = []
+    for i in range(n):
+        t += timedelta(seconds=rnd.randint(0, 120))
+        if rnd.random() < heavy_share:
+            a, b = HEAVY_USER, rnd.randint(3, users)
+        else:
+            a, b = rnd.randint(2, users), rnd.randint(2, users)
+        if rnd.random() < 0.5:
+            a, b = b, a
+        receiver = None if rnd.random() < 0.3 else b  # None: message to the assistant
+        rows.append((a, receiver, f"message {i} " + "x" * rnd.randint(20, 200), t.isoformat(" ")))
+        if len(rows) == 50_000:
+            con.executemany("INSERT INTO chat_messages (sender_id, receiver_id, content, created_at) "
+                            "VALUES (?, ?, ?, ?)", rows)
+            rows.clear()
+    if rows:
+        con.executemany("INSERT INTO chat_messages (sender_id, receiver_id, content, created_at) "
+                        "VALUES (?, ?, ?, ?)", rows)
+    con.commit()
+    con.close()
+
+def set_indexes(engine, present: bool):
+    with engine.begin() as conn:
+        for ix in ChatMessage.__table__.indexes:
+            if present:
+                ix.create(conn, checkfirst=True)
+            else:
+                ix.drop(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+
+def legacy_messages_for_user(db, user_id: int):
+    # the query ChatRepository.get_messages_for_user ran before this change
+    return db.query(ChatMessage).filter(
+        (ChatMessage.sender_id == user_id) | (ChatMessage.receiver_id == user_id)
+    ).order_by(ChatMessage.created_at).all()
+
+def measure(Session, fn, runs: int):
+    times = []
+    for _ in range(runs):
+        db = Session()
+        t0 = time.perf_counter()
+        out = fn(db)
+        times.append(time.perf_counter() - t0)
+        db.close()
+    # memory in a separate run: tracemalloc slows allocation-heavy code down
+    db = Session()
+    tracemalloc.start()
+    out = fn(db)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.close()
+    return statistics.median(times), peak, len(out[0] if isinstance(out, tuple) else out)
+
+def deep_cursor(Session, user_id: int, pages: int, limit: int):
+    db = Session()
+    cursor = None
+    for _ in range(pages):
+        _, nxt = ChatRepository(db).get_history_page(user_id, limit, cursor)
+        if nxt is None:
+            break
+        cursor = nxt
+    db.close()
+    return cursor
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=20_000)
+    ap.add_argument("--heavy-share", type=float, default=0.02, help="Share of messages involving the long-lived patient")
+    ap.add_argument("--limit", type=int, default=50, help="History page size")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--db", help="SQLite file (default: a temp file)")
+    ap.add_argument("--keep", action="store_true", help="Keep the database file")
+    args = ap.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), "history.db")
+    if not os.path.exists(path):
+        t0 = time.perf_counter()
+        populate(path, args.messages, args.users, args.heavy_share)
+        print(f"populated {args.messages} messages in {time.perf_counter() - t0:.1f}s ({path})")
+    engine = create_engine(f"sqlite:///{path}")
+    Session = sessionmaker(bind=engine)
+    repo = lambda db: ChatRepository(db)
+
+    print(f"{'query':44s} {'user':8s} {'rows':>6s} {'p50 ms':>9s} {'peak MB':>8s}")
+    def report(name, fn, user):
+        dt, peak, n = measure(Session, fn, args.runs)
+        who = "heavy" if user == HEAVY_USER else "typical"
+        print(f"{name:44s} {who:8s} {n:6d} {dt * 1000:9.2f} {peak / 2**20:8.2f}")
+
+    try:
+        set_indexes(engine, present=False)
+        for user in (HEAVY_USER, TYPICAL_USER):
+            report("before: OR + .all(), no indexes", lambda db: legacy_messages_for_user(db, user), user)
+        set_indexes(engine, present=True)
+        for user in (HEAVY_USER, TYPICAL_USER):
+            report("OR + .all(), composite indexes", lambda db: legacy_messages_for_user(db, user), user)
+            report("UNION + .all(), composite indexes", lambda db: repo(db).get_messages_for_user(user), user)
+            report(f"after: keyset page 1 (limit {args.limit})",
+                   lambda db: repo(db).get_history_page(user, args.limit), user)
+            cursor = deep_cursor(Session, user, 100, args.limit)
+            if cursor is not None:
+                report(f"after: keyset page <=100 deep (limit {args.limit})",
+                       lambda db: repo(db).get_history_page(user, args.limit, cursor), user)
+    finally:
+        engine.dispose()
+        if not args.keep and not args.db:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
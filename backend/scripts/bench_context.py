@@ -0,0 +1,76 @@
+"""
+Prompt size and generation latency for /chat context assembly: the raw doc list
+(before) vs the merged, deduped, token-budgeted context (after).
+Runs against the stub LLM (Ollama API); --prefill models prompt processing cost in
+seconds per prompt token, since the stub itself answers in constant time.
+Usage:
+  python scripts/bench_context.py
+  python scripts/bench_context.py --budget 400 --prefill 0.002 --runs 5
+"""
+import sys, time, asyncio, argparse, statistics
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.retrieval import get_retriever
+from app.services.context_builder import build_context
+from app.services.generation import generate_answer_with_disclaimer
+from app.services.llm_clients import aclose_clients
+from app.tests.stub_llm import StubLLMServer
+
+QUERIES = [
+    "what is a normal hba1c",
+    "symptoms of high cholesterol",
+    "chest pain red flags",
+    "treatment of asthma in children",
+    "how is an abdominal ultrasound performed",
+    "signs of an abscess",
+]
+
+async def generate(contexts, runs):
+    out = []
+    for q, ctx in contexts:
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            await generate_answer_with_disclaimer(q, ctx, temperature=0.2)
+            out.append(time.perf_counter() - t0)
+    await aclose_clients()
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=int, default=settings.CONTEXT_TOKEN_BUDGET)
+    ap.add_argument("--prefill", type=float, default=0.001, help="stub seconds per prompt token")
+    ap.add_argument("--latency", type=float, default=0.05, help="stub fixed latency")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    r = get_retriever()
+    raw, built, build_s = [], [], []
+    for q in QUERIES:
+        docs = r.retrieve(q, k=settings.TOP_K)
+        raw.append((q, docs))
+        t0 = time.perf_counter()
+        built.append((q, build_context(q, docs, token_budget=args.budget).text))
+        build_s.append(time.perf_counter() - t0)
+
+    settings.USE_LOCAL = True
+    settings.ANSWER_CACHE_ENABLED = False
+    with StubLLMServer(latency=args.latency, prefill_latency=args.prefill) as stub:
+        settings.LOCAL_URL = stub.ollama_url
+        rows = {}
+        for name, contexts in (("before (raw docs)", raw), ("after (built)", built)):
+            stub.reset_counters()
+            lat = asyncio.run(generate(contexts, args.runs))
+            rows[name] = (statistics.mean(stub.prompt_tokens), max(stub.prompt_tokens),
+                          statistics.median(lat), max(lat))
+    print(f"{len(QUERIES)} queries x {args.runs} runs, top_k={settings.TOP_K}, budget={args.budget}, "
+          f"stub latency={args.latency}s + {args.prefill}s/prompt token")
+    print(f"{'':20s} {'prompt tok mean':>16s} {'max':>6s} {'gen p50 ms':>11s} {'max ms':>8s}")
+    for name, (mean_t, max_t, p50, mx) in rows.items():
+        print(f"{name:20s} {mean_t:16.0f} {max_t:6d} {p50 * 1000:11.1f} {mx * 1000:8.1f}")
+    print(f"context build: median {statistics.median(build_s) * 1000:.2f} ms, max {max(build_s) * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
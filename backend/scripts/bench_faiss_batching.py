@@ -0,0 +1,71 @@
+"""
+Throughput of FaissRetriever with and without micro-batching at 1, 8, 32 and 128
+concurrent callers. Needs a built index (scripts/build_faiss_index.py).
+Usage:
+  python scripts/bench_faiss_batching.py
+  python scripts/bench_faiss_batching.py --queries 512 --concurrency 1 8 32 128 --repeat-ratio 0.5
+"""
+import sys, time, random, argparse, statistics
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.retrieval_faiss import FaissRetriever
+from app.services.faiss_index import search_params
+
+TOPICS = ["hba1c", "glucose", "ldl cholesterol", "chest pain", "acne", "abdominal pain",
+          "anemia", "thyroid", "blood pressure", "kidney function", "asthma", "migraine"]
+
+def make_queries(n: int, repeat_ratio: float, seed: int = 0):
+    rnd = random.Random(seed)
+    uniq = [f"what does {rnd.choice(TOPICS)} mean for patient {i}" for i in range(n)]
+    # a share of queries repeats earlier ones, as real traffic does
+    return [rnd.choice(uniq[:max(1, i)]) if rnd.random() < repeat_ratio else q for i, q in enumerate(uniq)]
+
+def run(call, queries, concurrency: int, k: int):
+    lat = []
+    def one(q):
+        t0 = time.perf_counter()
+        call(q, k)
+        lat.append((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(one, queries))
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return {"qps": len(queries) / wall, "p50_ms": statistics.median(lat),
+            "p99_ms": lat[min(len(lat) - 1, int(len(lat) * 0.99))]}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=512)
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--repeat-ratio", type=float, default=0.0, help="Share of repeated queries (exercises the embedding LRU)")
+    args = ap.parse_args()
+
+    r = FaissRetriever()
+    queries = make_queries(args.queries, args.repeat_ratio)
+    r.retrieve("warm up", args.k)
+
+    # the pre-batching path: one encode + one search per call, no embedding cache
+    def unbatched(q, k):
+        e = r.model.encode([q], normalize_embeddings=True).astype("float32")
+        r.index.search(e, k, params=search_params(r.index, r.index_kind, settings.FAISS_NPROBE, settings.FAISS_EF_SEARCH))
+
+    print(f"{'callers':>8} {'mode':>10} {'q/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'avg batch':>10}")
+    for c in args.concurrency:
+        base = run(unbatched, queries, c, args.k)
+        r.emb_cache.clear()
+        b0, i0 = r.batcher.batches, r.batcher.items
+        batched = run(r.retrieve, queries, c, args.k)
+        avg = (r.batcher.items - i0) / max(1, r.batcher.batches - b0)
+        for mode, res, extra in (("unbatched", base, ""), ("batched", batched, f"{avg:10.1f}")):
+            print(f"{c:>8} {mode:>10} {res['qps']:9.1f} {res['p50_ms']:9.2f} {res['p99_ms']:9.2f} {extra}")
+    print(f"[OK] embedding cache: {r.emb_cache.hits} hits / {r.emb_cache.misses} misses")
+    r.close()
+
+if __name__ == "__main__":
+    main()
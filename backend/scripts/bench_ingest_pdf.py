@@ -0,0 +1,47 @@
+"""
+Pages/second of scripts/ingest_pdf.py at 1, 4 and 8 extraction workers on a generated
+text PDF (or a real one), checking that every worker count writes identical chunks.
+Usage:
+  python scripts/bench_ingest_pdf.py                      # 400 generated pages
+  python scripts/bench_ingest_pdf.py --pages 4000 --workers 1 4 8
+  python scripts/bench_ingest_pdf.py --pdf "C:\\path\\to\\gale.pdf" --end 400
+"""
+import sys, time, argparse, tempfile, contextlib, io
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+import ingest_pdf
+from app.services.chunk_store import ChunkStore
+from app.tests.sample_pdf import make_pdf
+
+def chunks(outdir: Path):
+    return [text for _, text in ChunkStore(outdir).iter_chunks()]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", help="Real PDF to ingest (default: generate one)")
+    ap.add_argument("--pages", type=int, default=400, help="Pages to generate")
+    ap.add_argument("--end", type=int, help="Last page to ingest")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    ap.add_argument("--range-size", type=int, default=50)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(args.pdf) if args.pdf else make_pdf(Path(tmp) / "sample.pdf", args.pages)
+        baseline = None
+        print(f"{'workers':>8} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'chunks':>7} {'same':>5}")
+        for w in args.workers:
+            ingest_pdf.OUTDIR = Path(tmp) / f"out_{w}"
+            ingest_pdf.OUTDIR.mkdir()
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ingest_pdf.ingest_pdf(pdf, 1, args.end, workers=w, range_size=args.range_size)
+            elapsed = time.perf_counter() - t0
+            out = chunks(ingest_pdf.OUTDIR)
+            baseline = baseline or out
+            pages = min(args.end or 10**9, len(ingest_pdf.PdfReader(str(pdf)).pages))
+            print(f"{w:>8} {pages:>6} {elapsed:8.2f} {pages / elapsed:8.1f} {len(out):>7} {str(out == baseline):>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Scalar normalize_and_score vs the vectorized scorer on a synthetic cohort.
+Usage:
+  python scripts/bench_lab_scoring.py                   # 1M rows
+  python scripts/bench_lab_scoring.py --rows 5000000 --scalar-rows 200000
+"""
+import sys, time, random, argparse
+from pathlib import Path
+import numpy as np
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.labs.evaluator import REFS, normalize_and_score
+from app.labs.scoring import normalize_and_score_many, encode, classify
+
+def cohort(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    names = list(REFS) + ["Unlisted Marker"]
+    out = []
+    for _ in range(n):
+        name = rnd.choice(names)
+        lo, hi = (REFS.get(name, {}).get("general") or REFS.get(name, {}).get("female") or (1, 10))
+        out.append({"test_name": name, "value": round(rnd.uniform(lo * 0.7, hi * 1.3), 2), "unit": "",
+                    "sex": rnd.choice(["male", "female", None]), "age": rnd.randint(18, 90)})
+    return out
+
+def timed(fn, *a):
+    t0 = time.perf_counter()
+    res = fn(*a)
+    return res, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--scalar-rows", type=int, default=200_000, help="Rows for the (slow) scalar baseline")
+    args = ap.parse_args()
+
+    rows = cohort(args.rows)
+    small = rows[:args.scalar_rows]
+    scalar, t_scalar = timed(normalize_and_score, small)
+    vec, t_vec = timed(normalize_and_score_many, small)
+    assert scalar == vec, "vectorized scorer diverged from normalize_and_score"
+    print(f"[INFO] {len(small)} rows (dict in, dict out): scalar {t_scalar:.2f}s, vectorized {t_vec:.2f}s "
+          f"({t_scalar / t_vec:.1f}x), outputs identical")
+
+    _, t_full = timed(normalize_and_score_many, rows)
+    names = np.array([r["test_name"] for r in rows])
+    values = np.array([r["value"] for r in rows])
+    sexes = np.array([r["sex"] or "" for r in rows])
+    (test, sex), t_encode = timed(encode, names, sexes)
+    status, t_classify = timed(classify, test, sex, values)
+    print(f"[INFO] {len(rows)} rows: dicts {t_full:.2f}s ({len(rows) / t_full / 1e6:.2f}M rows/s), "
+          f"columnar encode {t_encode:.3f}s + classify {t_classify:.3f}s "
+          f"({len(rows) / t_classify / 1e6:.0f}M rows/s), {int((status == 1).sum() + (status == 3).sum())} flagged")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+ONNX (int8) vs PyTorch sentence encoder: parity, latency, throughput and footprint.
+- parity: cosine between the two embeddings of each doc/query (mean, min), and recall@k
+  of the candidate's top-k against the reference's over the KB + chunk corpus, both
+  with a candidate-built index and with candidate queries on the reference index
+  (switching EMBED_MODEL without rebuilding). Exits 1 below --min-cosine / --min-recall.
+- latency: single-query encode p50/p99; throughput: docs/s at --batch-size.
+- footprint: import + load time and peak RSS of each backend in a fresh interpreter.
+Export the model first with scripts/export_onnx_encoder.py.
+Usage:
+  python scripts/bench_onnx_encoder.py
+  python scripts/bench_onnx_encoder.py --candidate onnx:app/onnx/all-MiniLM-L6-v2-int8 --threads 1 2 4
+  python scripts/bench_onnx_encoder.py --docs 2000 --queries 300 --k 10 --min-recall 0.9
+"""
+import sys, json, time, random, argparse, subprocess
+from pathlib import Path
+import numpy as np
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.chunk_store import load_chunk_docs
+from app.services.embedding import ONNX_PREFIX, load_encoder
+
+REFERENCE = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_ONNX = ONNX_PREFIX + str(ROOT / "app" / "onnx" / "all-MiniLM-L6-v2-int8")
+QUERIES = [
+    "what is a normal hba1c",
+    "symptoms of high cholesterol",
+    "chest pain red flags",
+    "treatment of asthma in children",
+    "how is an abdominal ultrasound performed",
+    "signs of an abscess",
+]
+MAX_CHARS = 4000  # as in build_faiss_index.py
+
+PROBE = """
+import sys, time, json, resource
+t0 = time.perf_counter()
+from app.services.embedding import load_encoder
+enc = load_encoder(sys.argv[1], threads=int(sys.argv[2]))
+enc.encode(["warm up"], normalize_embeddings=True)
+print(json.dumps({"seconds": time.perf_counter() - t0,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+def corpus(limit: int):
+    texts = [p.read_text(encoding="utf-8") for p in sorted((ROOT / "app" / "kb").glob("**/*.md"))]
+    texts += [d["content"] for d in load_chunk_docs(ROOT / "app" / "kb_chunks")]
+    return [t[:MAX_CHARS] for t in texts[:limit]]
+
+def sample_queries(docs, n: int, seed: int = 3):
+    # fixed questions plus the opening words of random docs, like users quoting a source
+    rnd = random.Random(seed)
+    out = list(QUERIES)
+    while len(out) < n and docs:
+        words = rnd.choice(docs).split()
+        out.append(" ".join(words[:rnd.randint(4, 12)]))
+    return out[:n]
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def topk(docs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    # exact inner product over normalized vectors (= the flat FAISS index)
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+def recall(truth: np.ndarray, got: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(a) for a, b in zip(truth, got)]))
+
+def speed(enc, queries, docs, batch_size):
+    lat = []
+    for q in queries:
+        t0 = time.perf_counter()
+        enc.encode([q], normalize_embeddings=True)
+        lat.append(time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    enc.encode(docs, batch_size=batch_size, normalize_embeddings=True)
+    return pct(lat, 0.5), pct(lat, 0.99), len(docs) / (time.perf_counter() - t0)
+
+def footprint(name: str, threads: int):
+    out = subprocess.run([sys.executable, "-c", PROBE, name, str(threads)], cwd=ROOT,
+                         capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+    return json.loads(out)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reference", default=REFERENCE, help="PyTorch sentence-transformers model")
+    ap.add_argument("--candidate", default=settings.EMBED_MODEL if settings.EMBED_MODEL.startswith(ONNX_PREFIX)
+                    else DEFAULT_ONNX, help="onnx:<dir> from export_onnx_encoder.py")
+    ap.add_argument("--threads", type=int, nargs="+", default=[settings.ONNX_THREADS],
+                    help="onnxruntime intra-op threads to compare (0 = default)")
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--min-cosine", type=float, default=0.98, help="Fail below this mean cosine")
+    ap.add_argument("--min-recall", type=float, default=0.9, help="Fail below this recall@k")
+    args = ap.parse_args()
+
+    docs = corpus(args.docs)
+    if not docs:
+        print("[WARN] No docs found in app/kb or app/kb_chunks"); return
+    queries = sample_queries(docs, args.queries)
+    print(f"{len(docs)} docs, {len(queries)} queries, k={args.k}")
+
+    ref = load_encoder(args.reference)
+    ref_docs = np.asarray(ref.encode(docs, batch_size=args.batch_size, normalize_embeddings=True), dtype="float32")
+    ref_q = np.asarray(ref.encode(queries, normalize_embeddings=True), dtype="float32")
+    cand = load_encoder(args.candidate, threads=args.threads[0])
+    cand_docs = cand.encode(docs, batch_size=args.batch_size, normalize_embeddings=True)
+    cand_q = cand.encode(queries, normalize_embeddings=True)
+
+    cos = np.concatenate([(ref_docs * cand_docs).sum(1), (ref_q * cand_q).sum(1)])
+    truth = topk(ref_docs, ref_q, args.k)
+    rec_own = recall(truth, topk(cand_docs, cand_q, args.k))
+    rec_mixed = recall(truth, topk(ref_docs, cand_q, args.k))
+    print(f"\nparity: cosine mean {cos.mean():.4f} min {cos.min():.4f}; recall@{args.k} "
+          f"{rec_own:.3f} (onnx index) {rec_mixed:.3f} (onnx queries on pytorch index)")
+
+    print(f"\n{'encoder':10s} {'threads':>7s} {'q p50 ms':>9s} {'q p99 ms':>9s} {'docs/s':>8s} {'load s':>7s} {'RSS MB':>7s}")
+    rows = [(args.reference, "pytorch", None, ref)]
+    for t in args.threads:
+        rows.append((args.candidate, "onnx int8", t, cand if t == args.threads[0] else load_encoder(args.candidate, threads=t)))
+    for name, label, threads, enc in rows:
+        p50, p99, tput = speed(enc, queries, docs, args.batch_size)
+        fp = footprint(name, threads or 0)
+        print(f"{label:10s} {'-' if threads is None else threads:>7} {p50 * 1e3:9.2f} {p99 * 1e3:9.2f} {tput:8.0f} "
+              f"{fp['seconds']:7.2f} {fp['rss_mb']:7.0f}")
+
+    if cos.mean() < args.min_cosine or min(rec_own, rec_mixed) < args.min_recall:
+        print(f"\n[FAIL] parity below --min-cosine {args.min_cosine} / --min-recall {args.min_recall}")
+        sys.exit(1)
+    print("\n[OK] parity within thresholds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Load test: /chat latency on its own, then while /upload is flooded with large FHIR
+bundles. Runs the app under uvicorn (subprocess) against the stub LLM server, so only
+this machine's CPU is measured. Reports chat p50/p99 and the /upload status mix
+(200 vs 503 shed by admission control).
+Usage:
+  python scripts/bench_overload.py
+  python scripts/bench_overload.py --duration 20 --chat-concurrency 8 --uploaders 16 --bundle-mb 5
+  POOL_LABS_KIND=thread POOL_LABS_QUEUE=10000 python scripts/bench_overload.py   # unbounded threads
+"""
+import sys, os, io, json, time, socket, random, shutil, asyncio, argparse, statistics, subprocess, tempfile
+from collections import Counter
+from pathlib import Path
+import httpx
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.tests.stub_llm import StubLLMServer
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def fhir_bundle(mb: float, seed: int = 0) -> bytes:
+    rnd = random.Random(seed)
+    out, size, i = io.StringIO(), 0, 0
+    out.write('{"resourceType": "Bundle", "entry": [')
+    while out.tell() < mb * 2**20:
+        out.write(("," if i else "") + json.dumps({"resource": {
+            "resourceType": "Observation", "code": {"coding": [{"display": rnd.choice(["Glucose", "LDL", "TSH"])}]},
+            "valueQuantity": {"value": round(rnd.uniform(1, 200), 1), "unit": "mg/dL"}}}))
+        i += 1
+    out.write("]}")
+    return out.getvalue().encode("utf-8")
+
+def pct(lat, p):
+    lat = sorted(lat)
+    return lat[min(len(lat) - 1, int(len(lat) * p))] if lat else float("nan")
+
+async def chat_load(client, concurrency: int, duration: float):
+    lat, codes = [], Counter()
+    stop = time.perf_counter() + duration
+    async def worker(w):
+        i = 0
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            r = await client.post("/chat", json={"message": f"what is a normal hba1c {w}-{i}"})
+            lat.append((time.perf_counter() - t0) * 1000)
+            codes[r.status_code] += 1
+            i += 1
+    await asyncio.gather(*[worker(w) for w in range(concurrency)])
+    return lat, codes
+
+async def upload_flood(client, uploaders: int, body: bytes, stop: asyncio.Event):
+    codes = Counter()
+    async def worker():
+        while not stop.is_set():
+            r = await client.post("/upload", files={"file": ("bundle.json", body, "application/json")})
+            codes[r.status_code] += 1
+            if r.status_code == 503:
+                await asyncio.sleep(0.05)  # a polite client would honour Retry-After; this one hammers
+    await asyncio.gather(*[worker() for _ in range(uploaders)])
+    return codes
+
+async def scenario(base_url, args, body, flood: bool):
+    limits = httpx.Limits(max_connections=args.chat_concurrency + args.uploaders + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        stop = asyncio.Event()
+        flood_task = asyncio.create_task(upload_flood(client, args.uploaders, body, stop)) if flood else None
+        if flood:
+            await asyncio.sleep(2)  # let the upload pool fill up
+        lat, chat_codes = await chat_load(client, args.chat_concurrency, args.duration)
+        stop.set()
+        upload_codes = await flood_task if flood else Counter()
+    return lat, chat_codes, upload_codes
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--duration", type=float, default=15)
+    ap.add_argument("--chat-concurrency", type=int, default=8)
+    ap.add_argument("--uploaders", type=int, default=16)
+    ap.add_argument("--bundle-mb", type=float, default=5)
+    ap.add_argument("--llm-latency", type=float, default=0.05)
+    args = ap.parse_args()
+
+    body = fhir_bundle(args.bundle_mb)
+    store_dir = tempfile.mkdtemp(prefix="bench_store_")
+    with StubLLMServer(latency=args.llm_latency) as stub:
+        port = free_port()
+        env = dict(os.environ, USE_LOCAL="true", LOCAL_URL=stub.ollama_url, ANSWER_CACHE_ENABLED="False",
+                   FILE_STORE_DIR=store_dir,
+                   UPLOAD_RESULT_CACHE="False")  # the flood re-sends one body: score it every time
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                                   "--log-level", "warning"], cwd=ROOT, env=env)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            for _ in range(100):
+                try:
+                    httpx.get(base_url + "/docs", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    time.sleep(0.2)
+            print(f"[INFO] labs pool: {os.getenv('POOL_LABS_KIND', 'process')}, "
+                  f"{args.uploaders} uploaders x {len(body) / 2**20:.1f} MB bundles, {args.chat_concurrency} chat clients")
+            print(f"{'scenario':>16} {'chat req':>8} {'p50 ms':>8} {'p99 ms':>8}  uploads")
+            for name, flood in (("chat only", False), ("chat + uploads", True)):
+                lat, chat_codes, up = asyncio.run(scenario(base_url, args, body, flood))
+                errors = sum(n for c, n in chat_codes.items() if c != 200)
+                print(f"{name:>16} {len(lat):>8} {statistics.median(lat):8.1f} {pct(lat, 0.99):8.1f}  "
+                      f"{dict(up) if flood else '-'}{f'  chat errors: {errors}' if errors else ''}")
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(store_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
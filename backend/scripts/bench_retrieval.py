@@ -0,0 +1,70 @@
+"""
+Benchmark InMemoryRetriever (BM25 inverted index) against the old
+per-doc substring scorer on the kb + kb_chunks corpus scaled up N times.
+Usage:
+  python scripts/bench_retrieval.py
+  python scripts/bench_retrieval.py --scale 100 --queries 200
+"""
+import sys, math, time, argparse, statistics
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.services.retrieval import InMemoryRetriever
+
+QUERIES = [
+    "what is a normal hba1c",
+    "fasting plasma glucose range",
+    "ldl cholesterol optimal level",
+    "chest pain with shortness of breath",
+    "symptoms of acne treatment",
+    "abdominal pain causes diagnosis",
+    "hdl low in women",
+    "triglycerides normal value",
+]
+
+def legacy_score(query: str, content: str) -> float:
+    tokens = [t for t in query.lower().split() if len(t) > 2]
+    if not tokens: return 0.0
+    cl = content.lower()
+    score = sum(cl.count(t) for t in tokens)
+    return score / math.sqrt(len(content) + 1)
+
+def legacy_retrieve(docs, query: str, k: int = 5):
+    return sorted(docs, key=lambda d: legacy_score(query, d["content"]), reverse=True)[:k]
+
+def run(fn, n_queries: int):
+    lat = []
+    for i in range(n_queries):
+        q = QUERIES[i % len(QUERIES)]
+        t0 = time.perf_counter()
+        fn(q)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat.sort()
+    return {"p50_ms": statistics.median(lat), "p99_ms": lat[min(len(lat) - 1, int(len(lat) * 0.99))],
+            "qps": 1000 * len(lat) / sum(lat)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", type=int, default=100, help="Replicate the corpus this many times")
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    base = InMemoryRetriever().docs
+    docs = [dict(d, id=f"{d['id']}#{r}") for r in range(args.scale) for d in base]
+    print(f"[INFO] corpus: {len(docs)} docs ({len(base)} x {args.scale})")
+
+    t0 = time.perf_counter()
+    r = InMemoryRetriever.from_docs(docs)
+    print(f"[INFO] index build: {time.perf_counter() - t0:.2f}s, {len(r.postings)} terms")
+
+    legacy_n = max(1, args.queries // 10)   # the old scorer is slow; fewer runs are enough
+    old = run(lambda q: legacy_retrieve(docs, q, args.k), legacy_n)
+    new = run(lambda q: r.retrieve(q, args.k), args.queries)
+    for name, res in (("legacy", old), ("bm25", new)):
+        print(f"{name:>7}: p50 {res['p50_ms']:8.2f} ms  p99 {res['p99_ms']:8.2f} ms  {res['qps']:9.1f} q/s")
+    print(f"[OK] p50 speedup x{old['p50_ms'] / new['p50_ms']:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Startup benchmark.
+- import: wall time of `import app.main` in a fresh interpreter (median of --runs), and
+  which heavy optional dependencies that import pulled in.
+- first answer: launches uvicorn against the stub LLM and times, from process start,
+  the first 200 from /health (liveness) and /chat (first answer), and reports the
+  warm-up time from /ready.
+Pass settings through the environment, e.g. USE_FAISS=true to include model/index load.
+Usage:
+  python scripts/bench_startup.py
+  python scripts/bench_startup.py --runs 10
+  USE_FAISS=true python scripts/bench_startup.py
+"""
+import sys, os, json, time, socket, argparse, statistics, subprocess
+from pathlib import Path
+import httpx
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.tests.stub_llm import StubLLMServer
+
+HEAVY = ["pdf2image", "pytesseract", "PIL", "pandas", "pypdf", "mistralai", "torch", "sentence_transformers", "onnxruntime", "faiss"]
+
+PROBE = f"""
+import sys, time, json
+t0 = time.perf_counter()
+import app.main
+dt = time.perf_counter() - t0
+print(json.dumps({{"seconds": dt, "loaded": [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def import_time(runs: int):
+    out = [json.loads(subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True,
+                                     text=True, check=True).stdout.strip().splitlines()[-1]) for _ in range(runs)]
+    return statistics.median(o["seconds"] for o in out), out[-1]["loaded"]
+
+def first_answer(timeout: float = 300):
+    with StubLLMServer(latency=0.0) as stub:
+        port = free_port()
+        env = dict(os.environ, USE_LOCAL="true", LOCAL_URL=stub.ollama_url, ANSWER_CACHE_ENABLED="False")
+        base = f"http://127.0.0.1:{port}"
+        t0 = time.perf_counter()
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                                   "--log-level", "warning"], cwd=ROOT, env=env)
+        marks = {}
+        try:
+            with httpx.Client(base_url=base, timeout=timeout) as client:
+                for name, method, path in (("health", "GET", "/health"), ("chat", "POST", "/chat")):
+                    while time.perf_counter() - t0 < timeout:
+                        try:
+                            r = client.request(method, path, json={"message": "what is a normal hba1c"}
+                                               if method == "POST" else None)
+                            if r.status_code == 200:
+                                break
+                        except httpx.TransportError:
+                            pass
+                        time.sleep(0.01)
+                    marks[name] = time.perf_counter() - t0
+                marks["warmup"] = client.get("/ready").json().get("warmup_seconds")
+        finally:
+            server.terminate()
+            server.wait()
+    return marks
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    seconds, loaded = import_time(args.runs)
+    print(f"import app.main: {seconds * 1000:.0f} ms (median of {args.runs}); "
+          f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+    marks = first_answer()
+    print(f"from process start: live {marks['health'] * 1000:.0f} ms, first /chat answer "
+          f"{marks['chat'] * 1000:.0f} ms (warm-up {marks['warmup']} s)")
+
+if __name__ == "__main__":
+    main()
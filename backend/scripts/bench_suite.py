@@ -0,0 +1,277 @@
+"""
+Benchmark suite for the hot paths, with JSON baselines and a regression gate.
+Cases (select with --only, by name prefix):
+  retrieval.bm25[N]     InMemoryRetriever.retrieve on an N-doc corpus (kb + kb_chunks, replicated)
+  retrieval.faiss[N]    FaissRetriever.retrieve on an N-doc synthetic index (needs EMBED_MODEL)
+  ingest.pdf            scripts/ingest_pdf.py on a generated text PDF
+  labs.score            normalize_and_score
+  labs.parse_csv / labs.parse_fhir / labs.parse_pdf (parse_pdf needs poppler + tesseract)
+  http.chat / http.patient_chat / http.upload   full requests against a stub Ollama server
+Each case reports throughput and p50/p95/p99 latency per operation. --save writes the
+results as a baseline; --baseline compares against one and exits 1 when a case's
+throughput drops, or its p95 rises, by more than --threshold.
+Usage:
+  python scripts/bench_suite.py
+  python scripts/bench_suite.py --quick --only labs http
+  python scripts/bench_suite.py --save bench_baseline.json
+  python scripts/bench_suite.py --baseline bench_baseline.json --threshold 0.25
+  python scripts/bench_suite.py --sizes 1000 10000 100000 --llm-latency 0.2 --concurrency 16
+"""
+import sys, gc, io, os, json, time, shutil, asyncio, argparse, platform, tempfile, contextlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+from app.config.settings import settings
+from app.tests.stub_llm import StubLLMServer
+
+QUERIES = ["what is a normal hba1c", "fasting plasma glucose range", "ldl cholesterol optimal level",
+           "chest pain with shortness of breath", "symptoms of acne treatment", "abdominal pain causes diagnosis",
+           "hdl low in women", "triglycerides normal value"]
+
+class Skip(Exception):
+    pass
+
+# ---- measurement ----
+def percentile(sorted_ms: List[float], p: float) -> float:
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * p))]
+
+def summarize(lat_ms: List[float], wall: float, items: float, unit: str) -> Dict:
+    lat = sorted(lat_ms)
+    return {"unit": unit, "ops": len(lat), "throughput": items / wall if wall else 0.0,
+            "p50_ms": percentile(lat, 0.50), "p95_ms": percentile(lat, 0.95), "p99_ms": percentile(lat, 0.99)}
+
+def measure(fn: Callable[[int], object], n: int, unit: str, items_per_op: float = 1, warmup: int = 1) -> Dict:
+    for i in range(warmup):
+        fn(i)
+    lat = []
+    # as timeit does: a collection of garbage left by earlier cases is not this case's latency
+    gc.collect()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for i in range(n):
+            t = time.perf_counter()
+            fn(i)
+            lat.append((time.perf_counter() - t) * 1000)
+        wall = time.perf_counter() - t0
+    finally:
+        gc.enable()
+    return summarize(lat, wall, n * items_per_op, unit)
+
+async def ameasure(fn, n: int, concurrency: int, unit: str) -> Dict:
+    lat, next_i = [], iter(range(n))
+    async def worker():
+        for i in next_i:
+            t = time.perf_counter()
+            await fn(i)
+            lat.append((time.perf_counter() - t) * 1000)
+    await fn(-1)  # warm-up
+    t0 = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(lat, time.perf_counter() - t0, n, unit)
+
+# ---- cases ----
+def retrieval_bm25(args, size: int) -> Dict:
+    from app.services.retrieval import InMemoryRetriever
+    base = InMemoryRetriever().docs
+    docs = [dict(base[i % len(base)], id=f"{base[i % len(base)]['id']}#{i}") for i in range(size)]
+    r = InMemoryRetriever.from_docs(docs)
+    return measure(lambda i: r.retrieve(QUERIES[i % len(QUERIES)], settings.TOP_K), args.queries, "queries/s")
+
+def retrieval_faiss(args, size: int, tmp: Path) -> Dict:
+    from app.services.retrieval_faiss import FaissRetriever
+    from bench_ann import synthetic
+    from bench_worker_memory import write_corpus
+    out = tmp / f"faiss_{size}"
+    out.mkdir(exist_ok=True)
+    paths = write_corpus(out, synthetic(size, args.faiss_dim), "flat", text_chars=400)
+    try:
+        r = FaissRetriever(index_path=paths["index"], meta_path=paths["bin"], mmap=False)
+    except Exception as e:
+        raise Skip(f"FaissRetriever unavailable ({type(e).__name__}: {str(e)[:80]})")
+    try:
+        # distinct texts, so the embedding LRU does not turn this into a cache benchmark
+        return measure(lambda i: r.retrieve(f"{QUERIES[i % len(QUERIES)]} {i}", settings.TOP_K),
+                       args.queries, "queries/s")
+    finally:
+        r.close()
+
+def ingest_pdf_case(args, tmp: Path) -> Dict:
+    import ingest_pdf
+    from app.tests.sample_pdf import make_pdf
+    pdf = make_pdf(tmp / "ingest.pdf", args.pdf_pages)
+
+    def run(i):
+        ingest_pdf.OUTDIR = tmp / f"ingest_out_{i}"
+        ingest_pdf.OUTDIR.mkdir()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ingest_pdf.ingest_pdf(pdf, 1, None, workers=1)
+        shutil.rmtree(ingest_pdf.OUTDIR)
+    return measure(run, args.runs, "pages/s", items_per_op=args.pdf_pages)
+
+def _cohort(n: int) -> List[Dict]:
+    from bench_lab_scoring import cohort
+    return cohort(n)
+
+def _csv_bytes(rows: List[Dict]) -> bytes:
+    lines = ["test_name,value,unit,sex"] + [f"{r['test_name']},{r['value']},{r['unit']},{r['sex'] or ''}" for r in rows]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def _fhir_bytes(rows: List[Dict]) -> bytes:
+    return json.dumps({"resourceType": "Bundle", "entry": [{"resource": {
+        "resourceType": "Observation", "code": {"coding": [{"display": r["test_name"]}]},
+        "valueQuantity": {"value": r["value"], "unit": r["unit"]}}} for r in rows]}).encode("utf-8")
+
+def labs_score(args) -> Dict:
+    from app.labs.evaluator import normalize_and_score
+    rows = _cohort(args.rows)
+    return measure(lambda i: normalize_and_score(rows), args.runs, "rows/s", items_per_op=len(rows))
+
+def labs_parse_csv(args) -> Dict:
+    from app.labs.evaluator import parse_csv_bytes
+    data = _csv_bytes(_cohort(args.rows))
+    return measure(lambda i: parse_csv_bytes(data), args.runs, "rows/s", items_per_op=args.rows)
+
+def labs_parse_fhir(args) -> Dict:
+    from app.labs.evaluator import parse_fhir_bytes
+    data = _fhir_bytes(_cohort(args.rows))
+    return measure(lambda i: parse_fhir_bytes(data), args.runs, "rows/s", items_per_op=args.rows)
+
+def labs_parse_pdf(args, tmp: Path) -> Dict:
+    if not (shutil.which("pdftoppm") and shutil.which("tesseract")):
+        raise Skip("poppler/tesseract not installed")
+    from app.labs.evaluator import parse_pdf_bytes
+    from app.tests.sample_pdf import make_pdf
+    data = make_pdf(tmp / "labs.pdf", pages=2).read_bytes()
+    return measure(lambda i: parse_pdf_bytes(data), max(1, args.runs // 2), "pages/s", items_per_op=2)
+
+def http_case(args, path: str) -> Dict:
+    import httpx
+    from app.main import app
+    from app.services.llm_clients import aclose_clients
+    upload = _csv_bytes(_cohort(50))
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            async def one(i):
+                if path == "/upload":
+                    r = await client.post(path, files={"file": ("labs.csv", upload, "text/csv")})
+                else:
+                    r = await client.post(path, json={"message": f"{QUERIES[i % len(QUERIES)]} {i}"})
+                if r.status_code != 200:
+                    raise RuntimeError(f"{path} returned {r.status_code}: {r.text[:200]}")
+            res = await ameasure(one, args.requests, args.concurrency, "req/s")
+        await aclose_clients()
+        return res
+    return asyncio.run(go())
+
+def cases(args, tmp: Path) -> Dict[str, Callable[[], Dict]]:
+    out = {}
+    for n in args.sizes:
+        out[f"retrieval.bm25[{n}]"] = lambda n=n: retrieval_bm25(args, n)
+    for n in args.sizes:
+        out[f"retrieval.faiss[{n}]"] = lambda n=n: retrieval_faiss(args, n, tmp)
+    out["ingest.pdf"] = lambda: ingest_pdf_case(args, tmp)
+    out["labs.score"] = lambda: labs_score(args)
+    out["labs.parse_csv"] = lambda: labs_parse_csv(args)
+    out["labs.parse_fhir"] = lambda: labs_parse_fhir(args)
+    out["labs.parse_pdf"] = lambda: labs_parse_pdf(args, tmp)
+    out["http.chat"] = lambda: http_case(args, "/chat")
+    out["http.patient_chat"] = lambda: http_case(args, "/patient-chat")
+    out["http.upload"] = lambda: http_case(args, "/upload")
+    return out
+
+@contextlib.contextmanager
+def stub_settings(stub: StubLLMServer, tmp: Path):
+    # full-request cases go through the stub; every request must reach it
+    overrides = {"USE_LOCAL": True, "USE_MISTRAL": False, "LOCAL_URL": stub.ollama_url,
+                 "MISTRAL_ENDPOINT": stub.base_url, "ANSWER_CACHE_ENABLED": False,
+                 "OCR_CACHE_DIR": "",  # measure OCR, not the page cache
+                 "UPLOAD_RESULT_CACHE": False, "FILE_STORE_DIR": str(tmp / "file_store")}
+    saved = {k: getattr(settings, k) for k in overrides}
+    for k, v in overrides.items():
+        setattr(settings, k, v)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            setattr(settings, k, v)
+
+# ---- baselines ----
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Regressions of results against baseline["results"], as readable lines."""
+    out = []
+    for name, r in results.items():
+        b = baseline.get("results", {}).get(name)
+        if not b or "skipped" in b or "skipped" in r:
+            continue
+        if r["throughput"] < b["throughput"] * (1 - threshold):
+            out.append(f"{name}: throughput {r['throughput']:.1f} {r['unit']} vs {b['throughput']:.1f} "
+                       f"({r['throughput'] / b['throughput'] - 1:+.0%})")
+        if r["p95_ms"] > b["p95_ms"] * (1 + threshold):
+            out.append(f"{name}: p95 {r['p95_ms']:.2f} ms vs {b['p95_ms']:.2f} ms ({r['p95_ms'] / b['p95_ms'] - 1:+.0%})")
+    return out
+
+def environment() -> Dict:
+    return {"date": datetime.now(timezone.utc).isoformat(timespec="seconds"), "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--only", nargs="+", help="Run cases whose name starts with any of these")
+    ap.add_argument("--quick", action="store_true", help="Small sizes and counts (smoke run)")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Retrieval corpus sizes")
+    ap.add_argument("--faiss-dim", type=int, default=384, help="Must match EMBED_MODEL's dimension")
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--rows", type=int, default=5000, help="Lab rows per scoring/parsing call")
+    ap.add_argument("--runs", type=int, default=20, help="Calls per labs case / ingest runs")
+    ap.add_argument("--pdf-pages", type=int, default=50)
+    ap.add_argument("--requests", type=int, default=200, help="HTTP requests per endpoint")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    ap.add_argument("--save", help="Write results to this JSON baseline")
+    ap.add_argument("--baseline", help="Compare against this JSON baseline")
+    ap.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.sizes, args.queries, args.rows, args.runs = [1000], 50, 1000, 5
+        args.pdf_pages, args.requests = 10, 40
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, StubLLMServer(latency=args.llm_latency) as stub, \
+            stub_settings(stub, Path(tmp)):
+        print(f"{'case':<24} {'throughput':>16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, run in cases(args, Path(tmp)).items():
+            if args.only and not any(name.startswith(p) for p in args.only):
+                continue
+            try:
+                r = results[name] = run()
+                print(f"{name:<24} {r['throughput']:>9.1f} {r['unit']:<6} {r['p50_ms']:9.2f} "
+                      f"{r['p95_ms']:9.2f} {r['p99_ms']:9.2f}")
+            except Skip as e:
+                results[name] = {"skipped": str(e)}
+                print(f"{name:<24} [SKIP] {e}")
+    from app.services.executor import shutdown_pools
+    shutdown_pools()
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({"environment": environment(), "args": vars(args),
+                                               "results": results}, indent=2), encoding="utf-8")
+        print(f"[OK] baseline written to {args.save}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            return 1
+        print(f"[OK] no case regressed more than {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Peak memory and time to parse + score a large FHIR Bundle: the old whole-document
+path (read, json.loads, list) vs the incremental parser used by /upload. Each mode runs
+in a fresh subprocess and reports its peak RSS (ru_maxrss).
+Usage:
+  python scripts/bench_upload_parsing.py                  # 500 MB generated bundle
+  python scripts/bench_upload_parsing.py --mb 100 --modes legacy stream
+"""
+import sys, json, time, random, argparse, resource, subprocess, tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+
+TESTS = ["Glucose", "HbA1c", "LDL", "HDL", "Hemoglobin", "Creatinine", "TSH", "Ferritin"]
+
+def write_bundle(path: Path, mb: int, seed: int = 0):
+    rnd = random.Random(seed)
+    target = mb * 2**20
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"resourceType": "Bundle", "type": "collection", "entry": [')
+        i = 0
+        while f.tell() < target:
+            name = rnd.choice(TESTS)
+            entry = {"fullUrl": f"urn:uuid:obs-{i}", "resource": {
+                "resourceType": "Observation", "id": f"obs-{i}", "status": "final",
+                "subject": {"reference": f"Patient/{i // 20}"},
+                "code": {"coding": [{"system": "http://loinc.org", "code": str(1000 + i % 997), "display": name}]},
+                "valueQuantity": {"value": round(rnd.uniform(1, 200), 2), "unit": "mg/dL"}}}
+            f.write(("," if i else "") + json.dumps(entry))
+            i += 1
+        f.write("]}")
+    return i
+
+def run(mode: str, path: str, score: bool):
+    from app.config.settings import settings
+    from app.labs.evaluator import normalize_and_score
+    from app.labs.streaming import iter_file_chunks, iter_fhir_records, observation_record
+    t0 = time.perf_counter()
+    with open(path, "rb") as fh:
+        if mode == "legacy":
+            bundle = json.loads(fh.read().decode("utf-8"))
+            records = [r for r in map(observation_record, bundle.get("entry", [])) if r]
+        else:
+            records = iter_fhir_records(iter_file_chunks(fh, settings.UPLOAD_CHUNK_KB * 1024))
+        if score:
+            n = len(normalize_and_score(records)["per_test"])
+        else:
+            n = sum(1 for _ in records)
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({"rows": n, "seconds": elapsed, "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=int, default=500)
+    ap.add_argument("--modes", nargs="+", default=["legacy", "stream"])
+    ap.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        return run(args.child[0], args.child[1], args.child[2] == "score")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bundle.json"
+        t0 = time.perf_counter()
+        n = write_bundle(path, args.mb)
+        print(f"[INFO] {path.stat().st_size / 2**20:.0f} MB bundle, {n} observations ({time.perf_counter() - t0:.1f}s to write)")
+        print(f"{'mode':>7} {'work':>12} {'rows':>9} {'seconds':>8} {'peak MB':>8}")
+        for work in ("parse", "parse+score"):
+            for mode in args.modes:
+                out = subprocess.run([sys.executable, __file__, "--child", mode, str(path), "score" if "score" in work else "parse"],
+                                     capture_output=True, text=True)
+                if out.returncode:
+                    print(f"{mode:>7} {work:>12} failed: {out.stderr.strip().splitlines()[-1]}")
+                    continue
+                r = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{mode:>7} {work:>12} {r['rows']:>9} {r['seconds']:8.1f} {r['peak_mb']:8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Per-worker memory and cold-start time of the FAISS index + metadata, loaded the legacy
+way (faiss.read_index + JSONL parsed into a list) vs memory-mapped (load_index(mmap=True)
++ packed MetaStore). Spawns N fresh interpreters per mode, like N uvicorn workers; each
+loads, runs searches and decodes the hits, then reports RSS and PSS (shared pages split
+between the processes mapping them) while all workers are alive.
+
+Runs on a synthetic corpus written to a temp dir, or on the built app/ artifacts.
+Usage:
+  python scripts/bench_worker_memory.py                         # 100k synthetic docs, 4 workers
+  python scripts/bench_worker_memory.py --synthetic 200000 --workers 8 --types flat ivf_flat
+  python scripts/bench_worker_memory.py --use-app-index
+"""
+import sys, json, time, random, argparse, tempfile, statistics
+import multiprocessing as mp
+from pathlib import Path
+import faiss, numpy as np
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.faiss_index import build_index, load_index, search_params, index_kind
+from app.services.meta_store import MetaStore, write_meta_store
+from app.services.vector_builds import resolve_build
+from bench_ann import synthetic, queries_from
+
+WORDS = ["patient", "glucose", "therapy", "chronic", "symptom", "dose", "renal", "cardiac",
+         "infection", "diagnosis", "treatment", "insulin", "lesion", "fever", "acute", "blood"]
+
+def proc_memory_mb():
+    rss = pss = 0
+    for line in open("/proc/self/status"):
+        if line.startswith("VmRSS:"):
+            rss = int(line.split()[1]) / 1024
+    try:
+        for line in open("/proc/self/smaps_rollup"):
+            if line.startswith("Pss:"):
+                pss = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss, pss
+
+def worker(mode, paths, queries, k, barrier, out):
+    base_rss, _ = proc_memory_mb()
+    t0 = time.perf_counter()
+    if mode == "legacy":
+        index = faiss.read_index(paths["index"])
+        with open(paths["jsonl"], "r", encoding="utf-8") as f:
+            meta = [json.loads(line) for line in f]
+    else:
+        index = load_index(paths["index"], mmap=True, embeddings_path=paths["emb"])
+        meta = MetaStore(paths["bin"])
+    load_s = time.perf_counter() - t0
+
+    kind = index_kind(index)
+    _, ids = index.search(queries, k, params=search_params(index, kind, settings.FAISS_NPROBE, settings.FAISS_EF_SEARCH))
+    hits = [meta[int(i)]["id"] for row in ids for i in row if i != -1]
+    barrier.wait()  # every worker is mapped in before anyone measures PSS
+    rss, pss = proc_memory_mb()
+    out.put({"load_s": load_s, "rss": rss - base_rss, "pss": pss, "hits": len(hits)})
+    barrier.wait()
+
+def run_mode(mode, paths, queries, k, workers):
+    ctx = mp.get_context("spawn")
+    barrier, out = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, paths, queries, k, barrier, out)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    res = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return res
+
+def write_corpus(tmp: Path, x: np.ndarray, kind: str, text_chars: int):
+    rnd = random.Random(0)
+    docs = [{"id": f"app/kb_chunks/doc_{i:06d}.txt", "source": "gale_pdf", "url": None,
+             "content": " ".join(rnd.choice(WORDS) for _ in range(text_chars // 7))} for i in range(len(x))]
+    paths = {"index": str(tmp / f"{kind}.index"), "jsonl": str(tmp / "meta.jsonl"),
+             "bin": str(tmp / "meta.bin"), "emb": str(tmp / "embeddings.npy")}
+    index = build_index(x, kind, nlist=settings.FAISS_NLIST, hnsw_m=settings.FAISS_HNSW_M,
+                        ef_construction=settings.FAISS_EF_CONSTRUCTION,
+                        pq_m=settings.FAISS_PQ_M, pq_nbits=settings.FAISS_PQ_NBITS)
+    faiss.write_index(index, paths["index"])
+    if not Path(paths["bin"]).exists():
+        with open(paths["jsonl"], "w", encoding="utf-8") as f:
+            for d in docs:
+                f.write(json.dumps(d, ensure_ascii=False) + "\n")
+        write_meta_store(paths["bin"], docs)
+        np.save(paths["emb"], x)
+    return paths
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--synthetic", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--text-chars", type=int, default=1000)
+    ap.add_argument("--types", nargs="+", default=["flat", "ivf_flat"])
+    ap.add_argument("--use-app-index", action="store_true", help="Measure the built app/vector.index + meta instead")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--queries", type=int, default=64)
+    ap.add_argument("--k", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'index':>9} {'mode':>7} {'workers':>8} {'load s':>8} {'RSS MB':>8} {'PSS MB':>8} {'sum PSS':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.use_app_index:
+            app = ROOT / "app"
+            index_path, meta_path, emb_path = resolve_build(
+                app / "vector.index", app / "vector_meta.bin", app / "vector_embeddings.npy")
+            # the legacy path needs JSONL: dump the packed store once
+            jsonl = Path(tmp) / "meta.jsonl"
+            store = MetaStore(meta_path)
+            with open(jsonl, "w", encoding="utf-8") as f:
+                for d in store:
+                    f.write(json.dumps(d, ensure_ascii=False) + "\n")
+            store.close()
+            index = faiss.read_index(str(index_path))
+            x = index.reconstruct_n(0, index.ntotal) if index_kind(index) == "flat" else synthetic(256, index.d)
+            setups = [(index_kind(index), {"index": str(index_path), "jsonl": str(jsonl),
+                                           "bin": str(meta_path), "emb": str(emb_path)})]
+            del index
+        else:
+            x = synthetic(args.synthetic, args.dim)
+            setups = [(kind, write_corpus(Path(tmp), x, kind, args.text_chars)) for kind in args.types]
+        queries = queries_from(x, args.queries)
+        del x
+
+        for kind, paths in setups:
+            for mode in ("legacy", "mmap"):
+                res = run_mode(mode, paths, queries, args.k, args.workers)
+                load = statistics.mean(r["load_s"] for r in res)
+                rss = statistics.mean(r["rss"] for r in res)
+                pss = statistics.mean(r["pss"] for r in res)
+                print(f"{kind:>9} {mode:>7} {args.workers:>8} {load:8.3f} {rss:8.1f} {pss:8.1f} {pss * args.workers:8.1f}")
+    print("[INFO] RSS is the growth over a bare interpreter; PSS is the full per-process footprint")
+
+if __name__ == "__main__":
+    main()
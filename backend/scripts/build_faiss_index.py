@@ -2,17 +2,36 @@
 Build a FAISS index over both KB markdown and PDF chunks.
 Usage:
   python scripts/build_faiss_index.py
+  python scripts/build_faiss_index.py --incremental   # re-embed only new/changed docs
+  python scripts/build_faiss_index.py --index-type hnsw   # default: settings.FAISS_INDEX_TYPE
+
+Incremental mode keeps vector_embeddings.npy plus vector_manifest.json (content hash
+per embedding row). Unchanged docs reuse their stored rows, deleted docs are dropped,
+and only new or edited docs go through the encoder. Each build writes its outputs to
+app/vector_builds/<build id>/ and publishes them together by renaming one pointer file
+(app/vector_current; see app/services/vector_builds.py).
+Metadata is written as a packed, mmap-able store (app/services/meta_store.py).
+The encoder is settings.EMBED_MODEL (PyTorch or "onnx:<dir>", see app/services/embedding.py);
+changing it re-embeds everything, since stored rows are keyed by model.
 """
 from pathlib import Path
-import json, faiss, numpy as np
-from sentence_transformers import SentenceTransformer
+import os, sys, json, time, uuid, hashlib, argparse, faiss, numpy as np
 
 ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.faiss_index import INDEX_TYPES, build_index
+from app.services.meta_store import write_meta_store
+from app.services.chunk_store import load_chunk_docs
+from app.services.vector_builds import build_dir, publish_build, resolve_build
 KB_DIR = ROOT / "app" / "kb"
 CHUNK_DIR = ROOT / "app" / "kb_chunks"
 INDEX_PATH = ROOT / "app" / "vector.index"
-META_PATH = ROOT / "app" / "vector_meta.jsonl"
-MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+META_PATH = ROOT / "app" / "vector_meta.bin"
+EMB_PATH = ROOT / "app" / "vector_embeddings.npy"
+MANIFEST_PATH = ROOT / "app" / "vector_manifest.json"
+MODEL_NAME = settings.EMBED_MODEL
+MAX_CHARS = 4000
 
 def read_docs():
     docs = []
@@ -21,31 +40,87 @@ def read_docs():
             try:
                 docs.append({"id": str(p.relative_to(ROOT)), "content": p.read_text(encoding="utf-8"), "source": "kb", "url": None})
             except: pass
-    if CHUNK_DIR.exists():
-        for p in sorted(CHUNK_DIR.glob("*.txt")):
-            try:
-                docs.append({"id": str(p.relative_to(ROOT)), "content": p.read_text(encoding="utf-8"), "source": "gale_pdf", "url": None})
-            except: pass
+    # chunk store (one streaming read) or legacy .txt files; ids stay app/kb_chunks/<file>
+    docs.extend(load_chunk_docs(CHUNK_DIR, id_prefix=str(CHUNK_DIR.relative_to(ROOT)) + os.sep))
     return docs
 
-def main():
+def content_hash(text: str) -> str:
+    # the embedding depends on the model as well as the (truncated) text
+    return hashlib.sha256(f"{MODEL_NAME}\0{text[:MAX_CHARS]}".encode("utf-8")).hexdigest()
+
+def load_previous():
+    """Returns ({hash: row}, embeddings) from the last build, or ({}, None)."""
+    _, manifest_path, emb_path = resolve_build(INDEX_PATH, MANIFEST_PATH, EMB_PATH)
+    if not (manifest_path.exists() and emb_path.exists()):
+        return {}, None
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        embs = np.load(emb_path, mmap_mode="r")
+    except Exception as e:
+        print(f"[WARN] Ignoring unreadable build manifest: {e}")
+        return {}, None
+    if manifest.get("model") != MODEL_NAME or len(manifest.get("hashes", [])) != embs.shape[0]:
+        return {}, None
+    return {h: i for i, h in enumerate(manifest["hashes"])}, embs
+
+def print_progress(done: int, total: int):
+    print(f"\r[embed] {done}/{total}", end="\n" if done == total else "", flush=True)
+
+def main(incremental: bool = False, index_type: str = None):
+    t0 = time.perf_counter()
     docs = read_docs()
     if not docs:
         print("[WARN] No docs found in app/kb or app/kb_chunks"); return
-    model = SentenceTransformer(MODEL_NAME)
-    texts = [d["content"][:4000] for d in docs]
-    embs = model.encode(texts, batch_size=64, show_progress_bar=True, normalize_embeddings=True)
-    embs = np.asarray(embs).astype("float32")
+    texts = [d["content"][:MAX_CHARS] for d in docs]
+    hashes = [content_hash(t) for t in texts]
+
+    prev_rows, prev_embs = load_previous() if incremental else ({}, None)
+    # one encoder pass per distinct new content hash
+    todo_rows = {}
+    for i, h in enumerate(hashes):
+        if h not in prev_rows and h not in todo_rows:
+            todo_rows[h] = i
+    todo = list(todo_rows.values())
+    removed = len(set(prev_rows) - set(hashes))
+
+    new_embs = None
+    if todo:
+        from app.services.embedding import OnnxEncoder, load_encoder
+        model = load_encoder(MODEL_NAME)
+        # SentenceTransformer draws its own bar; the ONNX encoder reports through a callback
+        shown = {"progress": print_progress} if isinstance(model, OnnxEncoder) else {"show_progress_bar": True}
+        new_embs = model.encode([texts[i] for i in todo], batch_size=64, normalize_embeddings=True, **shown)
+        new_embs = np.asarray(new_embs).astype("float32")
+    dim = new_embs.shape[1] if new_embs is not None else prev_embs.shape[1]
+
+    new_rows = {h: j for j, h in enumerate(todo_rows)}
+    embs = np.empty((len(docs), dim), dtype="float32")
+    for i, h in enumerate(hashes):
+        embs[i] = new_embs[new_rows[h]] if h in new_rows else prev_embs[prev_rows[h]]
+
+    kind = index_type or settings.FAISS_INDEX_TYPE
+    index = build_index(embs, kind, nlist=settings.FAISS_NLIST, hnsw_m=settings.FAISS_HNSW_M,
+                        ef_construction=settings.FAISS_EF_CONSTRUCTION,
+                        pq_m=settings.FAISS_PQ_M, pq_nbits=settings.FAISS_PQ_NBITS)
 
-    index = faiss.IndexFlatIP(embs.shape[1])
-    index.add(embs)
+    # the whole set goes into a new build directory, published by one pointer rename
+    build_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    out = build_dir(INDEX_PATH, build_id)
+    out.mkdir(parents=True)
+    faiss.write_index(index, str(out / INDEX_PATH.name))
+    write_meta_store(out / META_PATH.name, docs)
+    with open(out / EMB_PATH.name, "wb") as f:
+        np.save(f, embs)
+    (out / MANIFEST_PATH.name).write_text(
+        json.dumps({"model": MODEL_NAME, "dim": dim, "hashes": hashes, "build": build_id}), encoding="utf-8")
+    publish_build(INDEX_PATH, build_id)
 
-    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, str(INDEX_PATH))
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        for d in docs:
-            f.write(json.dumps(d, ensure_ascii=False) + "\n")
-    print(f"[OK] Saved {len(docs)} docs to {INDEX_PATH} and {META_PATH}")
+    print(f"[OK] Saved {len(docs)} docs ({kind}) as build {build_id} in {out} "
+          f"(embedded {len(todo)}, reused {len(docs) - len(todo)}, removed {removed}) in {time.perf_counter() - t0:.2f}s")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--incremental", action="store_true", help="Reuse embeddings of unchanged docs from the last build")
+    ap.add_argument("--index-type", choices=INDEX_TYPES, help="Override settings.FAISS_INDEX_TYPE")
+    args = ap.parse_args()
+    main(incremental=args.incremental, index_type=args.index_type)
@@ -0,0 +1,73 @@
+"""
+Answer many questions at once (FAQ precomputation, evaluation sweeps): one bulk
+retrieval, generation fanned out under --concurrency, one NDJSON line per question
+as it completes. Runs in-process with the configured retriever/LLM backend, or
+against a running server's /chat/batch with --url.
+Usage:
+  python scripts/chat_batch.py questions.txt                    # one question per line
+  python scripts/chat_batch.py questions.txt --out answers.ndjson --concurrency 8
+  cat questions.txt | python scripts/chat_batch.py - --url http://localhost:8000
+"""
+import sys, json, time, asyncio, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.services.batch_chat import answer_batch, retrieve_batch
+from app.services.llm_clients import aclose_clients
+from app.services.retrieval import get_retriever
+
+def read_questions(path: str):
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with f:
+        return [line.strip() for line in f if line.strip()]
+
+async def local(questions, concurrency):
+    retriever = get_retriever()
+    try:
+        docs = await retrieve_batch(questions, retriever)
+        async for result in answer_batch(questions, docs, concurrency=concurrency):
+            yield result
+    finally:
+        if hasattr(retriever, "close"):
+            retriever.close()
+        await aclose_clients()
+
+async def remote(questions, url):
+    import httpx
+    async with httpx.AsyncClient(base_url=url, timeout=None) as client:
+        async with client.stream("POST", "/chat/batch", json={"questions": questions}) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if line:
+                    yield json.loads(line)
+
+async def run(args):
+    questions = read_questions(args.questions)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    t0 = time.perf_counter()
+    n = errors = 0
+    try:
+        results = remote(questions, args.url) if args.url else local(questions, args.concurrency)
+        async for result in results:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            n += 1
+            errors += "error" in result
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{n}/{len(questions)} answered ({errors} errors) in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("questions", help="Text file with one question per line, or - for stdin")
+    ap.add_argument("--out", help="Output NDJSON (default: stdout)")
+    ap.add_argument("--concurrency", type=int, default=settings.CHAT_BATCH_CONCURRENCY,
+                    help="Generations in flight (in-process mode)")
+    ap.add_argument("--url", help="Send to a running server's /chat/batch instead of answering in-process")
+    asyncio.run(run(ap.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Export a sentence-transformers encoder to ONNX and quantize it to int8, for
+EMBED_MODEL="onnx:<out dir>" (app/services/embedding.py).
+Writes <out>/model.onnx (int8 dynamic quantization of the weights), tokenizer.json and
+encoder.json; --keep-fp32 also keeps the unquantized model.fp32.onnx.
+Needs torch + transformers (export), onnx and onnxruntime (quantization); serving needs
+onnxruntime + tokenizers only. Check parity with scripts/bench_onnx_encoder.py.
+Usage:
+  python scripts/export_onnx_encoder.py
+  python scripts/export_onnx_encoder.py --model sentence-transformers/all-MiniLM-L6-v2 --out app/onnx/minilm-int8
+  python scripts/export_onnx_encoder.py --no-quantize    # fp32 model.onnx
+"""
+import sys, json, shutil, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+INPUTS = ["input_ids", "attention_mask", "token_type_ids"]
+
+def export(model_name: str, path: Path, opset: int):
+    import torch
+    from transformers import AutoModel
+
+    class Hidden(torch.nn.Module):
+        # token vectors only: pooling and normalization stay in numpy, as in SentenceTransformer
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask,
+                              token_type_ids=token_type_ids).last_hidden_state
+
+    model = Hidden(AutoModel.from_pretrained(model_name)).eval()
+    dummy = torch.ones((2, 16), dtype=torch.long)
+    axes = {n: {0: "batch", 1: "seq"} for n in INPUTS + ["last_hidden_state"]}
+    with torch.no_grad():
+        torch.onnx.export(model, (dummy, dummy, torch.zeros_like(dummy)), str(path),
+                          input_names=INPUTS, output_names=["last_hidden_state"],
+                          dynamic_axes=axes, opset_version=opset, dynamo=False)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model", default=MODEL_NAME)
+    ap.add_argument("--out", default=str(ROOT / "app" / "onnx" / "all-MiniLM-L6-v2-int8"))
+    ap.add_argument("--max-seq-length", type=int, default=256, help="sentence-transformers truncation length")
+    ap.add_argument("--opset", type=int, default=14)
+    ap.add_argument("--no-quantize", action="store_true")
+    ap.add_argument("--keep-fp32", action="store_true")
+    args = ap.parse_args()
+
+    from transformers import AutoTokenizer
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    fp32 = out / "model.fp32.onnx"
+    export(args.model, fp32, args.opset)
+    if args.no_quantize:
+        shutil.move(fp32, out / "model.onnx")
+    else:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        # weights to int8 ahead of time, activations quantized per batch at run time
+        quantize_dynamic(str(fp32), str(out / "model.onnx"), weight_type=QuantType.QInt8)
+        if not args.keep_fp32:
+            fp32.unlink()
+    tok = AutoTokenizer.from_pretrained(args.model)
+    tok.backend_tokenizer.save(str(out / "tokenizer.json"))
+    (out / "encoder.json").write_text(json.dumps({
+        "source": args.model, "model": "model.onnx", "quantization": None if args.no_quantize else "int8",
+        "max_seq_length": args.max_seq_length, "pad_id": tok.pad_token_id or 0, "pooling": "mean",
+    }, indent=2), encoding="utf-8")
+    size = (out / "model.onnx").stat().st_size
+    print(f"[OK] {args.model} -> {out} ({size / 2**20:.1f} MB); use EMBED_MODEL=onnx:{out}")
+
+if __name__ == "__main__":
+    main()
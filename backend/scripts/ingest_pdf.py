@@ -1,16 +1,31 @@
 """
 Stream-ingest a large PDF into text chunks with page range + progress.
-Writes each chunk immediately (no big lists in memory).
+Writes each chunk immediately (no big lists in memory) to the packed chunk store in
+app/kb_chunks (see app/services/chunk_store.py), with the page range and hash of every
+chunk. A run builds a new store and swaps it in, removing legacy gale_chunk_NNNN.txt
+files; --append copies the current chunks (or the legacy .txt ones) into it first, so
+an interrupted run never leaves partial output in the live store.
+
+Page text is extracted in ranges of --range-size pages, optionally across a process
+pool (--workers), and each finished range is checkpointed under
+kb_chunks/.ingest_<pdf name>/. An interrupted run picks up from the last completed
+ranges. Chunking always runs over the pages in order, so the output (including the
+overlap between chunks) is the same for any worker count.
 
 Usage examples:
   python scripts/ingest_pdf.py "C:\\path\\to\\gale.pdf"
   python scripts/ingest_pdf.py "C:\\path\\to\\gale.pdf" --start 1 --end 40
+  python scripts/ingest_pdf.py "C:\\path\\to\\gale.pdf" --workers 8   # re-run the same command to resume
+  python scripts/ingest_pdf.py "C:\\path\\to\\other.pdf" --append
 """
-import sys, re, json, argparse
+import os, sys, re, json, time, shutil, argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from pypdf import PdfReader
 
 ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.services.chunk_store import STORED_FIELDS, ChunkStore, ChunkWriter, iter_legacy_chunks, remove_legacy_chunks, replace_store
 OUTDIR = ROOT / "app" / "kb_chunks"
 OUTDIR.mkdir(parents=True, exist_ok=True)
 
@@ -21,49 +36,138 @@ OVERLAP    = 100    # characters to keep from the previous chunk
 def clean_text(s: str) -> str:
     return re.sub(r"\s+", " ", s or "").strip()
 
-def write_chunk(manifest_fh, chunk_id: int, text: str):
-    fname = OUTDIR / f"gale_chunk_{chunk_id:04d}.txt"
-    fname.write_text(text, encoding="utf-8")
-    rec = {
-        "id": f"gale_chunk_{chunk_id:04d}",
-        "file": fname.name,
-        "source": "gale_pdf",
-        "url": None,
-        "chars": len(text),
-    }
-    manifest_fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
-
-def ingest_pdf(pdf_path: Path, start: int | None, end: int | None):
+def write_chunk(writer: ChunkWriter, chunk_id: int, text: str, pages: tuple[int, int]):
+    # "file" keeps the old per-chunk file name, which retrievers use as the doc id
+    writer.append(text, id=f"gale_chunk_{chunk_id:04d}", file=f"gale_chunk_{chunk_id:04d}.txt",
+                  source="gale_pdf", url=None, page_start=pages[0], page_end=pages[1])
+
+def chunk_pages(marks: list[tuple[int, int]], end: int) -> tuple[int, int]:
+    # marks: (offset in buf, 1-based page) where each page's text starts
+    return marks[0][1], max(p for pos, p in marks if pos < end)
+
+def existing_chunks(chunk_dir: Path):
+    """(metadata, text) of the chunks --append keeps: the store's, else the legacy .txt files."""
+    store = ChunkStore(chunk_dir)
+    if not store.exists():
+        yield from iter_legacy_chunks(chunk_dir)
+        return
+    for rec, text in store.iter_chunks():
+        # offset/length/chars/sha256 are recomputed by the writer
+        yield {k: v for k, v in rec.items() if k not in STORED_FIELDS}, text
+
+# ---- Page extraction (runs in pool workers) ----
+# (path, reader): a process (or reused pool worker) may extract from several PDFs
+_reader: tuple[str, PdfReader] | None = None
+
+def _open_reader(pdf_path: str) -> PdfReader:
+    global _reader
+    if _reader is None or _reader[0] != pdf_path:
+        _reader = (pdf_path, PdfReader(pdf_path))
+    return _reader[1]
+
+def extract_range(pdf_path: str, first: int, last: int, ckpt: str | None = None) -> list[str]:
+    """Cleaned text of pages first..last (0-based, inclusive); saved to `ckpt` when given."""
+    reader = _open_reader(pdf_path)
+    pages = []
+    for pnum in range(first, last + 1):
+        try:
+            pages.append(clean_text(reader.pages[pnum].extract_text()))
+        except Exception:
+            pages.append("")
+    if ckpt:
+        tmp = ckpt + ".tmp"
+        Path(tmp).write_text(json.dumps(pages, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, ckpt)
+    return pages
+
+# ---- Checkpoints ----
+def checkpoint_dir(pdf_path: Path, range_size: int) -> Path:
+    """Per-PDF checkpoint dir; wiped when the PDF or the range size changed since it was written."""
+    d = OUTDIR / f".ingest_{pdf_path.stem}"
+    st = pdf_path.stat()
+    ident = {"pdf": str(pdf_path.resolve()), "size": st.st_size, "mtime": st.st_mtime, "range_size": range_size}
+    info = d / "checkpoint.json"
+    if d.exists():
+        try:
+            same = json.loads(info.read_text(encoding="utf-8")) == ident
+        except Exception:
+            same = False
+        if not same:
+            shutil.rmtree(d)
+    d.mkdir(parents=True, exist_ok=True)
+    info.write_text(json.dumps(ident), encoding="utf-8")
+    return d
+
+def page_ranges(s: int, e: int, size: int) -> list[tuple[int, int]]:
+    # 0-based inclusive, aligned to `size` so checkpoints line up across --start/--end changes
+    out, first = [], s - 1
+    while first <= e - 1:
+        last = min(e - 1, (first // size + 1) * size - 1)
+        out.append((first, last))
+        first = last + 1
+    return out
+
+def iter_pages(pdf_path: Path, s: int, e: int, workers: int, range_size: int):
+    """Yields (page number, text) for pages s..e in order, extracting missing ranges in parallel."""
+    ckdir = checkpoint_dir(pdf_path, range_size)
+    ranges = page_ranges(s, e, range_size)
+    ckpt = {r: ckdir / f"pages_{r[0]:05d}_{r[1]:05d}.json" for r in ranges}
+    todo = [r for r in ranges if not ckpt[r].exists()]
+    if len(todo) < len(ranges):
+        print(f"[INFO] Resuming: {len(ranges) - len(todo)}/{len(ranges)} page ranges already extracted")
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and todo else None
+    try:
+        if pool:
+            # ordered map: results come back in page order, extraction runs ahead
+            pending = pool.map(extract_range, *zip(*[(str(pdf_path), a, b, str(ckpt[(a, b)])) for a, b in todo]))
+        else:
+            pending = (extract_range(str(pdf_path), a, b, str(ckpt[(a, b)])) for a, b in todo)
+        for r in ranges:
+            if r in todo:
+                pages = next(pending)
+            else:
+                pages = json.loads(ckpt[r].read_text(encoding="utf-8"))
+            for pnum, text in zip(range(r[0], r[1] + 1), pages):
+                yield pnum, text
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+def ingest_pdf(pdf_path: Path, start: int | None, end: int | None, workers: int = 1, range_size: int = 50,
+               append: bool = False):
     if not pdf_path.exists():
         print(f"[ERROR] File not found: {pdf_path}")
         sys.exit(1)
 
-    reader = PdfReader(str(pdf_path))
-    total_pages = len(reader.pages)
+    total_pages = len(PdfReader(str(pdf_path)).pages)
     s = max(1, start or 1)
     e = min(end or total_pages, total_pages)
     if s > e:
         print(f"[ERROR] start page {s} > end page {e}")
         sys.exit(1)
 
-    print(f"[INFO] Reading pages {s}..{e} of {total_pages} from {pdf_path.name}")
+    print(f"[INFO] Reading pages {s}..{e} of {total_pages} from {pdf_path.name} with {workers} worker(s)")
+    t0 = time.perf_counter()
 
     # Rolling buffer; we only keep at most CHUNK_SIZE + OVERLAP chars
     buf = ""
+    marks: list[tuple[int, int]] = []
     written = 0
-    manifest_path = OUTDIR / "manifest.jsonl"
 
-    # If you’re re-running, you can uncomment the next two lines to clear old outputs:
-    # for old in OUTDIR.glob("gale_chunk_*.txt"): old.unlink(missing_ok=True)
-    # manifest_path.unlink(missing_ok=True)
-
-    with open(manifest_path, "w", encoding="utf-8") as mf:
-        for pnum in range(s - 1, e):
-            try:
-                page_text = reader.pages[pnum].extract_text()
-            except Exception:
-                page_text = ""
-            buf += " " + clean_text(page_text)
+    # every run builds a new store beside the live one, which stays readable (and untouched
+    # by an interrupted run) until the swap; --append first copies the current chunks over
+    had_store = ChunkStore(OUTDIR).exists()
+    tmp_dir = OUTDIR / ".store_tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    with ChunkStore(tmp_dir).writer() as w:
+        if append:
+            for meta, text in existing_chunks(OUTDIR):
+                w.append(text, **meta)
+        first_id = w.count
+        for pnum, page_text in iter_pages(pdf_path, s, e, workers, range_size):
+            marks.append((len(buf), pnum + 1))
+            buf += " " + page_text
 
             # progress
             if (pnum + 1) % 25 == 0:
@@ -74,21 +178,35 @@ def ingest_pdf(pdf_path: Path, start: int | None, end: int | None):
                 chunk = buf[:CHUNK_SIZE].strip()
                 if chunk:
                     written += 1
-                    write_chunk(mf, written, chunk)
+                    write_chunk(w, first_id + written, chunk, chunk_pages(marks, CHUNK_SIZE))
                 # Keep only the end tail for overlap
-                buf = buf[CHUNK_SIZE - OVERLAP:]
+                cut = CHUNK_SIZE - OVERLAP
+                buf = buf[cut:]
+                marks = [(pos - cut, p) for pos, p in marks]
+                while len(marks) > 1 and marks[1][0] <= 0:
+                    marks.pop(0)
 
         # Final remainder
         if buf.strip():
             written += 1
-            write_chunk(mf, written, buf.strip())
+            write_chunk(w, first_id + written, buf.strip(), chunk_pages(marks, len(buf)))
+    replace_store(tmp_dir, OUTDIR)
+    if not (append and had_store):
+        # packed into the store (append) or superseded by it (fresh run)
+        remove_legacy_chunks(OUTDIR)
+    shutil.rmtree(OUTDIR / f".ingest_{pdf_path.stem}", ignore_errors=True)
 
-    print(f"[OK] Wrote {written} chunks to {OUTDIR} and updated manifest.jsonl")
+    elapsed = time.perf_counter() - t0
+    print(f"[OK] Wrote {written} chunks to the chunk store in {OUTDIR} "
+          f"({e - s + 1} pages in {elapsed:.1f}s, {(e - s + 1) / elapsed:.1f} pages/s)")
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("pdf", help="Path to PDF")
     ap.add_argument("--start", type=int, help="Start page (1-based)")
     ap.add_argument("--end", type=int, help="End page (inclusive, 1-based)")
+    ap.add_argument("--workers", type=int, default=1, help="Extraction processes (default 1)")
+    ap.add_argument("--range-size", type=int, default=50, help="Pages per work unit / checkpoint")
+    ap.add_argument("--append", action="store_true", help="Add to the existing chunk store instead of replacing it")
     args = ap.parse_args()
-    ingest_pdf(Path(args.pdf), args.start, args.end)
+    ingest_pdf(Path(args.pdf), args.start, args.end, args.workers, args.range_size, args.append)
@@ -0,0 +1,35 @@
+"""
+Convert a kb_chunks directory of gale_chunk_NNNN.txt files into the packed chunk store
+(chunks.idx.jsonl + its data file). Retrievers and build_faiss_index.py prefer the store
+once it exists; doc ids stay the same, so incremental FAISS builds reuse every row.
+Usage:
+  python scripts/pack_chunks.py                       # app/kb_chunks in place
+  python scripts/pack_chunks.py --dir app/kb_chunks --remove-files
+"""
+import sys, time, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.services.chunk_store import ChunkStore, iter_legacy_chunks, remove_legacy_chunks, replace_store
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dir", default=str(ROOT / "app" / "kb_chunks"))
+    ap.add_argument("--remove-files", action="store_true", help="Delete the .txt files and manifest.jsonl afterwards")
+    args = ap.parse_args()
+    chunk_dir = Path(args.dir)
+
+    t0 = time.perf_counter()
+    tmp_dir = chunk_dir / ".store_tmp"
+    with ChunkStore(tmp_dir).writer() as w:
+        for meta, text in iter_legacy_chunks(chunk_dir):
+            w.append(text, **meta)
+        packed = w.count
+    replace_store(tmp_dir, chunk_dir)
+    if args.remove_files:
+        remove_legacy_chunks(chunk_dir)
+    print(f"[OK] Packed {packed} chunk files into {ChunkStore(chunk_dir).data_path} in {time.perf_counter() - t0:.2f}s")
+
+if __name__ == "__main__":
+    main()
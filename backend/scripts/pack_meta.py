@@ -0,0 +1,29 @@
+"""
+Convert a legacy vector_meta.jsonl into the packed, mmap-able metadata store.
+Usage:
+  python scripts/pack_meta.py                                   # app/vector_meta.jsonl -> app/vector_meta.bin
+  python scripts/pack_meta.py --src old_meta.jsonl --dst app/vector_meta.bin
+"""
+import sys, json, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.services.meta_store import write_meta_store
+
+def read_jsonl(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default=str(ROOT / "app" / "vector_meta.jsonl"))
+    ap.add_argument("--dst", default=str(ROOT / "app" / "vector_meta.bin"))
+    args = ap.parse_args()
+    n = write_meta_store(args.dst, read_jsonl(Path(args.src)))
+    print(f"[OK] Packed {n} records from {args.src} into {args.dst} ({Path(args.dst).stat().st_size / 2**10:.1f} KiB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Batch-score many patients' lab files (CSV or FHIR JSON) with the vectorized scorer and
+stream one NDJSON line per file. Files are streamed from disk as their block is scored.
+Usage:
+  python scripts/score_labs.py cohort/                      # every *.csv / *.json below cohort/
+  python scripts/score_labs.py a.csv b.json --out scored.ndjson
+  python scripts/score_labs.py cohort/ --refs new_reference_ranges.json
+"""
+import sys, json, time, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+sys.path.insert(0, str(ROOT))
+from app.config.settings import settings
+from app.labs.scoring import compile_refs, score_files
+
+def iter_files(paths):
+    for p in map(Path, paths):
+        if p.is_dir():
+            for f in sorted(p.rglob("*")):
+                if f.suffix.lower() in (".csv", ".json"):
+                    yield f
+        else:
+            yield p
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="+", help="Lab files or directories")
+    ap.add_argument("--refs", help="Reference ranges JSON (default: app/config/reference_ranges.json)")
+    ap.add_argument("--out", help="Output NDJSON (default: stdout)")
+    ap.add_argument("--block-size", type=int, default=settings.LAB_BATCH_BLOCK, help="Files per vectorized pass")
+    args = ap.parse_args()
+
+    tables = compile_refs(json.loads(Path(args.refs).read_text(encoding="utf-8"))) if args.refs else None
+    files = ((str(f), None, str(f)) for f in iter_files(args.paths))
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    t0 = time.perf_counter()
+    n = rows = flagged = 0
+    try:
+        for result in score_files(files, block_size=args.block_size, tables=tables):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            n += 1
+            rows += len(result.get("summary", []))
+            flagged += len(result.get("flagged", []))
+    finally:
+        if args.out:
+            out.close()
+    print(f"[OK] Scored {n} files ({rows} rows, {flagged} flagged) in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import numpy as np
+from app.services.answer_cache import SemanticAnswerCache
+
+VECS = {
+    "what is a normal hba1c": [1.0, 0.0, 0.0],
+    "normal hba1c level": [0.99, 0.141, 0.0],
+    "ldl cholesterol target": [0.0, 1.0, 0.0],
+}
+
+def _embed(texts):
+    return np.asarray([VECS[t] for t in texts], dtype="float32")
+
+def test_exact_and_semantic_hits():
+    cache = SemanticAnswerCache(embed=_embed, threshold=0.95)
+    miss = cache.lookup("chat", "What is a normal HbA1c?")
+    assert miss.answer is None
+    cache.store(miss, "below 5.7%")
+
+    assert cache.lookup("chat", "what is a  normal hba1c").answer == "below 5.7%"
+    assert cache.lookup("chat", "normal hba1c level").answer == "below 5.7%"
+    assert cache.lookup("chat", "ldl cholesterol target").answer is None
+    assert cache.lookup("patient-chat", "what is a normal hba1c").answer is None
+    s = cache.stats()
+    assert (s["hits"], s["semantic_hits"], s["misses"]) == (2, 1, 3)
+
+def test_lru_ttl_and_invalidation():
+    version = [1]
+    cache = SemanticAnswerCache(fingerprint=lambda: version[0], max_entries=2, ttl=60, check_interval=0)
+    for q in ("a1", "a2", "a3"):
+        cache.store(cache.lookup("chat", q), q.upper())
+    assert cache.lookup("chat", "a1").answer is None        # evicted (LRU)
+    assert cache.lookup("chat", "a3").answer == "A3"
+
+    version[0] = 2                                           # index / KB rebuilt
+    assert cache.lookup("chat", "a3").answer is None
+    assert cache.stats()["invalidations"] == 1
+
+    cache.ttl = -1
+    cache.store(cache.lookup("chat", "a4"), "A4")
+    assert cache.lookup("chat", "a4").answer is None         # expired
+
+def test_expired_best_match_falls_back_to_a_live_one():
+    cache = SemanticAnswerCache(embed=_embed, threshold=0.95, ttl=60)
+    VECS["hba1c normal range"] = [0.98, 0.199, 0.0]
+    VECS["normal hba1c"] = [1.0, 0.01, 0.0]
+    try:
+        cache.store(cache.lookup("chat", "hba1c normal range"), "live")
+        cache.ttl = -1
+        cache.store(cache.lookup("chat", "what is a normal hba1c"), "stale")  # closest to the query, expired
+        assert cache.lookup("chat", "normal hba1c").answer == "live"
+        assert cache.stats()["entries"] == 1  # the expired entry was evicted
+    finally:
+        del VECS["hba1c normal range"], VECS["normal hba1c"]
@@ -0,0 +1,29 @@
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from app.services.batching import MicroBatcher
+
+def test_bulk_submissions_share_the_worker_thread_and_never_overlap():
+    calls, active, overlaps = [], [0], [0]
+    lock = threading.Lock()
+
+    def fn(items):
+        with lock:
+            active[0] += 1
+            overlaps[0] += active[0] > 1
+        calls.append((threading.current_thread().name, len(items)))
+        time.sleep(0.002)
+        with lock:
+            active[0] -= 1
+        return [x * 2 for x in items]
+
+    batcher = MicroBatcher(fn, max_batch=4, max_wait=0.005, name="test-batcher")
+    with ThreadPoolExecutor(8) as ex:
+        singles = [ex.submit(batcher, i) for i in range(40)]
+        bulks = [ex.submit(lambda n=n: batcher.submit_many(list(range(n))).result()) for n in (10, 25)]
+        assert [f.result() for f in singles] == [i * 2 for i in range(40)]
+        assert [f.result() for f in bulks] == [[i * 2 for i in range(10)], [i * 2 for i in range(25)]]
+    assert overlaps[0] == 0 and {name for name, _ in calls} == {"test-batcher"}
+    # a bulk list is one call, neither split at max_batch nor merged with single items
+    assert sorted(n for _, n in calls if n > 4) == [10, 25]
+    assert batcher.submit_many([]).result() == []
+    batcher.close()
@@ -0,0 +1,24 @@
+import json, sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "scripts"))
+import bench_suite
+
+def _result(throughput, p95):
+    return {"unit": "req/s", "ops": 10, "throughput": throughput, "p50_ms": 1.0, "p95_ms": p95, "p99_ms": p95}
+
+def test_compare_flags_throughput_and_p95_regressions():
+    baseline = {"results": {"a": _result(100, 10), "b": _result(100, 10), "c": {"skipped": "no model"}}}
+    results = {"a": _result(85, 11.9), "b": _result(70, 13), "c": _result(1, 1), "new": _result(1, 1)}
+    lines = bench_suite.compare(results, baseline, threshold=0.2)
+    assert len(lines) == 2 and all(l.startswith("b:") for l in lines)
+
+def test_saved_baseline_round_trips(tmp_path):
+    out = tmp_path / "baseline.json"
+    assert bench_suite.main(["--quick", "--only", "labs.score", "--save", str(out)]) == 0
+    saved = json.loads(out.read_text())
+    assert set(saved["results"]) == {"labs.score"} and saved["results"]["labs.score"]["ops"] == 5
+    assert bench_suite.main(["--quick", "--only", "labs.score", "--baseline", str(out), "--threshold", "10"]) == 0
+    saved["results"]["labs.score"]["throughput"] *= 100
+    out.write_text(json.dumps(saved))
+    assert bench_suite.main(["--quick", "--only", "labs.score", "--baseline", str(out)]) == 1
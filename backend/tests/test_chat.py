@@ -0,0 +1,191 @@
+import asyncio, json, time
+import httpx
+import pytest
+from app.main import app
+from app.config.settings import settings
+from app.services.llm_clients import aclose_clients
+from app.tests.stub_llm import StubLLMServer
+
+LATENCY = 0.2
+N_REQUESTS = 8
+
+@pytest.fixture(scope="module")
+def stub():
+    with StubLLMServer(latency=LATENCY) as s:
+        yield s
+
+@pytest.fixture(autouse=True)
+def no_answer_cache(monkeypatch):
+    # these tests exercise the upstream path, so every request must reach the stub
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+
+def _burst(path: str, n: int) -> tuple[list[httpx.Response], float]:
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            t0 = time.perf_counter()
+            resps = await asyncio.gather(*[client.post(path, json={"message": f"normal hba1c {i}"})
+                                           for i in range(n)])
+            elapsed = time.perf_counter() - t0
+        await aclose_clients()
+        return resps, elapsed
+    return asyncio.run(go())
+
+def test_chat_throughput_scales_with_concurrency_cap(stub, monkeypatch):
+    monkeypatch.setattr(settings, "USE_LOCAL", True)
+    monkeypatch.setattr(settings, "LOCAL_URL", stub.ollama_url)
+
+    elapsed = {}
+    for cap in (1, N_REQUESTS):
+        monkeypatch.setattr(settings, "LLM_MAX_CONCURRENCY", cap)
+        stub.reset_counters()
+        resps, elapsed[cap] = _burst("/chat", N_REQUESTS)
+        assert all(r.status_code == 200 for r in resps)
+        assert all(r.json().startswith("stub answer") for r in resps)
+        assert stub.calls == N_REQUESTS
+        assert stub.max_in_flight == cap
+
+    # serialised: ~N * latency; fully concurrent: ~1 * latency
+    assert elapsed[1] >= N_REQUESTS * LATENCY * 0.9
+    assert elapsed[N_REQUESTS] < elapsed[1] / 3
+
+@pytest.mark.parametrize("backend", ["ollama", "mistral", "fallback"])
+def test_streaming_sends_tokens_then_disclaimer(stub, monkeypatch, backend):
+    monkeypatch.setattr(settings, "USE_LOCAL", backend == "ollama")
+    monkeypatch.setattr(settings, "USE_MISTRAL", backend == "mistral")
+    monkeypatch.setattr(settings, "MISTRAL_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "LOCAL_URL", stub.ollama_url)
+    monkeypatch.setattr(settings, "MISTRAL_ENDPOINT", stub.base_url)
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            resp = await client.post("/patient-chat", json={"message": "normal hba1c", "stream": True})
+        await aclose_clients()
+        return resp
+    resp = asyncio.run(go())
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [e for e in resp.text.split("\n\n") if e]
+    tokens = "".join(json.loads(e.split("data: ", 1)[1]).get("token", "") for e in events[:-1])
+    assert events[-1].startswith("event: disclaimer")
+    if backend == "fallback":
+        assert tokens == "(Patient LLM fallback) Answer: normal hba1c"
+    else:
+        assert len(events) == 3  # "stub", " answer", disclaimer
+        assert tokens == "stub answer"
+
+def test_import_is_lazy_and_ready_follows_warmup():
+    import subprocess, sys
+    from pathlib import Path
+    from fastapi.testclient import TestClient
+    probe = "import sys, app.main; print([m for m in ('pytesseract', 'pdf2image', 'mistralai', 'torch') if m in sys.modules])"
+    out = subprocess.run([sys.executable, "-c", probe], cwd=Path(__file__).parents[1], capture_output=True, text=True)
+    assert out.stdout.strip() == "[]", out.stderr
+    with TestClient(app) as client:
+        assert client.get("/health").json() == {"status": "ok"}
+        for _ in range(500):
+            r = client.get("/ready")
+            if r.status_code == 200:
+                break
+            assert r.json()["status"] == "starting"
+            time.sleep(0.01)
+        assert r.status_code == 200 and r.json()["status"] == "ready"
+
+def test_chat_batch_retrieves_once_and_streams_ndjson(stub, monkeypatch):
+    from app.services.retrieval import InMemoryRetriever
+    monkeypatch.setattr(settings, "USE_LOCAL", True)
+    monkeypatch.setattr(settings, "LOCAL_URL", stub.ollama_url)
+    monkeypatch.setattr(settings, "CHAT_BATCH_CONCURRENCY", 3)
+    bulk_calls = []
+    real = InMemoryRetriever.retrieve_many
+    monkeypatch.setattr(InMemoryRetriever, "retrieve_many",
+                        lambda self, qs, k=5: bulk_calls.append(len(qs)) or real(self, qs, k))
+    questions = [f"normal hba1c {i}" for i in range(9)]
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            resp = await client.post("/chat/batch", json={"questions": questions})
+            too_many = await client.post("/chat/batch", json={"questions": ["q"] * (settings.CHAT_BATCH_MAX_QUESTIONS + 1)})
+        await aclose_clients()
+        return resp, too_many
+    stub.reset_counters()
+    resp, too_many = asyncio.run(go())
+
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(r["index"] for r in lines) == list(range(9))
+    assert all(r["answer"].startswith("stub answer") and r["question"] == questions[r["index"]] for r in lines)
+    assert "diabetes.md" in lines[0]["sources"]
+    assert bulk_calls == [9] and stub.calls == 9 and stub.max_in_flight == 3
+    assert too_many.status_code == 413
+
+def test_identical_concurrent_questions_share_one_upstream_call(stub, monkeypatch):
+    from app.integrations.metrics import SINGLEFLIGHT
+    monkeypatch.setattr(settings, "USE_LOCAL", True)
+    monkeypatch.setattr(settings, "LOCAL_URL", stub.ollama_url)
+
+    async def go(messages):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            resps = await asyncio.gather(*[client.post("/patient-chat", json={"message": m}) for m in messages])
+        await aclose_clients()
+        return resps
+
+    messages = ["is the outbreak dangerous"] * 15 + ["what are the symptoms"] * 5
+    calls = {}
+    for enabled in (False, True):
+        monkeypatch.setattr(settings, "LLM_SINGLEFLIGHT", enabled)
+        stub.reset_counters()
+        before = SINGLEFLIGHT._values.get(("ollama", "coalesced"), 0)
+        resps = asyncio.run(go(messages))
+        assert all(r.status_code == 200 and r.json()["answer"].startswith("stub answer") for r in resps)
+        calls[enabled] = stub.calls
+    assert calls == {False: 20, True: 2}
+    assert SINGLEFLIGHT._values[("ollama", "coalesced")] - before == 18
+
+def test_single_flight_shares_errors_and_survives_a_cancelled_waiter():
+    from app.services.llm_clients import SingleFlight
+    flights = SingleFlight()
+    upstream = []
+
+    async def call(fail):
+        upstream.append(fail)
+        await asyncio.sleep(0.05)
+        if fail:
+            raise RuntimeError("upstream 502")
+        return "ok"
+
+    async def go():
+        failing = await asyncio.gather(*[flights.do("a", lambda: call(True)) for _ in range(4)],
+                                       return_exceptions=True)
+        waiters = [asyncio.create_task(flights.do("b", lambda: call(False))) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiters[0].cancel()  # one client disconnects; the others still get the answer
+        rest = await asyncio.gather(*waiters[1:])
+        return failing, rest
+
+    failing, rest = asyncio.run(go())
+    assert [str(e) for e in failing] == ["upstream 502"] * 4
+    assert rest == ["ok", "ok"] and upstream == [True, False] and flights.in_flight() == 0
+
+def test_single_flight_caller_after_a_cancelled_call_starts_a_new_one():
+    from app.services.llm_clients import SingleFlight
+    flights = SingleFlight()
+    upstream = []
+
+    async def call():
+        upstream.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def go():
+        first = asyncio.create_task(flights.do("k", call))
+        await asyncio.sleep(0.01)
+        first.cancel()  # the only waiter leaves: the upstream call is cancelled
+        await asyncio.sleep(0)  # first has unwound; the upstream task has not finished cancelling
+        assert first.cancelled()
+        return await flights.do("k", call)
+
+    assert asyncio.run(go()) == "ok" and upstream == [1, 1] and flights.in_flight() == 0
@@ -0,0 +1,79 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.db.base import Base
+from app.models.chat import ChatMessage
+from app.repositories.chat_repo import ChatRepository
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    rnd = random.Random(3)
+    t = datetime(2024, 1, 1)
+    for i in range(400):
+        t += timedelta(seconds=rnd.choice([0, 0, 1, 30]))  # plenty of created_at ties
+        a, b = rnd.randint(1, 6), rnd.choice([None, 1, 2, 3, 4, 5, 6])
+        session.add(ChatMessage(sender_id=a, receiver_id=b, content=f"m{i}", created_at=t))
+    session.commit()
+    yield session
+    session.close()
+
+def test_keyset_pages_cover_history_newest_first(db):
+    repo = ChatRepository(db)
+    for user in (1, 4):
+        full = repo.get_messages_for_user(user)
+        legacy = db.query(ChatMessage).filter((ChatMessage.sender_id == user) | (ChatMessage.receiver_id == user)).all()
+        assert sorted(m.id for m in full) == sorted(m.id for m in legacy)
+        paged, cursor, pages = [], None, 0
+        while True:
+            page, cursor = repo.get_history_page(user, limit=17, cursor=cursor)
+            paged.extend(page)
+            pages += 1
+            if cursor is None:
+                break
+            assert len(page) == 17
+        assert [m.id for m in paged] == [m.id for m in reversed(full)]
+        assert pages == -(-len(full) // 17)
+
+def test_history_page_uses_the_composite_indexes_and_rejects_bad_cursors(db):
+    repo = ChatRepository(db)
+    keys = repo._history_keys(2, None, 6)
+    q = db.query(ChatMessage.id).join(keys, ChatMessage.id == keys.c.id)
+    sql = str(q.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+    assert "ix_chat_messages_sender_created_id" in plan and "ix_chat_messages_receiver_created_id" in plan
+    with pytest.raises(ValueError, match="invalid history cursor"):
+        repo.get_history_page(2, cursor="not-a-cursor")
+
+def test_history_endpoint_pages_with_the_cursor_and_rejects_bad_ones(db, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.core.config import settings as db_settings
+    from app.db import session
+    from app.main import app
+    monkeypatch.setattr(db_settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr(session, "_engine", None)
+    monkeypatch.setattr(session, "_write_behind", None)
+    engine = session.get_engine()
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:  # the fixture's rows, in the app's database
+        conn.execute(ChatMessage.__table__.insert(),
+                     [{c: getattr(m, c) for c in ("id", "sender_id", "receiver_id", "content", "created_at")}
+                      for m in db.query(ChatMessage)])
+    expected = [m.id for m in reversed(ChatRepository(db).get_messages_for_user(1))]  # get_current_user: id 1
+    with TestClient(app) as client:
+        ids, cursor = [], None
+        while True:
+            r = client.get("/api/v1/chat/history", params={"limit": 25, **({"cursor": cursor} if cursor else {})})
+            assert r.status_code == 200
+            ids += [m["id"] for m in r.json()["messages"]]
+            cursor = r.json()["next_cursor"]
+            if cursor is None:
+                break
+        assert ids == expected and len(ids) > 25
+        r = client.get("/api/v1/chat/history", params={"cursor": "not-a-cursor"})
+        assert r.status_code == 400 and "invalid history cursor" in r.json()["detail"]
+    engine.dispose()
@@ -0,0 +1,58 @@
+import json
+from app.services.chunk_store import DATA_NAME, INDEX_NAME, ChunkStore, load_chunk_docs, replace_store
+from app.services.retrieval import InMemoryRetriever
+from scripts import pack_chunks
+
+def test_append_and_recover_from_torn_write(tmp_path):
+    store = ChunkStore(tmp_path)
+    with store.writer() as w:
+        w.append("first chunk", id="c1", file="c1.txt", source="gale_pdf", url=None)
+        w.append("zweiter Abschnitt – ü", id="c2", file="c2.txt", source="gale_pdf", url=None)
+    # interrupted append: text written, index line torn
+    with open(store.data_path, "ab") as f:
+        f.write(b"lost text")
+    with open(store.index_path, "ab") as f:
+        f.write(b'{"id": "c3", "offs')
+    assert [t for _, t in store.iter_chunks()] == ["first chunk", "zweiter Abschnitt – ü"]
+
+    with store.writer() as w:
+        assert w.count == 2
+        w.append("third", id="c3", file="c3.txt", source="gale_pdf", url=None)
+    recs = store.records()
+    assert [r["id"] for r in recs] == ["c1", "c2", "c3"] and store.read(recs[2]) == "third"
+    assert store.data_path.stat().st_size == recs[2]["offset"] + recs[2]["length"]
+
+def test_converter_keeps_docs_and_ids(tmp_path, monkeypatch):
+    for i in range(1, 6):
+        (tmp_path / f"gale_chunk_{i:04d}.txt").write_text(f"chunk {i} about anemia and iron", encoding="utf-8")
+    before = load_chunk_docs(tmp_path)
+    monkeypatch.setattr("sys.argv", ["pack_chunks.py", "--dir", str(tmp_path), "--remove-files"])
+    pack_chunks.main()
+    assert not list(tmp_path.glob("*.txt"))
+    assert load_chunk_docs(tmp_path) == before
+    r = InMemoryRetriever(kb_dir=tmp_path / "none", chunk_dir=tmp_path)
+    assert [d["id"] for d in r.docs] == [f"gale_chunk_{i:04d}.txt" for i in range(1, 6)]
+
+def _build(tmp, text):
+    with ChunkStore(tmp).writer() as w:
+        w.append(text, id="c1", file="c1.txt", source="gale_pdf", url=None)
+
+def test_replace_swaps_the_index_and_keeps_the_previous_data_file(tmp_path):
+    live = tmp_path / "live"
+    generations = []
+    for text in ("first build", "second build", "third build"):
+        _build(tmp_path / "tmp", text)
+        replace_store(tmp_path / "tmp", live)
+        generations.append(ChunkStore(live).data_path)
+        assert [t for _, t in ChunkStore(live).iter_chunks()] == [text]
+    # each build has its own data file: a reader still on the old index reads old data
+    assert len(set(generations)) == 3
+    assert not generations[0].exists() and generations[1].read_bytes() == b"second build"
+
+def test_headerless_store_is_still_read(tmp_path):
+    (tmp_path / DATA_NAME).write_bytes(b"old layout")
+    rec = {"id": "c1", "file": "c1.txt", "source": "gale_pdf", "url": None, "offset": 0, "length": 10}
+    (tmp_path / INDEX_NAME).write_text(json.dumps(rec) + "\n", encoding="utf-8")
+    with ChunkStore(tmp_path).writer() as w:
+        w.append(" appended", id="c2", file="c2.txt", source="gale_pdf", url=None)
+    assert [t for _, t in ChunkStore(tmp_path).iter_chunks()] == ["old layout", " appended"]
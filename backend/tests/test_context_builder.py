@@ -0,0 +1,35 @@
+from app.services.context_builder import build_context, estimate_tokens, merge_chunks
+
+SENTENCES = [f"Sentence {i} talks about {'insulin dosing' if i % 7 == 0 else 'general anatomy'} in detail." for i in range(60)]
+
+def _chunks(text, size=600, overlap=100):
+    # same windowing as scripts/ingest_pdf.py
+    out, start = [], 0
+    while start < len(text):
+        out.append(text[start:start + size].strip())
+        start += size - overlap
+    return out
+
+def test_neighbouring_chunks_are_merged_without_the_overlap():
+    text = " ".join(SENTENCES)
+    chunks = _chunks(text)
+    docs = [{"id": f"gale_chunk_{i + 1:04d}.txt", "content": c, "source": "gale_pdf", "url": None, "score": 1.0}
+            for i, c in enumerate(chunks)]
+    passages = merge_chunks(docs[2:4] + docs[:1] + docs[1:2])
+    assert len(passages) == 1 and passages[0].label == "gale_chunk_0001-0004"
+    assert passages[0].text == text[:len(passages[0].text)]
+    # a gap in the numbering starts a new passage
+    assert [p.label for p in merge_chunks([docs[0], docs[2]])] == ["gale_chunk_0001", "gale_chunk_0003"]
+
+def test_context_keeps_relevant_sentences_under_budget_and_drops_duplicates():
+    kb = {"id": "diabetes.md", "content": "HbA1c normal is below 5.7%. Insulin dosing depends on weight.",
+          "source": "kb", "url": None, "score": 3.0}
+    pdf = {"id": "gale_chunk_0007.txt", "content": " ".join(SENTENCES), "source": "gale_pdf", "url": None, "score": 2.0}
+    docs = [kb, dict(kb, id="diabetes_copy.md", score=2.5), pdf]
+    ctx = build_context("insulin dosing", docs, token_budget=60)
+    assert ctx.tokens <= 60 + 20  # budget covers passage text; tags add a little
+    assert ctx.text.startswith("[1] diabetes.md (kb): ") and "diabetes_copy" not in ctx.text
+    assert ctx.text.count("Insulin dosing depends on weight.") == 1
+    assert "general anatomy" not in ctx.text and "[2] gale_chunk_0007 (gale_pdf): Sentence 0 " in ctx.text
+    assert [c["label"] for c in ctx.citations] == ["diabetes.md", "gale_chunk_0007"]
+    assert ctx.tokens < estimate_tokens(str(docs)) / 5
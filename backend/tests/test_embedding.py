@@ -0,0 +1,75 @@
+import json, sys, types
+import numpy as np
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+from app.services import embedding
+from app.services.embedding import OnnxEncoder, load_encoder, mean_pool
+
+VOCAB = {"[PAD]": 0, "[UNK]": 1, "chest": 2, "pain": 3, "red": 4, "flags": 5, "hba1c": 6}
+TABLE = np.random.default_rng(0).standard_normal((len(VOCAB), 8)).astype(np.float32)
+
+class FakeSession:
+    # "transformer" that maps each token id to a fixed vector, so pooling is checkable
+    def __init__(self, path, sess_options=None, providers=None):
+        self.options, self.batches = sess_options, []
+
+    def get_inputs(self):
+        return [types.SimpleNamespace(name=n) for n in ("input_ids", "attention_mask", "token_type_ids")]
+
+    def get_outputs(self):
+        return [types.SimpleNamespace(shape=["batch", "seq", TABLE.shape[1]])]
+
+    def run(self, _, feed):
+        self.batches.append(feed["input_ids"].shape)
+        return [TABLE[feed["input_ids"]]]
+
+def _fake_ort():
+    return types.SimpleNamespace(
+        SessionOptions=lambda: types.SimpleNamespace(), InferenceSession=FakeSession,
+        ExecutionMode=types.SimpleNamespace(ORT_SEQUENTIAL=0),
+        GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL=99))
+
+def _model_dir(tmp_path):
+    tok = Tokenizer(WordLevel(VOCAB, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    tok.save(str(tmp_path / "tokenizer.json"))
+    (tmp_path / "encoder.json").write_text(json.dumps({"model": "model.onnx", "max_seq_length": 3, "pad_id": 0}))
+    return tmp_path
+
+def test_mean_pool_ignores_padding():
+    hidden = np.array([[[1.0, 1.0], [3.0, 5.0], [100.0, 100.0]]], dtype=np.float32)
+    assert mean_pool(hidden, np.array([[1, 1, 0]])).tolist() == [[2.0, 3.0]]
+
+def test_onnx_encoder_pools_truncates_and_keeps_input_order(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "onnxruntime", _fake_ort())
+    enc = OnnxEncoder(_model_dir(tmp_path), threads=2)
+    assert enc.session.options.intra_op_num_threads == 2
+    texts = ["hba1c", "chest pain red flags", "red flags"]
+    out = enc.encode(texts, batch_size=2, normalize_embeddings=True)
+    # truncated to max_seq_length=3 tokens; padding in a shared batch does not shift the mean
+    expected = [TABLE[[6]].mean(0), TABLE[[2, 3, 4]].mean(0), TABLE[[4, 5]].mean(0)]
+    expected = [e / np.linalg.norm(e) for e in expected]
+    assert out.dtype == np.float32 and out.shape == (3, 8)
+    assert np.allclose(out, expected, atol=1e-6)
+    # longest texts are batched together: [chest pain red flags, red flags] then [hba1c]
+    assert enc.session.batches == [(2, 3), (1, 1)]
+    assert enc.encode("red flags", normalize_embeddings=True).shape == (8,)
+
+def test_load_encoder_selects_backend_from_embed_model(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "onnxruntime", _fake_ort())
+    monkeypatch.setattr(embedding.settings, "ONNX_THREADS", 3)
+    enc = load_encoder(f"onnx:{_model_dir(tmp_path)}")
+    assert isinstance(enc, OnnxEncoder) and enc.session.options.intra_op_num_threads == 3
+    st = types.ModuleType("sentence_transformers")
+    st.SentenceTransformer = lambda name: ("pytorch", name)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", st)
+    assert load_encoder("sentence-transformers/all-MiniLM-L6-v2") == ("pytorch", "sentence-transformers/all-MiniLM-L6-v2")
+
+def test_onnx_encoder_reports_progress_only_through_the_callback(tmp_path, monkeypatch, capsys):
+    monkeypatch.setitem(sys.modules, "onnxruntime", _fake_ort())
+    enc = OnnxEncoder(_model_dir(tmp_path), threads=1)
+    seen = []
+    enc.encode(["hba1c", "chest pain", "red flags"], batch_size=2, show_progress_bar=True,
+               progress=lambda done, total: seen.append((done, total)))
+    assert seen == [(2, 3), (3, 3)] and capsys.readouterr().out == ""
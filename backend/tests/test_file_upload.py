@@ -0,0 +1,157 @@
+import json
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from app.config.settings import settings
+from app.main import app
+from app.labs.evaluator import normalize_and_score, parse_csv_bytes
+
+DATA = Path(__file__).parents[1] / "app" / "tests" / "data"
+
+@pytest.fixture(autouse=True)
+def file_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FILE_STORE_DIR", str(tmp_path / "store"))
+    return tmp_path / "store"
+
+def test_batch_upload_streams_one_line_per_file():
+    csv_bytes = (DATA / "sample_labs.csv").read_bytes()
+    files = [("files", ("p1.csv", csv_bytes, "text/csv")),
+             ("files", ("p2.json", (DATA / "sample_fhir_bundle.json").read_bytes(), "application/json")),
+             ("files", ("broken.json", b"{not json", "application/json"))]
+    with TestClient(app) as client:
+        r = client.post("/upload/batch", files=files)
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(l) for l in r.text.splitlines()]
+    assert [l["file"] for l in lines] == ["p1.csv", "p2.json", "broken.json"]
+    expected = normalize_and_score(parse_csv_bytes(csv_bytes))
+    assert lines[0]["summary"] == expected["per_test"] and lines[0]["flagged"] == expected["flagged"]
+    assert lines[1]["flagged"] and "error" in lines[2]
+
+def _chunked(b, size):
+    return [b[i:i + size] for i in range(0, len(b), size)]
+
+def test_streaming_parsers_match_whole_document_parse():
+    import random
+    from app.labs.streaming import iter_csv_records, iter_fhir_records, observation_record
+    rnd = random.Random(0)
+    entries = [{"fullUrl": f"urn:uuid:{i}", "resource": {
+        "resourceType": rnd.choice(["Observation", "Patient"]),
+        "code": {"coding": [{"display": f"Glucosé {i}"}]},
+        "valueQuantity": {"value": rnd.choice([5, 5.25, 1e-7, 12345678901]), "unit": "mg/dL"}}} for i in range(300)]
+    bundle = json.dumps({"resourceType": "Bundle", "meta": {"tag": [{"a": [1, 2]}]}, "entry": entries,
+                         "total": 12345}, ensure_ascii=False, indent=1).encode("utf-8")
+    csv_bytes = "test_name,value,unit,sex\r\n" + "".join(f'"Ferritin, {i}",{i}.5,ng/mL,fémale\r\n' for i in range(300))
+    csv_bytes = csv_bytes.encode("utf-8")
+    for size in (1, 7, 4096):
+        assert list(iter_fhir_records(_chunked(bundle, size))) == [r for r in map(observation_record, entries) if r]
+        assert list(iter_csv_records(_chunked(csv_bytes, size))) == parse_csv_bytes(csv_bytes)
+
+def test_upload_limits_return_413(monkeypatch):
+    async def explain(text, temperature=None):
+        return "explained"
+    monkeypatch.setattr("app.main.generate_patient_answer", explain)
+    csv_bytes = (DATA / "sample_labs.csv").read_bytes()
+    with TestClient(app) as client:
+        ok = client.post("/upload", files={"file": ("labs.csv", csv_bytes, "text/csv")})
+        assert ok.status_code == 200 and ok.json()["summary"] == normalize_and_score(parse_csv_bytes(csv_bytes))["per_test"]
+        monkeypatch.setattr(settings, "UPLOAD_MAX_ROWS", 2)
+        assert client.post("/upload", files={"file": ("labs.csv", csv_bytes, "text/csv")}).status_code == 413
+        assert client.post("/upload", files={"file": ("more.csv", csv_bytes + b"Sodium,150,mmol/L,\r\n",
+                                                       "text/csv")}).status_code == 413
+        # rejected uploads are not kept, whether just stored or served from the result cache
+        assert not [p for p in (Path(settings.FILE_STORE_DIR) / "objects").rglob("*") if p.is_file()]
+        monkeypatch.setattr(settings, "UPLOAD_MAX_ROWS", 100)
+        monkeypatch.setattr(settings, "UPLOAD_MAX_MB", 50 / 2**20)
+        assert client.post("/upload", files={"file": ("labs.csv", csv_bytes, "text/csv")}).status_code == 413
+
+def test_full_labs_pool_sheds_uploads_with_503():
+    from app.services.executor import get_pool
+    csv_bytes = (DATA / "sample_labs.csv").read_bytes()
+    with TestClient(app) as client:
+        pool = get_pool("labs")
+        releases = [pool.admit() for _ in range(pool.capacity)]
+        try:
+            r = client.post("/upload", files={"file": ("labs.csv", csv_bytes, "text/csv")})
+            assert r.status_code == 503 and int(r.headers["Retry-After"]) >= 1
+            assert client.post("/upload/batch", files=[("files", ("p.csv", csv_bytes, "text/csv"))]).status_code == 503
+        finally:
+            for release in releases:
+                release()
+        assert client.post("/upload/batch", files=[("files", ("p.csv", csv_bytes, "text/csv"))]).status_code == 200
+
+def test_reupload_is_deduplicated_and_served_from_the_result_cache(monkeypatch, file_store):
+    async def explain(text, temperature=None):
+        return "explained"
+    monkeypatch.setattr("app.main.generate_patient_answer", explain)
+    csv_bytes = (DATA / "sample_labs.csv").read_bytes()
+    with TestClient(app) as client:
+        first = client.post("/upload", files={"file": ("labs.csv", csv_bytes, "text/csv")})
+        again = client.post("/upload", files={"file": ("renamed.csv", csv_bytes, "text/csv")})
+        other = client.post("/upload", files={"file": ("labs.csv", csv_bytes + b"Sodium,150,mmol/L,\r\n", "text/csv")})
+    assert [r.headers["X-Upload-Cache"] for r in (first, again, other)] == ["miss", "hit", "miss"]
+    assert again.json() == first.json() and len(other.json()["summary"]) == len(first.json()["summary"]) + 1
+    assert len([p for p in (file_store / "objects").rglob("*") if p.is_file()]) == 2
+    assert not list((file_store / "tmp").iterdir())
+
+def test_batch_upload_enforces_the_upload_limits(monkeypatch):
+    import hashlib
+    from app.integrations.file_store import get_file_store
+    csv_bytes = (DATA / "sample_labs.csv").read_bytes()
+    one = [("files", ("p.csv", csv_bytes, "text/csv"))]
+    with TestClient(app) as client:
+        monkeypatch.setattr(settings, "UPLOAD_BATCH_MAX_FILES", 2)
+        assert client.post("/upload/batch", files=one * 3).status_code == 413
+        monkeypatch.setattr(settings, "UPLOAD_MAX_ROWS", 2)
+        r = client.post("/upload/batch", files=one * 2)
+        assert r.status_code == 200
+        assert ["rows" in json.loads(l)["error"] for l in r.text.splitlines()] == [True, True]
+        monkeypatch.setattr(settings, "UPLOAD_MAX_MB", 50 / 2**20)
+        header = b"test_name,value,unit,sex\r\n"
+        r = client.post("/upload/batch", files=[("files", ("s.csv", header, "text/csv"))] + one)
+        assert r.status_code == 413 and r.json()["detail"].startswith("p.csv")
+        # files already stored for the rejected batch are not kept
+        assert not get_file_store().exists(hashlib.sha256(header).hexdigest())
+
+def test_store_prunes_expired_then_least_recently_used_objects(tmp_path):
+    import os, time
+    from app.integrations.file_store import LocalFileStore
+    store = LocalFileStore(tmp_path, max_age=3600, max_bytes=150, prune_interval=1e9)
+    digests = [store.put_chunks([bytes([i]) * 100]).digest for i in range(3)]
+    for d in digests:
+        store.put_result(d, "k", {"ok": True})
+    now = time.time()
+    os.utime(store.local_path(digests[0]), (now - 7200, now - 7200))  # unused for 2 h
+    os.utime(store.local_path(digests[1]), (now - 60, now - 60))
+    os.utime(store.local_path(digests[2]), (now - 120, now - 120))
+    store.get_result(digests[2], "k")  # a cache hit counts as a use
+    assert store.prune() == 2  # expired, then the least recently used until <= 150 bytes
+    assert [store.exists(d) for d in digests] == [False, False, True]
+    assert store.get_result(digests[1], "k") is None and store.get_result(digests[2], "k") == {"ok": True}
+
+def test_cancelled_upload_keeps_its_slot_until_the_job_finishes(monkeypatch):
+    import asyncio, io, threading
+    from starlette.datastructures import Headers, UploadFile
+    from app import main
+    from app.services.executor import get_pool
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_score(path):
+        started.set()
+        finish.wait(5)
+        return {"per_test": "[]", "flagged": [], "disclaimer": "", "rows": 0}
+    monkeypatch.setattr(main, "_score_pdf", slow_score)
+    pool = get_pool("ocr")
+    upload = UploadFile(io.BytesIO(b"%PDF-1.4 stub"), filename="r.pdf",
+                        headers=Headers({"content-type": "application/pdf"}))
+
+    async def go():
+        task = asyncio.create_task(main._score_upload(upload))
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        task.cancel()  # the client went away; the OCR job keeps running
+        await asyncio.gather(task, return_exceptions=True)
+        assert task.cancelled() and pool.pending == 1
+        finish.set()
+        while pool.pending:
+            await asyncio.sleep(0.001)
+    asyncio.run(asyncio.wait_for(go(), 5))
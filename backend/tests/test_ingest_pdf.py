@@ -0,0 +1,102 @@
+import json
+import pytest
+from scripts import ingest_pdf
+from app.services.chunk_store import ChunkStore, load_chunk_docs
+from app.tests.sample_pdf import make_pdf, page_lines
+
+@pytest.fixture
+def outdir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pdf, "OUTDIR", tmp_path / "chunks")
+    ingest_pdf.OUTDIR.mkdir()
+    return ingest_pdf.OUTDIR
+
+def _chunks(d):
+    return [text for _, text in ChunkStore(d).iter_chunks()]
+
+def test_parallel_output_matches_sequential(tmp_path, outdir):
+    pdf = make_pdf(tmp_path / "s.pdf", pages=40)
+    ingest_pdf.ingest_pdf(pdf, 2, 37, workers=1, range_size=7)
+    seq, seq_index = _chunks(outdir), ChunkStore(outdir).records()
+    ingest_pdf.ingest_pdf(pdf, 2, 37, workers=3, range_size=5)
+    assert _chunks(outdir) == seq and len(seq) > 10
+    assert ChunkStore(outdir).records() == seq_index
+
+def test_chunks_record_their_page_range(tmp_path, outdir):
+    pdf = make_pdf(tmp_path / "s.pdf", pages=12)
+    ingest_pdf.ingest_pdf(pdf, 3, 12)
+    for rec, text in ChunkStore(outdir).iter_chunks():
+        pages = [int(w.rstrip(".")) for prev, w in zip(text.split(), text.split()[1:]) if prev == "Page"]
+        assert all(rec["page_start"] <= p <= rec["page_end"] for p in pages)
+        assert 3 <= rec["page_start"] <= rec["page_end"] <= 12
+    ingest_pdf.ingest_pdf(pdf, 1, 2, append=True)
+    recs = ChunkStore(outdir).records()
+    assert recs[-1]["page_end"] == 2 and recs[-1]["id"] == f"gale_chunk_{len(recs):04d}"
+
+def test_interrupted_run_resumes_from_checkpoints(tmp_path, outdir):
+    pdf = make_pdf(tmp_path / "s.pdf", pages=30)
+    pages = ingest_pdf.iter_pages(pdf, 1, 30, workers=1, range_size=10)
+    for _ in range(15):  # "crash" mid-way through the second range
+        next(pages)
+    pages.close()
+    ckdir = outdir / ".ingest_s"
+    done = sorted(p.name for p in ckdir.glob("pages_*.json"))
+    assert done == ["pages_00000_00009.json", "pages_00010_00019.json"]
+
+    # a checkpointed range is not re-extracted
+    (ckdir / done[0]).write_text(json.dumps(["FROM CHECKPOINT"] * 10), encoding="utf-8")
+    ingest_pdf.ingest_pdf(pdf, 1, 30, workers=2, range_size=10)
+    assert _chunks(outdir)[0].startswith("FROM CHECKPOINT")
+    assert not ckdir.exists()
+
+def test_second_pdf_in_the_same_process_is_read_from_its_own_file(tmp_path, outdir):
+    a = make_pdf(tmp_path / "a.pdf", pages=6, seed=0)
+    b = make_pdf(tmp_path / "b.pdf", pages=6, seed=1)
+    ingest_pdf.ingest_pdf(a, 1, 6)
+    ingest_pdf.ingest_pdf(b, 1, 6)
+    text = " ".join(_chunks(outdir))
+    assert " ".join(page_lines(0, seed=1)[1:3]) in text
+    assert " ".join(page_lines(0, seed=0)[1:3]) not in text
+
+def _legacy(outdir, n=3):
+    for i in range(1, n + 1):
+        (outdir / f"gale_chunk_{i:04d}.txt").write_text(f"legacy chunk {i}", encoding="utf-8")
+
+def test_append_over_legacy_txt_chunks_keeps_them(tmp_path, outdir):
+    _legacy(outdir)
+    ingest_pdf.ingest_pdf(make_pdf(tmp_path / "s.pdf", pages=4), 1, 4, append=True)
+    docs = load_chunk_docs(outdir)
+    assert [d["content"] for d in docs[:3]] == ["legacy chunk 1", "legacy chunk 2", "legacy chunk 3"]
+    assert docs[3]["id"] == "gale_chunk_0004.txt" and len(docs) > 3
+    assert not list(outdir.glob("*.txt"))
+
+def test_fresh_run_removes_legacy_txt_chunks(tmp_path, outdir):
+    _legacy(outdir)
+    (outdir / "manifest.jsonl").write_text("", encoding="utf-8")
+    ingest_pdf.ingest_pdf(make_pdf(tmp_path / "s.pdf", pages=4), 1, 4)
+    assert not list(outdir.glob("*.txt")) and not (outdir / "manifest.jsonl").exists()
+    assert all(d["content"].startswith("Page") for d in load_chunk_docs(outdir)[:1])
+
+def test_interrupted_append_leaves_the_store_alone_and_resumes_cleanly(tmp_path, outdir, monkeypatch):
+    a = make_pdf(tmp_path / "a.pdf", pages=6, seed=0)
+    b = make_pdf(tmp_path / "b.pdf", pages=12, seed=1)
+    ingest_pdf.ingest_pdf(a, 1, 6)
+    before = _chunks(outdir)
+    real_write, calls = ingest_pdf.write_chunk, []
+
+    def crash(writer, chunk_id, text, pages):
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        calls.append(chunk_id)
+        real_write(writer, chunk_id, text, pages)
+    monkeypatch.setattr(ingest_pdf, "write_chunk", crash)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_pdf.ingest_pdf(b, 1, 12, range_size=4, append=True)
+    assert _chunks(outdir) == before and (outdir / ".ingest_b").exists()
+
+    monkeypatch.setattr(ingest_pdf, "write_chunk", real_write)
+    ingest_pdf.ingest_pdf(b, 1, 12, range_size=4, append=True)  # resumes from the checkpoints
+    appended = _chunks(outdir)
+    ids = [r["id"] for r in ChunkStore(outdir).records()]
+    assert len(ids) == len(set(ids))
+    ingest_pdf.ingest_pdf(b, 1, 12)
+    assert appended == before + _chunks(outdir)
@@ -0,0 +1,29 @@
+import random
+from app.labs.evaluator import REFS, normalize_and_score
+from app.labs.scoring import compile_refs, normalize_and_score_many, score_arrays
+
+def _rows(n, seed=0):
+    rnd = random.Random(seed)
+    names = list(REFS) + ["Unknown Test", " Hemoglobin ", ""]
+    sexes = ["male", "female", " Female", "MALE", None, "", "other"]
+    rows = []
+    for _ in range(n):
+        name = rnd.choice(names)
+        entry = REFS.get(name.strip(), {})
+        lo, hi = entry.get("general") or entry.get("male") or (1, 100)
+        value = rnd.choice([lo - 1, lo, (lo + hi) / 2, hi, hi + 0.5, str(hi * 2), int(lo)])
+        rows.append({"test_name": name, "value": value, "unit": rnd.choice(["mg/dL", " %", None]),
+                     "sex": rnd.choice(sexes), "age": 40})
+    return rows
+
+def test_vectorized_matches_scalar_scorer():
+    rows = _rows(5000)
+    assert normalize_and_score_many(rows) == normalize_and_score(rows)
+    assert normalize_and_score_many([]) == normalize_and_score([])
+
+def test_recompiled_tables_follow_new_ranges():
+    tables = compile_refs({"LDL": {"general": [0, 100], "unit": "mg/dL"},
+                           "Ferritin": {"male": [24, 336], "female": [11, 307], "unit": "ng/mL"}})
+    status, test, _ = score_arrays(["LDL", "LDL", "Ferritin", "Ferritin", "Ferritin", "HDL"],
+                                   [99, 135, 20, 20, 20, 50], ["", "male", "male", "female", "", "male"], tables)
+    assert status.tolist() == [2, 3, 1, 2, 0, 0] and test[-1] == -1
@@ -0,0 +1,47 @@
+import json, faiss, numpy as np
+from app.services.meta_store import MetaStore, open_meta, write_meta_store
+from app.services.faiss_index import MmapFlatIP, load_index
+
+def test_packed_store_matches_jsonl(tmp_path):
+    docs = [{"id": f"kb/{i}.md", "content": "glycémie " * i, "source": "kb", "url": None} for i in range(50)]
+    assert write_meta_store(tmp_path / "meta.bin", docs) == 50
+    (tmp_path / "meta.jsonl").write_text("".join(json.dumps(d) + "\n" for d in docs), encoding="utf-8")
+
+    store = open_meta(tmp_path / "meta.bin")
+    assert isinstance(store, MetaStore) and len(store) == 50
+    assert store[0] == docs[0] and store[-1] == docs[-1] and list(store) == docs
+    assert open_meta(tmp_path / "meta.jsonl") == docs
+    store.close()
+
+def test_mmap_flat_matches_index_flat(tmp_path):
+    rng = np.random.default_rng(0)
+    x = rng.standard_normal((300, 16)).astype("float32")
+    faiss.normalize_L2(x)
+    flat = faiss.IndexFlatIP(16)
+    flat.add(x)
+    faiss.write_index(flat, str(tmp_path / "vector.index"))
+    np.save(tmp_path / "emb.npy", x)
+
+    mapped = load_index(tmp_path / "vector.index", mmap=True, embeddings_path=tmp_path / "emb.npy")
+    assert isinstance(mapped, MmapFlatIP)
+    q = x[:8] + 0.05
+    d0, i0 = flat.search(q, 5)
+    d1, i1 = mapped.search(q, 5)
+    assert (i0 == i1).all() and np.allclose(d0, d1, atol=1e-5)
+    # k beyond ntotal is padded like faiss
+    d0, i0 = flat.search(q, 310)
+    d1, i1 = mapped.search(q, 310)
+    assert (i1[:, 300:] == -1).all() and (i0 == i1).all() and (d0[:, 300:] == d1[:, 300:]).all()
+    # stale embeddings fall back to faiss: another row count, or the same count from another build
+    for stale in (x[:10], np.roll(x, 1, axis=0)):
+        np.save(tmp_path / "emb.npy", stale)
+        index = load_index(tmp_path / "vector.index", mmap=True, embeddings_path=tmp_path / "emb.npy")
+        assert not isinstance(index, MmapFlatIP) and index.ntotal == 300
+
+def test_ivf_pq_falls_back_with_a_warning():
+    import pytest
+    from app.services.faiss_index import build_index, index_kind
+    x = np.random.default_rng(0).standard_normal((100, 16)).astype("float32")
+    with pytest.warns(UserWarning, match="using ivf_flat"):
+        index = build_index(x, "ivf_pq", pq_m=4, pq_nbits=8)
+    assert index_kind(index) == "ivf_flat" and index.ntotal == 100
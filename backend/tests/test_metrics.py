@@ -0,0 +1,78 @@
+from fastapi.testclient import TestClient
+from app.config.settings import settings
+from app.integrations.metrics import Histogram, collect, merge, server_timing, stage, _timings
+from app.main import app
+
+def test_histogram_renders_cumulative_prometheus_buckets():
+    h = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.7, 3.0):
+        h.observe(v, "llm")
+    lines = h.render()
+    assert 't_seconds_bucket{stage="llm",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="llm",le="1.0"} 3' in lines
+    assert 't_seconds_bucket{stage="llm",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="llm"} 4' in lines and lines[1] == "# TYPE t_seconds histogram"
+
+def test_worker_timings_are_merged_into_the_request():
+    def job(x):
+        with stage("parse"):
+            return x * 2
+    timings = []
+    token = _timings.set(timings)
+    try:
+        result, worker_timings = collect(job, 21)
+        assert result == 42 and timings == []  # deferred until merged
+        merge(worker_timings)
+    finally:
+        _timings.reset(token)
+    assert [name for name, _ in timings] == ["parse"]
+    assert server_timing([("a", 0.001), ("a", 0.002)], 0.01) == "a;dur=3.0, total;dur=10.0"
+
+def test_server_timing_header_and_metrics_endpoint(monkeypatch):
+    monkeypatch.setattr(settings, "USE_LOCAL", False)
+    monkeypatch.setattr(settings, "USE_MISTRAL", False)
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", False)
+    with TestClient(app) as client:
+        r = client.post("/chat", json={"message": "what is a normal hba1c"})
+        assert r.status_code == 200
+        stages = [part.split(";")[0] for part in r.headers["server-timing"].split(", ")]
+        assert stages[-1] == "total" and {"retrieve", "search", "prompt"} <= set(stages)
+        body = client.get("/metrics").text
+    assert 'medbot_stage_seconds_count{stage="retrieve",backend="fallback",retriever="bm25"}' in body
+    assert 'medbot_requests_total{method="POST",path="/chat",status="200"}' in body
+
+def test_answer_cache_counters_are_exported(monkeypatch):
+    monkeypatch.setattr(settings, "USE_LOCAL", False)
+    monkeypatch.setattr(settings, "USE_MISTRAL", False)
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+
+    def value(body, series):
+        return float(next(l for l in body.splitlines() if l.startswith(series + " ")).split()[-1])
+    with TestClient(app) as client:
+        before = client.get("/metrics").text
+        for _ in range(2):
+            assert client.post("/chat", json={"message": "cache metrics probe"}).status_code == 200
+        body = client.get("/metrics").text
+    hit, miss = 'medbot_answer_cache_events_total{event="hit"}', 'medbot_answer_cache_events_total{event="miss"}'
+    assert value(body, hit) - value(before, hit) == 1 and value(body, miss) - value(before, miss) == 1
+    assert "# TYPE medbot_answer_cache_size gauge" in body and 'medbot_answer_cache_size{unit="entries"}' in body
+
+def test_every_patient_backend_times_prompt_construction(monkeypatch):
+    import asyncio
+    from app.services import generation
+
+    async def fake_llm(*args, **kw):
+        return "ok"
+    monkeypatch.setattr(generation, "mistral_chat", fake_llm)
+    monkeypatch.setattr(generation, "ollama_generate", fake_llm)
+    monkeypatch.setattr(settings, "MISTRAL_API_KEY", "k")
+    for use_local, use_mistral in ((True, False), (False, True), (False, False)):
+        monkeypatch.setattr(settings, "USE_LOCAL", use_local)
+        monkeypatch.setattr(settings, "USE_MISTRAL", use_mistral)
+        timings = []
+        token = _timings.set(timings)
+        try:
+            asyncio.run(generation.generate_patient_answer("is my ferritin low"))
+        finally:
+            _timings.reset(token)
+        assert "prompt" in [name for name, _ in timings], generation.backend_name()
@@ -0,0 +1,93 @@
+import multiprocessing as mp, os, time
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from app.config.settings import settings
+from app.labs import ocr
+from app.labs.evaluator import parse_pdf_bytes
+from app.tests import ocr_stub
+from app.tests.sample_pdf import make_pdf
+
+# rendering/OCR are stubbed: poppler and tesseract are system binaries
+PAGE_TEXT = {1: "Glucose 180 mg/dL", 2: "Hemoglobin: 13.5 g/dL", 3: "Glucose 180 mg/dL"}
+
+def test_pages_stream_in_order_and_duplicates_hit_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WORKERS", 1)
+    monkeypatch.setattr(settings, "OCR_CACHE_DIR", str(tmp_path / "cache"))
+    rendered, tesseract_calls = [], []
+
+    def render(path, page, dpi, grayscale):
+        assert dpi == 150 and grayscale
+        rendered.append(page)
+        # pages 1 and 3 are the same scan
+        shade = 10 if PAGE_TEXT[page].startswith("Glucose") else 20
+        img = Image.new("L", (40, 40), shade)
+        img.info["text"] = PAGE_TEXT[page]
+        return img
+
+    def tesseract(img):
+        tesseract_calls.append(img.info["text"])
+        return img.info["text"]
+
+    monkeypatch.setattr(ocr, "render_page", render)
+    monkeypatch.setattr(ocr, "image_to_text", tesseract)
+    pdf = make_pdf(tmp_path / "labs.pdf", pages=3).read_bytes()
+
+    rows = parse_pdf_bytes(pdf, dpi=150, grayscale=True)
+    assert [(r["test_name"], r["value"]) for r in rows] == [("Glucose", 180.0), ("Hemoglobin", 13.5), ("Glucose", 180.0)]
+    assert rendered == [1, 2, 3] and len(tesseract_calls) == 2
+    # re-upload: every page comes from the cache
+    assert list(ocr.ocr_pdf_pages(pdf, dpi=150, grayscale=True)) == list(PAGE_TEXT.values())
+    assert len(tesseract_calls) == 2
+
+def test_process_pool_pages_keep_order_and_share_the_cache(tmp_path, monkeypatch):
+    cache, log = tmp_path / "cache", tmp_path / "calls"
+    log.mkdir()
+    monkeypatch.setattr(settings, "OCR_WORKERS", 2)
+    monkeypatch.setattr(settings, "OCR_CACHE_DIR", str(cache))
+    monkeypatch.setattr(ocr, "_pool", ProcessPoolExecutor(
+        max_workers=2, mp_context=mp.get_context("spawn"),
+        initializer=ocr_stub.install, initargs=(PAGE_TEXT, str(cache), str(log))))
+    pdf = make_pdf(tmp_path / "labs.pdf", pages=3).read_bytes()
+    try:
+        assert list(ocr.ocr_pdf_pages(pdf)) == list(PAGE_TEXT.values())
+        first = len(list(log.iterdir()))
+        assert 2 <= first <= 3  # pages 1 and 3 may race in different workers
+        assert all(not p.name.startswith(f"{os.getpid()}-") for p in log.iterdir())  # OCR ran in workers
+        # the cache written by workers serves every page of a re-upload
+        assert list(ocr.ocr_pdf_pages(pdf)) == list(PAGE_TEXT.values())
+        assert len(list(log.iterdir())) == first
+    finally:
+        ocr.shutdown_pool()
+
+def test_pool_pages_are_submitted_in_a_bounded_window(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setattr(settings, "OCR_WORKERS", 2)
+    submitted = []
+
+    class Recording(ThreadPoolExecutor):
+        def submit(self, fn, *args):
+            submitted.append(args[1])
+            return super().submit(fn, *args)
+    monkeypatch.setattr(ocr, "ocr_page", lambda path, page, dpi, grayscale: f"page {page}")
+    monkeypatch.setattr(ocr, "_pool", Recording(max_workers=2))
+    pdf = make_pdf(tmp_path / "labs.pdf", pages=10).read_bytes()
+    try:
+        pages = ocr.ocr_pdf_pages(pdf)
+        assert next(pages) == "page 1"
+        # 4 (2 x workers) in flight, topped up by one per page yielded
+        assert submitted == [1, 2, 3, 4, 5]
+        assert list(pages) == [f"page {p}" for p in range(2, 11)] and submitted == list(range(1, 11))
+    finally:
+        ocr.shutdown_pool()
+
+def test_cache_prunes_expired_then_least_recently_used_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OCR_CACHE_DIR", str(tmp_path))
+    now = time.time()
+    for i, age in enumerate([7200, 60, 120, 30]):
+        p = tmp_path / "ab" / f"{i}.txt"
+        p.parent.mkdir(exist_ok=True)
+        p.write_text("x" * 100, encoding="utf-8")
+        os.utime(p, (now - age, now - age))
+    # 2 h old: expired; then the least recently used until <= 250 bytes
+    assert ocr.prune_cache(max_age=3600, max_bytes=250) == 2
+    assert sorted(p.name for p in (tmp_path / "ab").iterdir()) == ["1.txt", "3.txt"]
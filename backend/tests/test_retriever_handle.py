@@ -0,0 +1,111 @@
+import asyncio, threading
+from fastapi.testclient import TestClient
+from app.config.settings import settings
+from app.main import app
+from app.services.retriever_handle import RetrieverHandle
+
+class FakeRetriever:
+    def __init__(self, name):
+        self.name, self.closed = name, False
+
+    def retrieve(self, query, k=5):
+        return [{"text": self.name}]
+
+    def close(self):
+        self.closed = True
+
+def test_swap_waits_for_in_flight_queries_on_the_old_version():
+    corpus = {"fp": 1}
+    built = []
+
+    def build():
+        built.append(FakeRetriever(f"v{len(built) + 1}"))
+        return built[-1]
+
+    handle = RetrieverHandle(build, fingerprint=lambda: corpus["fp"], warm_up=lambda r: r.retrieve("warm"))
+    in_query, finish = threading.Event(), threading.Event()
+
+    def slow_query():
+        with handle.acquire() as r:
+            in_query.set()
+            finish.wait(5)
+            assert r.name == "v1" and not r.closed
+
+    t = threading.Thread(target=slow_query)
+    t.start()
+    in_query.wait(5)
+    assert not handle.changed()
+    corpus["fp"] = 2
+    assert handle.changed() and handle.reload() == 2
+    # new queries see v2 while v1 drains
+    with handle.acquire() as r:
+        assert r.name == "v2"
+    assert handle.stats()["draining"] == [{"version": 1, "in_flight": 1}] and not built[0].closed
+    finish.set()
+    t.join()
+    assert built[0].closed and not built[1].closed and handle.stats()["draining"] == []
+    assert not handle.changed()
+
+def test_failed_reload_keeps_serving_and_watcher_picks_up_changes():
+    corpus = {"fp": 1, "broken": False}
+    n = [0]
+
+    def build():
+        if corpus["broken"]:
+            raise RuntimeError("index half-written")
+        n[0] += 1
+        return FakeRetriever(f"v{n[0]}")
+
+    handle = RetrieverHandle(build, fingerprint=lambda: corpus["fp"])
+    handle.ensure_loaded()
+    corpus.update(fp=2, broken=True)
+
+    async def watch_until(version):
+        task = asyncio.create_task(handle.watch(0.01))
+        for _ in range(300):
+            await asyncio.sleep(0.01)
+            if handle.version == version and handle.last_error is None:
+                break
+        task.cancel()
+
+    asyncio.run(watch_until(version=2))
+    assert handle.version == 1 and "half-written" in handle.last_error
+    attempts = [0]
+    real_build = handle._build
+
+    def counted():
+        attempts[0] += 1
+        return real_build()
+    handle._build = counted
+    # same broken corpus: the watcher does not rebuild it on every tick
+    asyncio.run(watch_until(version=2))
+    assert attempts[0] == 0 and handle.version == 1
+    # a new build moves the fingerprint: picked up
+    corpus.update(fp=3, broken=False)
+    asyncio.run(watch_until(version=2))
+    assert attempts[0] == 1 and handle.version == 2 and handle.current.name == "v2"
+
+def test_admin_reload_endpoint(monkeypatch):
+    with TestClient(app) as client:
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+        assert client.post("/admin/reload-index").status_code == 403
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+        assert client.post("/admin/reload-index", headers={"X-Admin-Token": "nope"}).status_code == 401
+        assert client.post("/admin/reload-index").status_code == 401
+        assert client.post("/admin/reload-index", headers={"X-Admin-Token": b"s\xe9cret"}).status_code == 401
+        before = client.post("/admin/reload-index", headers={"X-Admin-Token": "s3cret"}).json()["version"]
+        r = client.post("/admin/reload-index", headers={"X-Admin-Token": "s3cret"})
+        assert r.status_code == 200 and r.json()["version"] == before + 1
+
+def test_answer_cache_follows_the_published_retriever_version(monkeypatch):
+    from app.main import answer_cache, retrievers
+    monkeypatch.setattr(settings, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(answer_cache, "check_interval", 0)
+    with TestClient(app) as client:
+        retrievers.ensure_loaded()
+        answer_cache.store(answer_cache.lookup("chat", "version probe"), "cached")
+        assert answer_cache.lookup("chat", "version probe").answer == "cached"
+        invalidations = answer_cache.stats()["invalidations"]
+        client.post("/admin/reload-index", headers={"X-Admin-Token": "s3cret"})
+        assert answer_cache.lookup("chat", "version probe").answer is None
+        assert answer_cache.stats()["invalidations"] == invalidations + 1
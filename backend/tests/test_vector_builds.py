@@ -0,0 +1,82 @@
+import json
+import numpy as np
+from scripts import build_faiss_index as build
+from app.services import embedding
+from app.services.faiss_index import load_index
+from app.services.meta_store import open_meta
+from app.services.vector_builds import BUILDS_DIR, CURRENT_NAME, current_build, resolve_build
+
+class FakeEncoder:
+    def encode(self, texts, **kw):
+        rng = np.random.default_rng(len(texts))
+        x = rng.standard_normal((len(texts), 8)).astype("float32")
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def _point_at(tmp_path, monkeypatch):
+    app = tmp_path / "app"
+    (app / "kb").mkdir(parents=True)
+    monkeypatch.setattr(build, "ROOT", tmp_path)
+    monkeypatch.setattr(build, "KB_DIR", app / "kb")
+    monkeypatch.setattr(build, "CHUNK_DIR", app / "kb_chunks")
+    for name, attr in (("vector.index", "INDEX_PATH"), ("vector_meta.bin", "META_PATH"),
+                       ("vector_embeddings.npy", "EMB_PATH"), ("vector_manifest.json", "MANIFEST_PATH")):
+        monkeypatch.setattr(build, attr, app / name)
+    monkeypatch.setattr(embedding, "load_encoder", lambda name: FakeEncoder())
+    return app
+
+def test_builds_are_published_as_one_set(tmp_path, monkeypatch):
+    app = _point_at(tmp_path, monkeypatch)
+    # an index from before generations is served until the first build is published
+    (app / "vector.index").write_bytes(b"legacy")
+    assert resolve_build(app / "vector.index", app / "vector_meta.bin") == (app / "vector.index", app / "vector_meta.bin")
+
+    builds = []
+    for n in (3, 5, 7):
+        for i in range(n):
+            (app / "kb" / f"d{i}.md").write_text(f"doc {i}", encoding="utf-8")
+        build.main()
+        builds.append(current_build(app / "vector.index"))
+        index_path, meta_path, emb_path, manifest_path = resolve_build(
+            app / "vector.index", app / "vector_meta.bin", app / "vector_embeddings.npy", app / "vector_manifest.json")
+        assert index_path.parent.name == builds[-1] and index_path.parent.parent == app / BUILDS_DIR
+        # every file of the published set describes the same build
+        assert load_index(index_path).ntotal == len(open_meta(meta_path)) == np.load(emb_path).shape[0] == n
+        assert json.loads(manifest_path.read_text(encoding="utf-8"))["build"] == builds[-1]
+    # the current and the previous build are kept (readers may still map it), older ones go
+    assert sorted(d.name for d in (app / BUILDS_DIR).iterdir()) == sorted(builds[1:])
+    assert (app / CURRENT_NAME).read_text(encoding="utf-8") == builds[-1]
+    assert (app / "vector.index").read_bytes() == b"legacy"
+
+def test_incremental_build_reuses_the_published_embeddings(tmp_path, monkeypatch):
+    app = _point_at(tmp_path, monkeypatch)
+    for i in range(4):
+        (app / "kb" / f"d{i}.md").write_text(f"doc {i}", encoding="utf-8")
+    build.main()
+    first = np.load(resolve_build(app / "vector.index", app / "vector_embeddings.npy")[1])
+    (app / "kb" / "d4.md").write_text("doc 4", encoding="utf-8")
+    build.main(incremental=True)
+    second = np.load(resolve_build(app / "vector.index", app / "vector_embeddings.npy")[1])
+    # glob order is not fixed: compare the rows as a set
+    assert second.shape[0] == 5 and {r.tobytes() for r in first} <= {r.tobytes() for r in second}
+
+def test_index_reload_keeps_the_loaded_encoder(tmp_path, monkeypatch):
+    from app.config.settings import settings
+    from app.services import retrieval_faiss
+    from app.services.retrieval import get_retriever
+    app = _point_at(tmp_path, monkeypatch)
+    for i in range(3):
+        (app / "kb" / f"d{i}.md").write_text(f"doc {i}", encoding="utf-8")
+    build.main()
+    for attr, path in (("FAISS_INDEX_PATH", "vector.index"), ("FAISS_META_PATH", "vector_meta.bin"),
+                       ("FAISS_EMB_PATH", "vector_embeddings.npy")):
+        monkeypatch.setattr(settings, attr, str(app / path))
+    monkeypatch.setattr(settings, "USE_FAISS", True)
+    loads = []
+    monkeypatch.setattr(retrieval_faiss, "load_encoder", lambda name: loads.append(name) or FakeEncoder())
+    first = get_retriever()
+    (app / "kb" / "d3.md").write_text("doc 3", encoding="utf-8")
+    build.main()
+    second = get_retriever(reuse=first)
+    assert len(loads) == 1 and second.model is first.model and second.index.ntotal == 4
+    first.close()
+    second.close()